@@ -1,33 +1,57 @@
 #!/bin/bash
 # CPU Power Management Helper Script for PitMaster
+#
+# Commands apply to every core. "serve" keeps running and reads one command
+# per line from stdin, answering each with a single "OK" or "ERROR ..." line,
+# so the web app can hold one privileged helper open instead of forking
+# sudo for every change.
 
-case "$1" in
-    "get-status")
-        governor=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor)
-        cur_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq)
-        min_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_min_freq)
-        max_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq)
-        /usr/bin/sudo echo "$governor"
-        /usr/bin/sudo echo "$cur_freq"
-        /usr/bin/sudo echo "$min_freq"
-        /usr/bin/sudo echo "$max_freq"
-        ;;
-    "set-powersave")
-        echo "powersave" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor
-        echo "300000" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_min_freq
-        echo "600000" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq
-        echo "OK"
-        ;;
-    "set-ondemand")
-        echo "ondemand" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor
-        echo "600000" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_min_freq
-        echo "1500000" | /usr/bin/sudo tee /sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq
-        echo "OK"
-        ;;
-    *)
-        echo "Invalid command: $1"
-        exit 1
-        ;;
-esac
+CPUFREQ_DIRS=(/sys/devices/system/cpu/cpu[0-9]*/cpufreq)
 
-exit 0
\ No newline at end of file
+set_mode() {
+    # set_mode GOVERNOR MIN_KHZ MAX_KHZ
+    local dir
+    for dir in "${CPUFREQ_DIRS[@]}"; do
+        echo "$1" | /usr/bin/sudo tee "$dir/scaling_governor" > /dev/null || return 1
+        echo "$2" | /usr/bin/sudo tee "$dir/scaling_min_freq" > /dev/null || return 1
+        echo "$3" | /usr/bin/sudo tee "$dir/scaling_max_freq" > /dev/null || return 1
+    done
+}
+
+run_command() {
+    case "$1" in
+        "get-status")
+            governor=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_governor)
+            cur_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq)
+            min_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_min_freq)
+            max_freq=$(/usr/bin/sudo cat /sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq)
+            echo "$governor"
+            echo "$cur_freq"
+            echo "$min_freq"
+            echo "$max_freq"
+            ;;
+        "set-powersave")
+            if set_mode powersave 300000 600000; then echo "OK"; else echo "ERROR failed to set powersave"; fi
+            ;;
+        "set-ondemand")
+            if set_mode ondemand 600000 1500000; then echo "OK"; else echo "ERROR failed to set ondemand"; fi
+            ;;
+        *)
+            echo "ERROR invalid command: $1"
+            return 1
+            ;;
+    esac
+}
+
+if [ "$1" = "serve" ]; then
+    while read -r command; do
+        case "$command" in
+            "set-powersave"|"set-ondemand") run_command "$command" ;;
+            *) echo "ERROR invalid command: $command" ;;
+        esac
+    done
+    exit 0
+fi
+
+run_command "$1" || exit 1
+exit 0
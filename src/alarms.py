@@ -0,0 +1,338 @@
+# alarms.py
+# Alarm rules evaluated in the sensor loop on every reading. Rules are
+# edge-triggered: a notification goes out when an alarm becomes active and
+# when it clears, never on every sample while it stays active. Delivery runs
+# on a background worker so a slow webhook cannot delay sampling.
+import json
+import os
+import queue
+import sys
+import threading
+import urllib.request
+from collections import deque
+from typing import Dict, List, Optional
+
+from atomic_file import atomic_write_json
+
+class Rule:
+    # Base rule: subclasses implement condition(), returning True while the
+    # alarm condition holds, False when it does not and None when the reading
+    # says nothing either way. A condition must hold (or stop holding) for
+    # `debounce` seconds before the alarm state changes.
+    type = None
+
+    def __init__(self, rule_id: str, sensor: str, debounce=0.0, message: Optional[str] = None):
+        self.rule_id = rule_id
+        self.sensor = sensor
+        self.debounce = float(debounce)
+        if self.debounce < 0:
+            raise ValueError("debounce must not be negative")
+        self.message = message
+        self.active = False
+        self._pending_since: Optional[float] = None
+
+    def condition(self, temp_c: Optional[float], error: Optional[str], now: float) -> Optional[bool]:
+        raise NotImplementedError
+
+    def evaluate(self, temp_c: Optional[float], error: Optional[str], now: float) -> Optional[str]:
+        # "triggered" or "cleared" on a state change, otherwise None
+        holds = self.condition(temp_c, error, now)
+        if holds is None or holds == self.active:
+            self._pending_since = None
+            return None
+        if self._pending_since is None:
+            self._pending_since = now
+        if now - self._pending_since < self.debounce:
+            return None
+        self._pending_since = None
+        self.active = holds
+        return "triggered" if holds else "cleared"
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def config(self) -> Dict:
+        return {"id": self.rule_id, "type": self.type, "sensor": self.sensor,
+                "debounce": self.debounce, "message": self.message}
+
+class HighRule(Rule):
+    # Active at or above threshold; clears below threshold - hysteresis
+    type = "high"
+
+    def __init__(self, rule_id, sensor, threshold, hysteresis=2.0, **kwargs):
+        super().__init__(rule_id, sensor, **kwargs)
+        self.threshold = float(threshold)
+        self.hysteresis = float(hysteresis)
+        if self.hysteresis < 0:
+            raise ValueError("hysteresis must not be negative")
+
+    def condition(self, temp_c, error, now):
+        if temp_c is None or error is not None:
+            return None
+        if self.active:
+            return temp_c >= self.threshold - self.hysteresis
+        return temp_c >= self.threshold
+
+    def describe(self):
+        return f"{self.sensor} at or above {self.threshold:g} °C"
+
+    def config(self):
+        return {**super().config(), "threshold": self.threshold, "hysteresis": self.hysteresis}
+
+class LowRule(HighRule):
+    # Active at or below threshold; clears above threshold + hysteresis
+    type = "low"
+
+    def condition(self, temp_c, error, now):
+        if temp_c is None or error is not None:
+            return None
+        if self.active:
+            return temp_c <= self.threshold + self.hysteresis
+        return temp_c <= self.threshold
+
+    def describe(self):
+        return f"{self.sensor} at or below {self.threshold:g} °C"
+
+class TargetRule(HighRule):
+    # Meat done: a high threshold that reads as a goal rather than a fault
+    type = "target"
+
+    def describe(self):
+        return f"{self.sensor} reached target {self.threshold:g} °C"
+
+class DisconnectedRule(Rule):
+    # Active while the sensor loop reports an error for the probe
+    type = "disconnected"
+
+    def condition(self, temp_c, error, now):
+        return error is not None
+
+    def describe(self):
+        return f"{self.sensor} disconnected or failing"
+
+class RateRule(Rule):
+    # Active while the temperature changes faster than max_rate °C/min in
+    # the given direction ("rise", "fall" or "either"). The rate is measured
+    # against an anchor reading at least `window` seconds old, so it costs
+    # O(1) per sample and is not fooled by single-sample noise.
+    type = "rate"
+
+    def __init__(self, rule_id, sensor, max_rate, direction="either", window=60.0, **kwargs):
+        super().__init__(rule_id, sensor, **kwargs)
+        self.max_rate = float(max_rate)
+        if self.max_rate <= 0:
+            raise ValueError("max_rate must be positive")
+        if direction not in ("rise", "fall", "either"):
+            raise ValueError("direction must be rise, fall or either")
+        self.direction = direction
+        self.window = float(window)
+        self.rate: Optional[float] = None
+        self._anchor: Optional[tuple] = None
+
+    def condition(self, temp_c, error, now):
+        if temp_c is None or error is not None:
+            self._anchor = None
+            return None
+        if self._anchor is None or now < self._anchor[0]:
+            self._anchor = (now, temp_c)
+            return None
+        elapsed = now - self._anchor[0]
+        if elapsed < self.window:
+            return None
+        self.rate = (temp_c - self._anchor[1]) / elapsed * 60.0
+        self._anchor = (now, temp_c)
+        if self.direction == "rise":
+            return self.rate > self.max_rate
+        if self.direction == "fall":
+            return -self.rate > self.max_rate
+        return abs(self.rate) > self.max_rate
+
+    def describe(self):
+        return f"{self.sensor} changing faster than {self.max_rate:g} °C/min ({self.direction})"
+
+    def config(self):
+        return {**super().config(), "max_rate": self.max_rate,
+                "direction": self.direction, "window": self.window}
+
+RULE_TYPES = {cls.type: cls for cls in (HighRule, LowRule, TargetRule, DisconnectedRule, RateRule)}
+
+def rule_from_config(config: Dict) -> Rule:
+    config = dict(config)
+    rule_type = config.pop("type", None)
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type: {rule_type}")
+    rule_id = config.pop("id", None)
+    sensor = config.pop("sensor", None)
+    if not rule_id or not sensor:
+        raise ValueError("Rule needs an id and a sensor")
+    return RULE_TYPES[rule_type](rule_id, sensor, **config)
+
+class AlarmEngine:
+    # Rules indexed by sensor, so a reading only touches the rules for its
+    # own probe. Rule changes replace the per-sensor list rather than
+    # mutating it, so evaluation never sees a half-edited list.
+    def __init__(self, dispatcher=None, rules_file: Optional[str] = None, history_size=100):
+        self.dispatcher = dispatcher
+        self.rules_file = rules_file
+        self._rules: Dict[str, Rule] = {}
+        self._by_sensor: Dict[str, List[Rule]] = {}
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=history_size)
+        if rules_file and os.path.exists(rules_file):
+            self.load_rules()
+
+    def _reindex(self):
+        by_sensor: Dict[str, List[Rule]] = {}
+        for rule in self._rules.values():
+            by_sensor.setdefault(rule.sensor, []).append(rule)
+        self._by_sensor = by_sensor
+
+    def add_rule(self, rule: Rule, save=True):
+        with self._lock:
+            self._rules[rule.rule_id] = rule
+            self._reindex()
+        if save:
+            self.save_rules()
+
+    def remove_rule(self, rule_id: str):
+        with self._lock:
+            if rule_id not in self._rules:
+                raise KeyError(rule_id)
+            del self._rules[rule_id]
+            self._reindex()
+        self.save_rules()
+
+    def rules(self) -> List[Rule]:
+        with self._lock:
+            return list(self._rules.values())
+
+    def evaluate(self, sensor: str, temp_c: Optional[float], error: Optional[str], now: float):
+        # Called from the sensor loop for every reading
+        for rule in self._by_sensor.get(sensor, ()):
+            state = rule.evaluate(temp_c, error, now)
+            if state is not None:
+                self._emit(rule, state, temp_c, error, now)
+
+    def _emit(self, rule: Rule, state: str, temp_c, error, now):
+        event = {
+            "rule_id": rule.rule_id,
+            "type": rule.type,
+            "sensor": rule.sensor,
+            "state": state,
+            "temp_c": None if temp_c is None else round(temp_c, 2),
+            "error": error,
+            "message": rule.message or rule.describe(),
+            "timestamp": now
+        }
+        self.events.append(event)
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(event)
+
+    def status(self) -> Dict:
+        rules = self.rules()
+        return {
+            "rules": [rule.config() for rule in rules],
+            "active": [rule.rule_id for rule in rules if rule.active],
+            "events": list(self.events)
+        }
+
+    def load_rules(self):
+        try:
+            with open(self.rules_file) as f:
+                for config in json.load(f):
+                    self.add_rule(rule_from_config(config), save=False)
+            print(f"Loaded {len(self._rules)} alarm rules")
+        except Exception as e:
+            print(f"Error loading alarm rules: {e}")
+
+    def save_rules(self):
+        # Write the rule list atomically (temp file + rename)
+        if not self.rules_file:
+            return
+        atomic_write_json(self.rules_file, [rule.config() for rule in self.rules()])
+
+class StdoutSink:
+    def send(self, event: Dict):
+        print(f"[ALARM] {event['state'].upper()}: {event['message']}", file=sys.stdout, flush=True)
+
+class FileSink:
+    # Appends one JSON line per event
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, event: Dict):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(event) + "\n")
+
+class WebhookSink:
+    # POSTs each event as JSON to a local webhook
+    def __init__(self, url: str, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event: Dict):
+        req = urllib.request.Request(
+            self.url, data=json.dumps(event).encode(),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+class MemorySink:
+    # Collects events in process, for verifying rules without real outputs
+    def __init__(self):
+        self.events: List[Dict] = []
+        self._cond = threading.Condition()
+
+    def send(self, event: Dict):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def wait_for(self, count: int, timeout=5.0) -> bool:
+        # Block until at least `count` events have arrived
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.events) >= count, timeout)
+
+class AlarmDispatcher:
+    # Hands events to the sinks on a worker thread. dispatch() never blocks:
+    # when the queue is full the event is dropped and counted. A failing sink
+    # is logged and does not stop delivery to the others.
+    def __init__(self, sinks=None, max_queue=256):
+        self.sinks = list(sinks or [])
+        self.dropped = 0
+        self.failures = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def add_sink(self, sink):
+        self.sinks = self.sinks + [sink]
+
+    def dispatch(self, event: Dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            for sink in self.sinks:
+                try:
+                    sink.send(event)
+                except Exception as e:
+                    self.failures += 1
+                    print(f"[ERROR] Alarm sink {type(sink).__name__}: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,22 @@
+# atomic_file.py
+import json
+import os
+import tempfile
+
+def atomic_write_json(path: str, data, indent=2):
+    # Write data as JSON so that path always holds either the old or the new
+    # file, never a partial one: write a temp file in the same directory,
+    # fsync it, then rename it over path. A power cut mid-save (the Pi is
+    # often unplugged) leaves at most a stray .tmp file behind.
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = '.' + os.path.splitext(os.path.basename(path))[0] + '-'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
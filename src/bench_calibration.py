@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# bench_calibration.py
+import os
+import sys
+import tempfile
+import time
+from array import array
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from calibration import CalibrationManager, load_numpy
+
+def time_call(func, repeat=3):
+    # Best wall-clock time of several runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_calibration(num_samples=1_000_000):
+    # Compare scalar apply_calibration against the batch API
+    print("=== Calibration Batch Benchmark ===")
+    print(f"Samples: {num_samples:,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = CalibrationManager(os.path.join(tmp, "calibration_data.json"), save_delay=0)
+        for actual, measured in [(0.0, 1.5), (100.0, 102.25), (200.0, 203.75)]:
+            manager.add_calibration_point("bench_sensor", actual, measured)
+
+        # A 14-hour cook at 1 Hz is ~50k samples per probe; this is a few of those
+        raw = array('d', ((i % 4800) * 0.25 for i in range(num_samples)))
+
+        scalar_result = []
+        def scalar():
+            scalar_result[:] = [manager.apply_calibration("bench_sensor", x) for x in raw]
+        scalar_time = time_call(scalar)
+        print(f"Scalar loop:        {scalar_time:.3f} s ({num_samples / scalar_time:,.0f} samples/s)")
+
+        batch_result = array('d', bytes(8 * num_samples))
+        array_time = time_call(lambda: manager.apply_calibration_batch("bench_sensor", raw, batch_result))
+        print(f"Batch array.array:  {array_time:.3f} s ({num_samples / array_time:,.0f} samples/s)")
+        assert list(batch_result) == scalar_result, "array.array batch differs from scalar path"
+
+        numpy = load_numpy()
+        if numpy is None:
+            print("numpy not installed - skipping ndarray benchmark")
+            return
+
+        raw_np = numpy.frombuffer(raw, dtype=numpy.float64)
+        out_np = numpy.empty_like(raw_np)
+        numpy_time = time_call(lambda: manager.apply_calibration_batch("bench_sensor", raw_np, out_np))
+        print(f"Batch numpy:        {numpy_time:.4f} s ({num_samples / numpy_time:,.0f} samples/s)")
+        assert out_np.tolist() == scalar_result, "numpy batch differs from scalar path"
+
+        print(f"Speedup vs scalar:  array.array {scalar_time / array_time:.1f}x, numpy {scalar_time / numpy_time:.1f}x")
+
+        check_curves(manager, raw, numpy)
+        check_out_buffers(manager, numpy)
+
+def check_curves(manager, raw, numpy):
+    # Non-linear calibrations must also match the scalar path exactly
+    points = [(actual, actual * 1.02 + 0.004 * actual ** 1.5 - 1.0, 1.0) for actual in range(0, 301, 20)]
+    raw = raw[:100_000]
+    raw_np = numpy.frombuffer(raw, dtype=numpy.float64)
+    for mode, options in (("polynomial", {"degree": 3}), ("piecewise", {"knots": [80.0, 180.0]})):
+        manager.import_points({"bench_sensor": points}, mode, **options)
+        scalar_result = [manager.apply_calibration("bench_sensor", x) for x in raw]
+        assert list(manager.apply_calibration_batch("bench_sensor", raw)) == scalar_result, \
+            f"{mode} array.array batch differs from scalar path"
+        assert manager.apply_calibration_batch("bench_sensor", raw_np).tolist() == scalar_result, \
+            f"{mode} numpy batch differs from scalar path"
+        print(f"{mode.capitalize():<11} curve: batch matches scalar on {len(raw):,} samples")
+
+def check_out_buffers(manager, numpy):
+    # out must be a float64 buffer; anything else is refused up front
+    raw = array('d', [20.0, 100.0, 250.0])
+    expected = [manager.apply_calibration("bench_sensor", x) for x in raw]
+    for label, call in (
+        ("array('f') out", lambda: manager.apply_calibration_batch("bench_sensor", raw, array('f', raw))),
+        ("int ndarray as its own out", lambda: manager.apply_calibration_batch(
+            "bench_sensor", numpy.array([20, 100, 250]), numpy.array([20, 100, 250])))
+    ):
+        try:
+            call()
+        except TypeError as e:
+            print(f"Rejected {label}: {e}")
+        else:
+            raise AssertionError(f"{label} was accepted")
+    int_raw = numpy.array([20, 100, 250])
+    out = manager.apply_calibration_batch("bench_sensor", int_raw, numpy.empty(3))
+    assert out.tolist() == expected, "int ndarray batch differs from scalar path"
+    print("Int ndarray raw with float64 out matches scalar path")
+
+if __name__ == "__main__":
+    bench_calibration()
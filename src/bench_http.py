@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# bench_http.py
+# Closed-loop HTTP load generator: N concurrent keep-alive clients hammer one
+# route for a fixed time and report throughput and latency percentiles, the
+# same columns as the README's route stress table.
+import argparse
+import http.client
+import os
+import threading
+import time
+
+def read_cpu_seconds(pid):
+    # utime + stime of a process and its reaped children, in seconds
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = sum(int(field) for field in fields[11:15])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+def client_loop(host, port, route, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", route)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.close()
+
+def bench_route(host, port, route, clients, duration, pid=None):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(host, port, route, deadline, latencies, errors))
+        for _ in range(clients)
+    ]
+
+    cpu_start = read_cpu_seconds(pid) if pid else None
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    result = {
+        "route": route,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+    if pid:
+        result["cpu"] = (read_cpu_seconds(pid) - cpu_start) / elapsed * 100
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Pi-tMaster routes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--pid", type=int, help="server PID, to report its CPU use")
+    parser.add_argument("routes", nargs="*", default=["/", "/temperature", "/data"])
+    args = parser.parse_args()
+
+    print(f"=== HTTP Benchmark: {args.clients} clients, {args.duration:.0f}s per route ===")
+    print(f"{'Route':<14} {'Req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'Max (ms)':>9} {'Errors':>7} {'CPU':>8}")
+    for route in args.routes:
+        r = bench_route(args.host, args.port, route, args.clients, args.duration, args.pid)
+        cpu = f"{r['cpu']:.1f} %" if "cpu" in r else "-"
+        print(f"{r['route']:<14} {r['rps']:>9.1f} {r['p50'] * 1000:>9.1f} {r['p99'] * 1000:>9.1f} "
+              f"{r['max'] * 1000:>9.1f} {r['errors']:>7} {cpu:>8}")
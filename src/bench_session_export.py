@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# bench_session_export.py
+# Memory use of a session export: fills a scratch history with a 24-hour,
+# 1 Hz cook on every probe, then streams the session as CSV and columnar
+# and reports the peak Python allocation while doing it, which should stay
+# at a few batches no matter how long the session is.
+#
+#   python bench_session_export.py [--hours 24]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from history_store import HistoryStore
+from sessions import SessionStore, export_columnar, export_csv
+
+SENSORS = ["smoker_left", "smoker_right", "meat_probe"]
+
+def fill_history(history, start, seconds):
+    temps = {"smoker_left": 20.0, "smoker_right": 20.0, "meat_probe": 5.0}
+    for second in range(seconds):
+        for name in SENSORS:
+            temps[name] += random.uniform(-0.05, 0.06)
+            raw = round(temps[name] * 4) / 4
+            history.record(name, start + second + 0.01 * SENSORS.index(name), raw, round(temps[name], 2))
+        if second % 3600 == 3599:
+            history.flush()
+    history.flush()
+
+def measure(label, chunks):
+    tracemalloc.start()
+    started = time.perf_counter()
+    total = count = 0
+    for chunk in chunks:
+        total += len(chunk)
+        count += 1
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {total / 1e6:>8.1f} MB in {count:>5} chunks, {seconds:>6.1f} s, "
+          f"peak Python memory {peak / 1e6:.2f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Session export memory benchmark")
+    parser.add_argument("--hours", type=float, default=24.0)
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "history.db")
+        seconds = int(args.hours * 3600)
+        start = time.time() - seconds
+        history = HistoryStore(db_path)
+        print(f"Recording {seconds:,} s x {len(SENSORS)} probes at 1 Hz...")
+        fill_history(history, start, seconds)
+        sessions = SessionStore(db_path, clock=lambda: start)
+        session = sessions.start_session("benchmark")
+        sessions.clock = lambda: start + seconds
+        sessions.stop_session(session["id"])
+
+        print(f"=== Export of a {args.hours:g} h session ===")
+        measure("csv", export_csv(history, SENSORS, start, start + seconds))
+        measure("columnar", export_columnar(history, SENSORS, start, start + seconds))
+        history.close()
+
+if __name__ == "__main__":
+    main()
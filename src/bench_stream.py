@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# bench_stream.py
+# Load test for /stream: holds N idle Server-Sent Events connections open on a
+# single thread and reports how many stay connected, how many events arrive and
+# the server's CPU use over the run.
+import argparse
+import os
+import selectors
+import socket
+import time
+
+def read_cpu_seconds(pid):
+    # utime + stime of a process from /proc, in seconds
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def read_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def open_stream(host, port):
+    sock = socket.create_connection((host, port))
+    sock.sendall(
+        f"GET /stream HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    sock.setblocking(False)
+    return sock
+
+def bench_stream(host, port, clients, duration, pid=None):
+    print("=== /stream Load Test ===")
+    print(f"Target: http://{host}:{port}/stream, clients: {clients}, duration: {duration}s")
+
+    selector = selectors.DefaultSelector()
+    for _ in range(clients):
+        try:
+            selector.register(open_stream(host, port), selectors.EVENT_READ)
+        except OSError as e:
+            print(f"Connection failed after {len(selector.get_map())} clients: {e}")
+            break
+
+    cpu_start = read_cpu_seconds(pid) if pid else None
+    start = time.monotonic()
+    events = 0
+    dropped = 0
+
+    while time.monotonic() - start < duration:
+        for key, _ in selector.select(timeout=1.0):
+            try:
+                data = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            if not data:
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+                dropped += 1
+                continue
+            events += data.count(b"\nevent: reading\n")
+
+    elapsed = time.monotonic() - start
+    connected = len(selector.get_map())
+    print(f"Connections held: {connected}/{clients} ({dropped} dropped)")
+    print(f"Events received:  {events} ({events / elapsed:.1f}/s across all clients)")
+    if pid:
+        cpu = (read_cpu_seconds(pid) - cpu_start) / elapsed * 100
+        print(f"Server CPU:       {cpu:.1f} % of one core")
+        print(f"Server RSS:       {read_rss_mb(pid):.1f} MB")
+
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hold many idle /stream clients open")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--pid", type=int, help="server PID, to report its CPU and memory")
+    args = parser.parse_args()
+    bench_stream(args.host, args.port, args.clients, args.duration, args.pid)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# bench_telemetry.py
+# Bytes on the wire and encode CPU for the telemetry encodings versus JSON:
+# the /data reading set of one unit and of a hub, and a bulk history export.
+#
+#   python bench_telemetry.py [--units 24] [--samples 86400]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from snapshot import encode_json, freeze, make_reading
+import telemetry
+from telemetry import (CBOR, MSGPACK, compact_reading_set, decode_cbor, encode, frames_header,
+                       pack_frames, read_frames)
+
+SENSORS = ("smoker_left", "smoker_right", "meat_probe")
+
+def reading_set(prefixes):
+    data = {}
+    for prefix in prefixes:
+        for name in SENSORS:
+            raw = round(random.uniform(100, 130) * 4) / 4
+            temp_c = round(raw + random.uniform(-0.5, 0.5), 2)
+            data[prefix + name] = make_reading(temp_c, round(temp_c * 9 / 5 + 32, 2), raw, None)
+    data["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    data["sensor_status"] = {prefix + name: "Connected" for prefix in prefixes for name in SENSORS}
+    data["simulation_mode"] = False
+    return freeze(data)
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def bench_reading_sets(units):
+    print("=== /data reading set: bytes and encode time per snapshot ===")
+    types = [CBOR] + ([MSGPACK] if MSGPACK in telemetry.OFFERS else [])
+    print(f"{'payload':<22} {'encoding':<22} {'bytes':>7} {'encode us':>10}")
+    for label, prefixes in (("unit (3 probes)", [""]),
+                            (f"hub ({units} units)", [f"unit{i:02d}/" for i in range(units)])):
+        data = reading_set(prefixes)
+        body = encode_json(data)
+        print(f"{label:<22} {'json':<22} {len(body):>7} {per_call_us(lambda: encode_json(data), 2000):>10.1f}")
+        compact = compact_reading_set(data, 1, time.time())
+        compact_json = json.dumps(compact, separators=(",", ":")).encode()
+        print(f"{'':<22} {'json (compact set)':<22} {len(compact_json):>7} "
+              f"{per_call_us(lambda: json.dumps(compact_reading_set(data, 1, 0.0)), 2000):>10.1f}")
+        for media_type in types:
+            encoded = encode(media_type, compact)
+            if media_type == CBOR:
+                assert decode_cbor(encoded) == compact
+            us = per_call_us(lambda: encode(media_type, compact_reading_set(data, 1, 0.0)), 2000)
+            print(f"{'':<22} {media_type.split('/')[1] + ' (compact set)':<22} {len(encoded):>7} {us:>10.1f}")
+
+def bench_history(samples):
+    print(f"\n=== History export: {samples:,} samples of one sensor ===")
+    start = time.time() - samples
+    rows = []
+    temp = 20.0
+    for i in range(samples):
+        temp += random.uniform(-0.05, 0.06)
+        raw = round(temp * 4) / 4
+        rows.append((start + i, raw, round(temp, 2)))
+    columns = {
+        "sensor": "smoker_left", "resolution": "raw", "count": len(rows),
+        "ts": [r[0] for r in rows], "raw_c": [r[1] for r in rows], "temp_c": [r[2] for r in rows]
+    }
+    header = frames_header(["smoker_left"])
+    encoders = [
+        ("json (/history)", lambda: json.dumps(columns, separators=(",", ":")).encode()),
+        ("cbor (/history)", lambda: encode(CBOR, columns)),
+    ]
+    if MSGPACK in telemetry.OFFERS:
+        encoders.append(("msgpack (/history)", lambda: encode(MSGPACK, columns)))
+    encoders.append(("frames (/history/export)",
+                     lambda: header + b"".join(pack_frames(0, rows[i:i + 4096])
+                                               for i in range(0, len(rows), 4096))))
+
+    print(f"{'encoding':<26} {'bytes':>10} {'bytes/sample':>13} {'encode ns/sample':>17}")
+    for label, func in encoders:
+        body = func()
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(f"{label:<26} {len(body):>10,} {len(body) / samples:>13.1f} {seconds / samples * 1e9:>17.0f}")
+
+    # Frames hold quarter degrees: raw readings survive exactly, calibrated
+    # ones to within 0.125 °C
+    _, frames = read_frames(func())
+    assert all(abs(f[1] - r[0]) < 0.001 and f[2] == r[1] and abs(f[3] - r[2]) <= 0.125
+               for f, r in zip(frames, rows))
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry encoding benchmark")
+    parser.add_argument("--units", type=int, default=24)
+    parser.add_argument("--samples", type=int, default=86400)
+    args = parser.parse_args()
+    random.seed(1)
+    bench_reading_sets(args.units)
+    bench_history(args.samples)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 # calibration.py
+import atexit
 import json
 import os
+import threading
 import time
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from atomic_file import atomic_write_json
+
+def load_numpy():
+    # numpy is optional and slow to import on a Pi, so only load it for batch work
+    try:
+        import numpy
+        return numpy
+    except ImportError:  # Batch calibration falls back to array.array
+        return None
 
 @dataclass
 class CalibrationPoint:
     actual_temp: float
     measured_temp: float
     timestamp: float
+    weight: float = 1.0
 
 @dataclass
 class SensorCalibration:
@@ -18,11 +32,170 @@ class SensorCalibration:
     slope: float = 1.0
     intercept: float = 0.0
     is_calibrated: bool = False
+    mode: str = "linear"
+    curve: Optional[Dict] = None       # CalibrationCurve.to_dict() for non-linear modes
+    fit: Optional[Dict] = None         # r_squared and residual summary of the last fit
+
+CALIBRATION_MODES = ("linear", "polynomial", "piecewise")
+
+def solve_weighted_least_squares(rows: List[List[float]], y: List[float], w: List[float]) -> List[float]:
+    # Minimise sum(w * (row . beta - y)^2) through the normal equations,
+    # accumulated in one pass and solved by Gaussian elimination with
+    # partial pivoting. Fine for the handful of parameters used here.
+    n = len(rows[0])
+    ata = [[0.0] * n for _ in range(n)]
+    aty = [0.0] * n
+    for row, yi, wi in zip(rows, y, w):
+        for i in range(n):
+            wri = wi * row[i]
+            aty[i] += wri * yi
+            ata_i = ata[i]
+            for j in range(i, n):
+                ata_i[j] += wri * row[j]
+    for i in range(n):
+        for j in range(i):
+            ata[i][j] = ata[j][i]
+
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(ata[r][col]))
+        if abs(ata[pivot][col]) < 1e-12:
+            raise ValueError("Calibration points do not determine the fit (too few distinct measured values)")
+        ata[col], ata[pivot] = ata[pivot], ata[col]
+        aty[col], aty[pivot] = aty[pivot], aty[col]
+        for r in range(col + 1, n):
+            factor = ata[r][col] / ata[col][col]
+            if factor:
+                for c in range(col, n):
+                    ata[r][c] -= factor * ata[col][c]
+                aty[r] -= factor * aty[col]
+    beta = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        beta[i] = (aty[i] - sum(ata[i][j] * beta[j] for j in range(i + 1, n))) / ata[i][i]
+    return beta
+
+class CalibrationCurve:
+    # Non-linear correction, actual = sum(coefficients[i] * basis_i(u)) with
+    # u = (measured - center) / scale. Polynomial mode uses 1, u, u^2, ...;
+    # piecewise mode uses 1, u and a hinge max(0, u - k) per knot, which is a
+    # continuous piecewise-linear curve bending at each knot.
+    def __init__(self, mode: str, coefficients: List[float], center: float, scale: float,
+                 knots: Optional[List[float]] = None):
+        self.mode = mode
+        self.coefficients = list(coefficients)
+        self.center = center
+        self.scale = scale
+        self.knots = list(knots or [])
+
+    def basis(self, measured: float) -> List[float]:
+        u = (measured - self.center) / self.scale
+        if self.mode == "polynomial":
+            return [u ** i for i in range(len(self.coefficients))]
+        return [1.0, u] + [max(0.0, u - k) for k in self.knots]
+
+    def __call__(self, measured: float) -> float:
+        # Same operations in the same order as evaluate_numpy, so the scalar
+        # and batch paths agree to the last bit
+        u = (measured - self.center) / self.scale
+        if self.mode == "polynomial":
+            # Horner's rule from the highest power down
+            result = self.coefficients[-1]
+            for c in reversed(self.coefficients[:-1]):
+                result = result * u + c
+            return result
+        result = self.coefficients[0] + self.coefficients[1] * u
+        for c, k in zip(self.coefficients[2:], self.knots):
+            result += c * max(u - k, 0.0)
+        return result
+
+    def evaluate_numpy(self, numpy, raw, out):
+        # out is a float64 array the shape of raw; it may be raw itself
+        u = (raw - self.center) / self.scale
+        if self.mode == "polynomial":
+            out.fill(self.coefficients[-1])
+            for c in reversed(self.coefficients[:-1]):
+                numpy.multiply(out, u, out=out)
+                numpy.add(out, c, out=out)
+        else:
+            numpy.multiply(u, self.coefficients[1], out=out)
+            numpy.add(out, self.coefficients[0], out=out)
+            for c, k in zip(self.coefficients[2:], self.knots):
+                out += c * numpy.maximum(u - k, 0.0)
+        return out
+
+    def to_dict(self) -> Dict:
+        return {"mode": self.mode, "coefficients": self.coefficients,
+                "center": self.center, "scale": self.scale, "knots": self.knots}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CalibrationCurve":
+        return cls(data["mode"], data["coefficients"], data["center"], data["scale"], data.get("knots"))
+
+def fit_calibration(points: List[CalibrationPoint], mode="linear", degree=2,
+                    knots: Optional[List[float]] = None) -> Dict:
+    # Weighted least-squares fit of actual against measured temperature.
+    # Returns slope/intercept (linear) or a CalibrationCurve, plus residuals
+    # and the weighted R^2.
+    if mode not in CALIBRATION_MODES:
+        raise ValueError(f"Unknown calibration mode: {mode}")
+    if any(p.weight <= 0 for p in points):
+        raise ValueError("Point weights must be positive")
+    x = [p.measured_temp for p in points]
+    y = [p.actual_temp for p in points]
+    w = [p.weight for p in points]
+
+    # Centre and scale measured temperatures so high powers stay well conditioned
+    center = sum(xi * wi for xi, wi in zip(x, w)) / sum(w)
+    scale = max(max(x) - min(x), 1.0) / 2
+    if mode == "linear":
+        curve = CalibrationCurve("polynomial", [0.0, 0.0], center, scale)
+    elif mode == "polynomial":
+        degree = int(degree)
+        if not 1 <= degree <= 5:
+            raise ValueError("Polynomial degree must be between 1 and 5")
+        curve = CalibrationCurve("polynomial", [0.0] * (degree + 1), center, scale)
+    else:
+        if not knots:
+            # Default knots split the measured range into thirds
+            low, high = min(x), max(x)
+            knots = [low + (high - low) / 3, low + 2 * (high - low) / 3]
+        curve = CalibrationCurve("piecewise", [], center, scale, [(k - center) / scale for k in sorted(knots)])
+
+    rows = [curve.basis(xi) for xi in x]
+    if len(points) < len(rows[0]):
+        raise ValueError(f"{mode} calibration needs at least {len(rows[0])} points, got {len(points)}")
+    curve.coefficients = solve_weighted_least_squares(rows, y, w)
+
+    residuals = [yi - sum(c * b for c, b in zip(curve.coefficients, row)) for row, yi in zip(rows, y)]
+    total_weight = sum(w)
+    mean_y = sum(yi * wi for yi, wi in zip(y, w)) / total_weight
+    ss_res = sum(wi * r * r for r, wi in zip(residuals, w))
+    ss_tot = sum(wi * (yi - mean_y) ** 2 for yi, wi in zip(y, w))
+    result = {
+        "mode": mode,
+        "points": len(points),
+        "r_squared": 1.0 - ss_res / ss_tot if ss_tot > 0 else 1.0,
+        "rms_residual": (ss_res / total_weight) ** 0.5,
+        "max_abs_residual": max(abs(r) for r in residuals),
+        "residuals": residuals
+    }
+    if mode == "linear":
+        # Undo the centring: actual = c0 + c1 * (measured - center) / scale
+        result["slope"] = curve.coefficients[1] / scale
+        result["intercept"] = curve.coefficients[0] - result["slope"] * center
+    else:
+        result["curve"] = curve
+    return result
 
 class CalibrationManager:
-    def __init__(self, calibration_file="calibration_data.json"):
+    def __init__(self, calibration_file="calibration_data.json", save_delay=1.0):
         self.calibration_file = calibration_file
+        self.save_delay = save_delay
         self.calibrations: Dict[str, SensorCalibration] = {}
+        # Flat (slope, intercept) lookup for calibrated sensors only
+        self._coefficients: Dict[str, Tuple[float, float]] = {}
+        self._curves: Dict[str, CalibrationCurve] = {}
+        self._lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
         self.load_calibrations()
     
     def load_calibrations(self):
@@ -38,34 +211,88 @@ class CalibrationManager:
                             points=points,
                             slope=cal_data.get('slope', 1.0),
                             intercept=cal_data.get('intercept', 0.0),
-                            is_calibrated=cal_data.get('is_calibrated', False)
+                            is_calibrated=cal_data.get('is_calibrated', False),
+                            mode=cal_data.get('mode', 'linear'),
+                            curve=cal_data.get('curve'),
+                            fit=cal_data.get('fit')
                         )
                 print(f"Loaded calibrations for {len(self.calibrations)} sensors")
         except Exception as e:
             print(f"Error loading calibrations: {e}")
             self.calibrations = {}
+        self._refresh_coefficients()
+
+    def _refresh_coefficients(self):
+        # Rebuild the flat lookups used by apply_calibration: (slope, intercept)
+        # for linear calibrations, a CalibrationCurve for the other modes
+        self._coefficients = {
+            name: (cal.slope, cal.intercept)
+            for name, cal in self.calibrations.items()
+            if cal.is_calibrated and cal.mode == "linear"
+        }
+        self._curves = {
+            name: CalibrationCurve.from_dict(cal.curve)
+            for name, cal in self.calibrations.items()
+            if cal.is_calibrated and cal.mode != "linear" and cal.curve
+        }
     
     def save_calibrations(self):
-        # Save calibration data to file
-        try:
-            data = {}
-            for sensor_name, calibration in self.calibrations.items():
-                data[sensor_name] = {
-                    'points': [{'actual_temp': p.actual_temp, 
-                              'measured_temp': p.measured_temp, 
-                              'timestamp': p.timestamp} 
-                             for p in calibration.points],
-                    'slope': calibration.slope,
-                    'intercept': calibration.intercept,
-                    'is_calibrated': calibration.is_calibrated
-                }
-            with open(self.calibration_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving calibrations: {e}")
-    
-    def add_calibration_point(self, sensor_name: str, actual_temp: float, measured_temp: float):
-        # Add a calibration point for a sensor
+        # Save calibration data to file atomically (temp file + rename)
+        with self._lock:
+            self._cancel_pending_save()
+            try:
+                data = {}
+                for sensor_name, calibration in self.calibrations.items():
+                    data[sensor_name] = {
+                        'points': [{'actual_temp': p.actual_temp, 
+                                  'measured_temp': p.measured_temp, 
+                                  'timestamp': p.timestamp,
+                                  'weight': p.weight} 
+                                 for p in calibration.points],
+                        'slope': calibration.slope,
+                        'intercept': calibration.intercept,
+                        'is_calibrated': calibration.is_calibrated,
+                        'mode': calibration.mode,
+                        'curve': calibration.curve,
+                        'fit': calibration.fit
+                    }
+                atomic_write_json(self.calibration_file, data)
+            except Exception as e:
+                print(f"Error saving calibrations: {e}")
+
+    def schedule_save(self):
+        # Coalesce saves: changes made within save_delay share one file write
+        with self._lock:
+            if self.save_delay <= 0:
+                self.save_calibrations()
+                return
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.save_calibrations)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _cancel_pending_save(self):
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+
+    def flush(self):
+        # Write any pending changes immediately
+        with self._lock:
+            if self._save_timer is not None:
+                self.save_calibrations()
+
+    def add_calibration_point(self, sensor_name: str, actual_temp: float, measured_temp: float) -> Dict:
+        # Add a calibration point for a sensor; returns the sensor's point
+        # count and mode after the refit
+        with self._lock:
+            self._add_calibration_point(sensor_name, actual_temp, measured_temp)
+            self._refresh_coefficients()
+            self.schedule_save()
+            cal = self.calibrations[sensor_name]
+            return {'points_count': len(cal.points), 'mode': cal.mode, 'is_calibrated': cal.is_calibrated}
+
+    def _add_calibration_point(self, sensor_name: str, actual_temp: float, measured_temp: float):
         if sensor_name not in self.calibrations:
             self.calibrations[sensor_name] = SensorCalibration(
                 sensor_name=sensor_name,
@@ -78,55 +305,135 @@ class CalibrationManager:
             timestamp=time.time()
         )
         
-        self.calibrations[sensor_name].points.append(point)
-        
-        # Keep only the 3 most recent points
-        if len(self.calibrations[sensor_name].points) > 3:
-            self.calibrations[sensor_name].points = self.calibrations[sensor_name].points[-3:]
-        
-        # Recalculate calibration curve if we have 3 points
-        if len(self.calibrations[sensor_name].points) == 3:
+        # Every stored point is kept, including imported ones, and the whole
+        # set is refitted. A fresh linear calibration waits for 3 points.
+        cal = self.calibrations[sensor_name]
+        cal.points.append(point)
+        if cal.mode != "linear" or len(cal.points) >= 3:
             self._calculate_calibration(sensor_name)
-        
-        self.save_calibrations()
     
     def _calculate_calibration(self, sensor_name: str):
-        # Calculate linear calibration curve using 3 points
+        # Refit the sensor's points in its current mode, keeping the degree
+        # or knots of the existing curve
+        cal = self.calibrations[sensor_name]
+        degree, knots = 2, None
+        if cal.curve:
+            curve = CalibrationCurve.from_dict(cal.curve)
+            if curve.mode == "polynomial":
+                degree = len(curve.coefficients) - 1
+            knots = [k * curve.scale + curve.center for k in curve.knots] or None
         try:
-            cal = self.calibrations[sensor_name]
-            points = cal.points
-            
-            # Simple linear regression for 3 points
-            x = [p.measured_temp for p in points]
-            y = [p.actual_temp for p in points]
-            
-            # Calculate slope and intercept using least squares
-            n = len(x)
-            sum_x = sum(x)
-            sum_y = sum(y)
-            sum_xy = sum(x[i] * y[i] for i in range(n))
-            sum_x2 = sum(x[i] * x[i] for i in range(n))
-            
-            denominator = n * sum_x2 - sum_x * sum_x
-            if denominator != 0:
-                cal.slope = (n * sum_xy - sum_x * sum_y) / denominator
-                cal.intercept = (sum_y - cal.slope * sum_x) / n
-                cal.is_calibrated = True
+            self._store_fit(cal, fit_calibration(cal.points, cal.mode, degree, knots))
+            if cal.mode == "linear":
                 print(f"Calibrated {sensor_name}: slope={cal.slope:.4f}, intercept={cal.intercept:.4f}")
             else:
-                print(f"Calibration failed for {sensor_name}: division by zero")
-                
+                print(f"Calibrated {sensor_name}: {cal.mode} over {len(cal.points)} points, "
+                      f"R^2={cal.fit['r_squared']:.4f}")
+        except ValueError as e:
+            print(f"Calibration failed for {sensor_name}: {e}")
         except Exception as e:
             print(f"Error calculating calibration for {sensor_name}: {e}")
+
+    def _store_fit(self, cal: SensorCalibration, fit: Dict):
+        cal.mode = fit["mode"]
+        if cal.mode == "linear":
+            cal.slope, cal.intercept, cal.curve = fit["slope"], fit["intercept"], None
+        else:
+            cal.slope, cal.intercept, cal.curve = 1.0, 0.0, fit["curve"].to_dict()
+        cal.fit = {key: fit[key] for key in ("r_squared", "rms_residual", "max_abs_residual")}
+        cal.is_calibrated = True
+
+    def import_points(self, points_by_sensor: Dict[str, List[Tuple[float, float, float]]],
+                      mode="linear", degree=2, knots: Optional[List[float]] = None) -> Dict[str, Dict]:
+        # Replace each sensor's calibration with a weighted least-squares fit
+        # over all of its (actual, measured, weight) points. Every sensor is
+        # fitted before anything changes, so a bad batch leaves the current
+        # calibrations alone; the file is written once for the whole batch.
+        now = time.time()
+        fitted = {}
+        for sensor_name, raw_points in points_by_sensor.items():
+            points = [CalibrationPoint(float(a), float(m), now, float(w)) for a, m, w in raw_points]
+            try:
+                fitted[sensor_name] = (points, fit_calibration(points, mode, degree, knots))
+            except ValueError as e:
+                raise ValueError(f"{sensor_name}: {e}")
+
+        with self._lock:
+            for sensor_name, (points, fit) in fitted.items():
+                cal = SensorCalibration(sensor_name=sensor_name, points=points)
+                self._store_fit(cal, fit)
+                self.calibrations[sensor_name] = cal
+            self._refresh_coefficients()
+            self.save_calibrations()
+
+        report = {}
+        for sensor_name, (points, fit) in fitted.items():
+            entry = {key: value for key, value in fit.items() if key != "curve"}
+            if "curve" in fit:
+                entry["curve"] = fit["curve"].to_dict()
+            report[sensor_name] = entry
+        return report
     
     def apply_calibration(self, sensor_name: str, raw_temp: float) -> float:
         # Apply calibration to a raw temperature reading
-        if (sensor_name in self.calibrations and 
-            self.calibrations[sensor_name].is_calibrated):
-            cal = self.calibrations[sensor_name]
-            calibrated_temp = cal.slope * raw_temp + cal.intercept
-            return calibrated_temp
-        return raw_temp
+        coefficients = self._coefficients.get(sensor_name)
+        if coefficients is None:
+            curve = self._curves.get(sensor_name)
+            return raw_temp if curve is None else curve(raw_temp)
+        slope, intercept = coefficients
+        return slope * raw_temp + intercept
+    
+    def apply_calibration_batch(self, sensor_name: str, raw, out=None):
+        # Apply calibration to a whole array of raw readings in one pass.
+        # raw may be a numpy.ndarray of any real dtype or any sequence of
+        # numbers (array.array, list). out, if given, receives the corrected
+        # values and is returned: a float64 ndarray of raw's shape when raw is
+        # an ndarray, otherwise an array.array('d') of raw's length. It may be
+        # raw itself when raw is already float64. Results match
+        # apply_calibration element for element.
+        slope, intercept = self._coefficients.get(sensor_name, (1.0, 0.0))
+        calibrated = sensor_name in self._coefficients
+        curve = self._curves.get(sensor_name)
+
+        numpy = load_numpy() if not isinstance(raw, array) else None
+        if numpy is not None and isinstance(raw, numpy.ndarray):
+            if out is None:
+                out = numpy.empty(raw.shape, dtype=numpy.float64)
+            elif not (isinstance(out, numpy.ndarray) and out.dtype == numpy.float64 and out.shape == raw.shape):
+                raise TypeError(f"out must be a float64 ndarray of shape {raw.shape}")
+            if raw.dtype != numpy.float64:
+                raw = raw.astype(numpy.float64)
+            if curve is not None:
+                curve.evaluate_numpy(numpy, raw, out)
+            elif calibrated:
+                numpy.multiply(raw, slope, out=out)
+                numpy.add(out, intercept, out=out)
+            elif out is not raw:
+                numpy.copyto(out, raw)
+            return out
+
+        if out is not None and not (isinstance(out, array) and out.typecode == 'd' and len(out) == len(raw)):
+            raise TypeError(f"out must be an array('d') of length {len(raw)}")
+        if curve is not None:
+            values = array('d', [curve(x) for x in raw])
+        elif calibrated:
+            values = array('d', [slope * x + intercept for x in raw])
+        else:
+            values = array('d', raw)
+        if out is None:
+            return values
+        out[:] = values
+        return out
+
+    def apply_calibration_batch_multi(self, raw_by_sensor: Dict, out_by_sensor: Optional[Dict] = None) -> Dict:
+        # Apply apply_calibration_batch to several sensors' arrays at once
+        out_by_sensor = out_by_sensor or {}
+        return {
+            sensor_name: self.apply_calibration_batch(
+                sensor_name, raw, out_by_sensor.get(sensor_name)
+            )
+            for sensor_name, raw in raw_by_sensor.items()
+        }
     
     def get_calibration_status(self, sensor_name: str) -> Dict:
         # Get calibration status for a sensor
@@ -135,17 +442,38 @@ class CalibrationManager:
             return {
                 'is_calibrated': cal.is_calibrated,
                 'points_count': len(cal.points),
+                'mode': cal.mode,
                 'slope': cal.slope,
                 'intercept': cal.intercept,
+                'curve': cal.curve,
+                'fit': cal.fit,
                 'points': [{'actual_temp': p.actual_temp, 
                           'measured_temp': p.measured_temp,
-                          'timestamp': p.timestamp} 
+                          'timestamp': p.timestamp,
+                          'weight': p.weight} 
                          for p in cal.points]
             }
         return {'is_calibrated': False, 'points_count': 0}
     
     def clear_calibration(self, sensor_name: str):
         # Clear calibration for a sensor
-        if sensor_name in self.calibrations:
-            del self.calibrations[sensor_name]
-            self.save_calibrations()
\ No newline at end of file
+        with self._lock:
+            if sensor_name in self.calibrations:
+                del self.calibrations[sensor_name]
+                self._refresh_coefficients()
+                self.schedule_save()
+
+# One manager per calibration file, shared by every sensor in the process
+_managers: Dict[str, CalibrationManager] = {}
+_managers_lock = threading.Lock()
+
+def get_calibration_manager(calibration_file="calibration_data.json") -> CalibrationManager:
+    # Return the process-wide manager for calibration_file, loading it once
+    key = os.path.abspath(calibration_file)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = CalibrationManager(calibration_file)
+            _managers[key] = manager
+            atexit.register(manager.flush)
+        return manager
\ No newline at end of file
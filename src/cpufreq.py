@@ -0,0 +1,124 @@
+# cpufreq.py
+# CPU frequency status and control. Status is read straight from the
+# world-readable cpufreq files in sysfs for every core, cached for a short
+# TTL; only writes need root, and those go through one long-lived
+# `sudo cpu-power-helper.sh serve` process instead of a fork per call.
+import glob
+import os
+import re
+import select
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+SYSFS_CPU_ROOT = "/sys/devices/system/cpu"
+HELPER_COMMAND = ['/usr/bin/sudo', '/usr/local/bin/cpu-power-helper.sh', 'serve']
+
+class CpufreqReader:
+    # Per-core governor and frequencies (kHz, as sysfs reports them)
+    FIELDS = {
+        "governor": "scaling_governor",
+        "cur_freq": "scaling_cur_freq",
+        "min_freq": "scaling_min_freq",
+        "max_freq": "scaling_max_freq",
+    }
+
+    def __init__(self, root=SYSFS_CPU_ROOT, ttl=2.0, clock=time.monotonic):
+        self.root = root
+        self.ttl = ttl
+        self.clock = clock
+        self._cached: Optional[List[Dict]] = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+        self.cores = self._discover_cores()
+
+    def _discover_cores(self) -> List[int]:
+        # Cores with a cpufreq directory, in numeric order
+        cores = []
+        for path in glob.glob(os.path.join(self.root, "cpu[0-9]*", "cpufreq")):
+            match = re.search(r"cpu(\d+)", os.path.basename(os.path.dirname(path)))
+            if match:
+                cores.append(int(match.group(1)))
+        return sorted(cores)
+
+    def _read_core(self, core: int) -> Dict:
+        directory = os.path.join(self.root, f"cpu{core}", "cpufreq")
+        status = {"cpu": core}
+        for key, filename in self.FIELDS.items():
+            with open(os.path.join(directory, filename)) as f:
+                value = f.read().strip()
+            status[key] = value if key == "governor" else int(value)
+        return status
+
+    def read(self) -> List[Dict]:
+        # Status of every core, at most ttl seconds old
+        with self._lock:
+            now = self.clock()
+            if self._cached is None or now - self._cached_at >= self.ttl:
+                if not self.cores:
+                    raise RuntimeError(f"No cpufreq entries under {self.root}")
+                self._cached = [self._read_core(core) for core in self.cores]
+                self._cached_at = now
+            return self._cached
+
+    def invalidate(self):
+        # Drop the cache so the next read reflects a change just made
+        with self._lock:
+            self._cached = None
+
+class HelperChannel:
+    # Line protocol to a privileged helper kept running for the life of the
+    # app: one command per line in, one response line out. The helper is
+    # started on first use and restarted if it has exited.
+    def __init__(self, command=None, timeout=10.0):
+        self.command = command or HELPER_COMMAND
+        self.timeout = timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_running(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True, bufsize=1
+            )
+        return self._proc
+
+    def request(self, command: str) -> str:
+        with self._lock:
+            proc = self._ensure_running()
+            try:
+                proc.stdin.write(command + "\n")
+                proc.stdin.flush()
+            except BrokenPipeError:
+                # Helper exited since the last call; start a fresh one once
+                self._proc = None
+                proc = self._ensure_running()
+                proc.stdin.write(command + "\n")
+                proc.stdin.flush()
+            ready, _, _ = select.select([proc.stdout], [], [], self.timeout)
+            if not ready:
+                self._kill()
+                raise TimeoutError("Helper script timeout - check if helper script is installed correctly")
+            line = proc.stdout.readline()
+            if not line:
+                self._kill()
+                raise RuntimeError("Helper script exited - check sudoers and helper installation")
+            return line.strip()
+
+    def _kill(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.stdin.close()
+                try:
+                    self._proc.wait(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    self._kill()
+            self._proc = None
@@ -0,0 +1,134 @@
+# filters.py
+# Per-sensor smoothing between the raw MAX6675 reading and the published
+# temperature. Every stage keeps a fixed amount of state, so each sample costs
+# constant time and memory no matter how long the cook runs.
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, List, Optional
+
+class SpikeFilter:
+    # Drops samples that jump more than max_jump_c from the last accepted one,
+    # e.g. a corrupted SPI frame. After max_rejects rejections in a row the
+    # jump is treated as real (probe moved, lid opened) and accepted.
+    name = "spike"
+
+    def __init__(self, max_jump_c=15.0, max_rejects=3):
+        self.max_jump_c = float(max_jump_c)
+        self.max_rejects = int(max_rejects)
+        self.reset()
+
+    def reset(self):
+        self._last: Optional[float] = None
+        self._rejects = 0
+
+    def process(self, value: float) -> Optional[float]:
+        if self._last is not None and abs(value - self._last) > self.max_jump_c:
+            self._rejects += 1
+            if self._rejects <= self.max_rejects:
+                return None
+        self._rejects = 0
+        self._last = value
+        return value
+
+    def config(self) -> Dict:
+        return {"max_jump_c": self.max_jump_c, "max_rejects": self.max_rejects}
+
+class MedianFilter:
+    # Rolling median over the last `window` samples
+    name = "median"
+
+    def __init__(self, window=3):
+        self.window = int(window)
+        if self.window < 1:
+            raise ValueError("median window must be at least 1")
+        self.reset()
+
+    def reset(self):
+        self._samples = deque()
+        self._sorted: List[float] = []
+
+    def process(self, value: float) -> Optional[float]:
+        self._samples.append(value)
+        insort(self._sorted, value)
+        if len(self._samples) > self.window:
+            del self._sorted[bisect_left(self._sorted, self._samples.popleft())]
+        n = len(self._sorted)
+        mid = n // 2
+        return self._sorted[mid] if n % 2 else (self._sorted[mid - 1] + self._sorted[mid]) / 2
+
+    def config(self) -> Dict:
+        return {"window": self.window}
+
+class KalmanFilter:
+    # 1-D Kalman filter for a slowly drifting temperature: process_variance is
+    # how much the true temperature may move between samples, measurement
+    # variance how noisy each reading is (both in °C²)
+    name = "kalman"
+
+    def __init__(self, process_variance=0.05, measurement_variance=0.5):
+        self.process_variance = float(process_variance)
+        self.measurement_variance = float(measurement_variance)
+        if self.process_variance <= 0 or self.measurement_variance <= 0:
+            raise ValueError("kalman variances must be positive")
+        self.reset()
+
+    def reset(self):
+        self._estimate: Optional[float] = None
+        self._error = 1.0
+
+    def process(self, value: float) -> Optional[float]:
+        if self._estimate is None:
+            self._estimate = value
+            self._error = self.measurement_variance
+            return value
+        self._error += self.process_variance
+        gain = self._error / (self._error + self.measurement_variance)
+        self._estimate += gain * (value - self._estimate)
+        self._error *= 1 - gain
+        return self._estimate
+
+    def config(self) -> Dict:
+        return {
+            "process_variance": self.process_variance,
+            "measurement_variance": self.measurement_variance
+        }
+
+# Stages run in this order when enabled
+FILTER_TYPES = {cls.name: cls for cls in (SpikeFilter, MedianFilter, KalmanFilter)}
+
+DEFAULT_FILTERS = {
+    "spike": {"max_jump_c": 15.0, "max_rejects": 3},
+    "median": {"window": 3},
+    "kalman": {"process_variance": 0.05, "measurement_variance": 0.5},
+}
+
+class FilterPipeline:
+    # Chain of filter stages. A stage returning None drops the sample and the
+    # pipeline repeats its previous output.
+    def __init__(self, config: Optional[Dict] = None):
+        config = DEFAULT_FILTERS if config is None else config
+        unknown = set(config) - set(FILTER_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+        self.stages = [
+            FILTER_TYPES[name](**(config[name] or {}))
+            for name in FILTER_TYPES
+            if name in config and config[name] is not False
+        ]
+        self._output: Optional[float] = None
+
+    def process(self, value: float) -> Optional[float]:
+        for stage in self.stages:
+            value = stage.process(value)
+            if value is None:
+                return self._output
+        self._output = value
+        return value
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+        self._output = None
+
+    def config(self) -> Dict:
+        return {stage.name: stage.config() for stage in self.stages}
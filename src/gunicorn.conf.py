@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+# Production server for Pi-tMaster: gunicorn -c gunicorn.conf.py wsgi:app
+# (python run_pitmaster.py starts the same thing)
+import os
+
+bind = os.environ.get('PITMASTER_BIND', '0.0.0.0:8080')
+
+# A single gevent worker is the one process that owns the SPI bus, the sensor
+# thread and all in-memory state (snapshots, calibration, simulation mode).
+# gevent multiplexes every connection onto greenlets inside it, so adding
+# workers would only add processes fighting over the bus, not capacity.
+workers = 1
+worker_class = 'gevent'
+worker_connections = 1000
+
+# The app is built inside the worker, never in the master, so hardware is
+# opened exactly once and released when the worker exits.
+preload_app = False
+
+def post_request(worker, req, environ, resp):
+    # The worker keeps reading a keep-alive connection for as long as its
+    # next request is already waiting, so without a yield one busy client
+    # can hold the loop while every other connection queues behind it.
+    # Going to the back of the run queue after each request serves ready
+    # connections in turn, which is what keeps p99 close to p50.
+    import gevent
+    gevent.sleep(0)
+
+keepalive = 5
+timeout = 30
+graceful_timeout = 10
+
+accesslog = None
+errorlog = '-'
+loglevel = 'info'
@@ -0,0 +1,59 @@
+# history_routes.py
+# /history and /history/export over a HistoryStore, shared by the unit app
+# and the hub app. Both negotiate a compact binary encoding via Accept.
+from typing import Callable, Iterable
+
+from flask import Flask, Response, jsonify, request
+
+from history_store import HistoryStore
+from telemetry import FRAME_LAYOUT, FRAMES, JSON, encode, frames_header, negotiate, pack_frames
+
+def negotiated(app: Flask, value):
+    # JSON, or CBOR/MessagePack when the client's Accept header prefers it
+    media_type = negotiate(request.accept_mimetypes)
+    if media_type == JSON:
+        response = jsonify(value)
+    else:
+        response = app.response_class(encode(media_type, value), mimetype=media_type)
+    response.vary.add('Accept')
+    return response
+
+def add_history_routes(app: Flask, history: HistoryStore, is_sensor: Callable[[str], bool],
+                       default_sensors: Callable[[], Iterable[str]], now: Callable[[], float]):
+
+    @app.route('/history')
+    def get_history():
+        # Stored readings for one sensor: /history?sensor=&from=&to=&resolution=
+        sensor_name = request.args.get('sensor', '')
+        if not is_sensor(sensor_name):
+            return jsonify({"status": "error", "message": "Invalid sensor name"}), 400
+        try:
+            end = request.args.get('to', now(), type=float)
+            start = request.args.get('from', end - 3600, type=float)
+            resolution = request.args.get('resolution', 'auto')
+            return negotiated(app, history.query(sensor_name, start, end, resolution))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/history/export')
+    def export_history():
+        # Raw readings as fixed-size frames (see telemetry.py):
+        # /history/export?sensor=&sensor=&from=&to=, every sensor by default,
+        # the last 24 hours by default. Streamed one database batch at a time.
+        names = request.args.getlist('sensor') or list(default_sensors())
+        invalid = [name for name in names if not is_sensor(name)]
+        if invalid:
+            return jsonify({"status": "error", "message": f"Invalid sensor name: {invalid[0]}"}), 400
+        end = request.args.get('to', now(), type=float)
+        start = request.args.get('from', end - 24 * 3600, type=float)
+
+        def frames():
+            yield frames_header(names)
+            for sensor_id, name in enumerate(names):
+                for rows in history.iter_raw(name, start, end):
+                    yield pack_frames(sensor_id, rows)
+
+        return Response(frames(), mimetype=FRAMES, headers={
+            'X-Frame-Layout': FRAME_LAYOUT,
+            'Content-Disposition': 'attachment; filename="history.ptmf"'
+        })
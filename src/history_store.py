@@ -0,0 +1,291 @@
+# history_store.py
+import atexit
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Rollup tiers: name -> bucket width in seconds
+ROLLUP_TIERS = {
+    "1m": 60,
+    "15m": 900,
+}
+
+# Default retention per tier in seconds, sized so a year of cooks stays a few
+# tens of MB and the raw tier is rewritten rarely
+DEFAULT_RETENTION = {
+    "raw": 7 * 24 * 3600,
+    "1m": 90 * 24 * 3600,
+    "15m": 5 * 365 * 24 * 3600,
+}
+
+@dataclass
+class RollupBucket:
+    start: float
+    count: int = 0
+    temp_min: float = float("inf")
+    temp_max: float = float("-inf")
+    temp_sum: float = 0.0
+    raw_min: float = float("inf")
+    raw_max: float = float("-inf")
+    raw_sum: float = 0.0
+
+    def add(self, raw_c: float, temp_c: float):
+        self.count += 1
+        self.temp_min = min(self.temp_min, temp_c)
+        self.temp_max = max(self.temp_max, temp_c)
+        self.temp_sum += temp_c
+        self.raw_min = min(self.raw_min, raw_c)
+        self.raw_max = max(self.raw_max, raw_c)
+        self.raw_sum += raw_c
+
+    def row(self) -> Tuple:
+        return (self.start, self.count,
+                self.temp_min, self.temp_max, self.temp_sum / self.count,
+                self.raw_min, self.raw_max, self.raw_sum / self.count)
+
+class HistoryStore:
+    # Append-only SQLite history of every probe's raw and calibrated readings.
+    # record() only touches memory; rows are written in one transaction every
+    # flush_interval seconds to keep SD card writes few and large. 1-minute and
+    # 15-minute min/max/mean rollups are accumulated as samples arrive, so
+    # queries never aggregate raw rows. clock must be the one record() callers
+    # stamp readings with, since retention is measured against it.
+    def __init__(self, db_path="history.db", flush_interval=60.0, retention=None, clock=time.time):
+        self.db_path = db_path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.retention = dict(DEFAULT_RETENTION)
+        self.retention.update(retention or {})
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending_raw: List[Tuple] = []
+        self._pending_rollups: Dict[str, List[Tuple]] = {tier: [] for tier in ROLLUP_TIERS}
+        self._buckets: Dict[Tuple[str, str], RollupBucket] = {}
+        self._last_prune = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        # Optional source of (start, end) ranges whose raw readings outlive
+        # the raw retention, e.g. recorded cook sessions
+        self.retain_ranges: Optional[Callable[[], List[Tuple[float, float]]]] = None
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_schema()
+        self._sensor_ids = dict(self._db.execute("SELECT name, id FROM sensors"))
+
+    def _create_schema(self):
+        # WAL plus synchronous=NORMAL: one fsync per checkpoint instead of per commit
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sensors (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS samples_raw ("
+            "sensor_id INTEGER NOT NULL, ts REAL NOT NULL, raw_c REAL, temp_c REAL, "
+            "PRIMARY KEY (sensor_id, ts)) WITHOUT ROWID"
+        )
+        for tier in ROLLUP_TIERS:
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS samples_{tier} ("
+                "sensor_id INTEGER NOT NULL, ts REAL NOT NULL, count INTEGER, "
+                "temp_min REAL, temp_max REAL, temp_mean REAL, "
+                "raw_min REAL, raw_max REAL, raw_mean REAL, "
+                "PRIMARY KEY (sensor_id, ts)) WITHOUT ROWID"
+            )
+        self._db.commit()
+
+    def _sensor_id(self, sensor: str) -> int:
+        # Caller holds _db_lock
+        sensor_id = self._sensor_ids.get(sensor)
+        if sensor_id is None:
+            cursor = self._db.execute("INSERT OR IGNORE INTO sensors (name) VALUES (?)", (sensor,))
+            sensor_id = cursor.lastrowid or self._db.execute(
+                "SELECT id FROM sensors WHERE name = ?", (sensor,)
+            ).fetchone()[0]
+            self._sensor_ids[sensor] = sensor_id
+        return sensor_id
+
+    def record(self, sensor: str, timestamp: float, raw_c: float, temp_c: float):
+        # Buffer one reading and fold it into the open rollup buckets
+        with self._lock:
+            self._pending_raw.append((sensor, timestamp, raw_c, temp_c))
+            for tier, width in ROLLUP_TIERS.items():
+                start = timestamp - timestamp % width
+                bucket = self._buckets.get((sensor, tier))
+                if bucket is None or bucket.start != start:
+                    if bucket is not None and bucket.count:
+                        self._pending_rollups[tier].append((sensor, bucket))
+                    bucket = RollupBucket(start)
+                    self._buckets[(sensor, tier)] = bucket
+                bucket.add(raw_c, temp_c)
+
+    def flush(self):
+        # Write everything buffered so far in a single transaction
+        with self._lock:
+            if self._closed:
+                return
+            pending_raw, self._pending_raw = self._pending_raw, []
+            pending_rollups = self._pending_rollups
+            self._pending_rollups = {tier: [] for tier in ROLLUP_TIERS}
+            # Open buckets are written as they stand and replaced once they close
+            for (sensor, tier), bucket in self._buckets.items():
+                pending_rollups[tier].append((sensor, bucket))
+            rollup_rows = {
+                tier: [(sensor, bucket.row()) for sensor, bucket in buckets]
+                for tier, buckets in pending_rollups.items()
+            }
+
+        if not pending_raw and not any(rollup_rows.values()):
+            return
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO samples_raw VALUES (?, ?, ?, ?)",
+                    [(self._sensor_id(s), ts, raw, temp) for s, ts, raw, temp in pending_raw]
+                )
+                for tier, rows in rollup_rows.items():
+                    self._db.executemany(
+                        f"INSERT OR REPLACE INTO samples_{tier} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(self._sensor_id(s),) + row for s, row in rows]
+                    )
+                self._db.commit()
+                self._prune()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Writing history: {e}")
+
+    def _prune(self):
+        # Drop rows past each tier's retention, at most once an hour (caller holds _db_lock)
+        now = self.clock()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        # One delete per sensor: the tables are keyed on (sensor_id, ts), so a
+        # condition on ts alone would scan every row instead of a key range
+        sensor_ids = list(self._sensor_ids.values())
+        for tier, keep in self.retention.items():
+            if tier == "raw" and self.retain_ranges is not None:
+                ranges = list(self._unretained(now - keep, self.retain_ranges()))
+                self._db.executemany(
+                    "DELETE FROM samples_raw WHERE sensor_id = ? AND ts > ? AND ts < ?",
+                    [(sensor_id, low, high) for sensor_id in sensor_ids for low, high in ranges]
+                )
+            else:
+                self._db.executemany(
+                    f"DELETE FROM samples_{tier} WHERE sensor_id = ? AND ts < ?",
+                    [(sensor_id, now - keep) for sensor_id in sensor_ids]
+                )
+        self._db.commit()
+
+    @staticmethod
+    def _unretained(cutoff: float, ranges: List[Tuple[float, float]]) -> Iterator[Tuple[float, float]]:
+        # Open intervals before cutoff not covered by any retained range
+        low = float("-inf")
+        for start, end in sorted(ranges):
+            if start >= cutoff:
+                break
+            if start > low:
+                yield low, start
+            low = max(low, end)
+        if low < cutoff:
+            yield low, cutoff
+
+    @staticmethod
+    def pick_resolution(start: float, end: float) -> str:
+        # Coarsest tier that still gives a few hundred points over the span
+        span = end - start
+        if span > 3 * 24 * 3600:
+            return "15m"
+        if span > 6 * 3600:
+            return "1m"
+        return "raw"
+
+    def query(self, sensor: str, start: float, end: float, resolution="raw") -> Dict:
+        # Columnar readings for one sensor between start and end (unix seconds)
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        if resolution != "raw" and resolution not in ROLLUP_TIERS:
+            raise ValueError(f"Unknown resolution '{resolution}'")
+
+        with self._db_lock:
+            sensor_id = self._sensor_ids.get(sensor)
+            rows = []
+            if sensor_id is not None:
+                if resolution == "raw":
+                    sql = "SELECT ts, raw_c, temp_c FROM samples_raw"
+                else:
+                    sql = (f"SELECT ts, temp_min, temp_max, temp_mean, raw_min, raw_max, raw_mean "
+                           f"FROM samples_{resolution}")
+                rows = self._db.execute(
+                    sql + " WHERE sensor_id = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+                    (sensor_id, start, end)
+                ).fetchall()
+
+        if resolution == "raw":
+            # Include readings still waiting for the next flush
+            with self._lock:
+                rows += [(ts, raw, temp) for s, ts, raw, temp in self._pending_raw
+                         if s == sensor and start <= ts <= end]
+            columns = ("ts", "raw_c", "temp_c")
+        else:
+            columns = ("ts", "temp_min", "temp_max", "temp_mean", "raw_min", "raw_max", "raw_mean")
+
+        result = {"sensor": sensor, "resolution": resolution, "count": len(rows)}
+        for index, column in enumerate(columns):
+            result[column] = [row[index] for row in rows]
+        return result
+
+    def iter_raw(self, sensor: str, start: float, end: float,
+                 batch=4096) -> Iterator[List[Tuple[float, float, float]]]:
+        # Raw (ts, raw_c, temp_c) rows for one sensor in ts order, batch rows
+        # at a time, so an export of a long cook never holds more than one
+        # batch. Pending readings are flushed first so the database has them all.
+        self.flush()
+        with self._db_lock:
+            sensor_id = self._sensor_ids.get(sensor)
+        if sensor_id is None:
+            return
+        sql = ("SELECT ts, raw_c, temp_c FROM samples_raw "
+               "WHERE sensor_id = ? AND ts {} ? AND ts <= ? ORDER BY ts LIMIT ?")
+        rows = None
+        while rows is None or len(rows) == batch:
+            # Keyset pagination: each batch starts after the last ts seen
+            with self._db_lock:
+                if rows is None:
+                    rows = self._db.execute(sql.format(">="), (sensor_id, start, end, batch)).fetchall()
+                else:
+                    rows = self._db.execute(sql.format(">"), (sensor_id, rows[-1][0], end, batch)).fetchall()
+            if rows:
+                yield rows
+
+    def sensors(self) -> List[str]:
+        # Names of every sensor with stored or pending readings
+        with self._lock:
+            names = {row[0] for row in self._pending_raw}
+        with self._db_lock:
+            names.update(self._sensor_ids)
+        return sorted(names)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        # Flush in the background so the sensor loop never waits on the SD card
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        with self._db_lock:
+            self._db.close()
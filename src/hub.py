@@ -0,0 +1,366 @@
+# hub.py
+# Hub mode: one Pi-tMaster aggregating the readings of many remote units.
+# Every unit is followed with long-polls on its /data?since=<version> over a
+# kept-alive HTTP/1.1 connection, and all units share a single poller thread
+# multiplexed with selectors, so dozens of units cost sockets, not threads.
+# Units are asked for the compact CBOR reading set; older units that only
+# speak JSON are followed just the same.
+import errno
+import json
+import os
+import random
+import re
+import selectors
+import socket
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from snapshot import SnapshotPublisher, make_reading, with_error
+from telemetry import CBOR, decode_cbor, expand_reading_set
+
+UNIT_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+class HubError(Exception):
+    pass
+
+def parse_units(spec: str) -> Dict[str, str]:
+    # "pit1=http://10.0.0.5:8080,pit2=http://pit2.local:8080" -> {name: url}
+    units = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        name = name.strip()
+        if not sep or not UNIT_NAME.match(name):
+            raise ValueError(f"Invalid hub unit '{item}', expected name=http://host:port")
+        if name in units:
+            raise ValueError(f"Duplicate hub unit '{name}'")
+        units[name] = url.strip()
+    return units
+
+class RemoteUnit:
+    # Connection and follow state for one remote unit. Only the poller
+    # thread writes these fields; status readers get plain values.
+    def __init__(self, name: str, url: str):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Unit {name}: only http://host[:port] URLs are supported")
+        self.name = name
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/data"
+
+        self.sock: Optional[socket.socket] = None
+        self.handshaking = False
+        self.requests_on_sock = 0
+        self.outgoing = b""
+        self.incoming = bytearray()
+        self.deadline: Optional[float] = None
+        self.retry_at = 0.0
+
+        self.up = False
+        self.version = -1
+        self.last_updated = None
+        self.simulation_mode = False
+        self.last_seen: Optional[float] = None
+        self.updates = 0
+        self.errors = 0
+        self.connects = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def status(self, now: float) -> Dict:
+        return {
+            "url": self.url,
+            "up": self.up,
+            "version": self.version,
+            "last_updated": self.last_updated,
+            "simulation_mode": self.simulation_mode,
+            "last_seen": self.last_seen,
+            "updates": self.updates,
+            "errors": self.errors,
+            "connects": self.connects,
+            "last_error": self.last_error,
+            "retry_in": None if self.up else round(max(0.0, self.retry_at - now), 1)
+        }
+
+def parse_response(buffer: bytearray):
+    # (status, headers, body, keep_alive) once a whole response is buffered,
+    # else None. Bodies must carry a Content-Length, which /data always does.
+    head_end = buffer.find(b"\r\n\r\n")
+    if head_end < 0:
+        return None
+    lines = bytes(buffer[:head_end]).decode("latin-1").split("\r\n")
+    status_line = lines[0].split(" ", 2)
+    if len(status_line) < 2 or not status_line[0].startswith("HTTP/"):
+        raise HubError(f"Malformed status line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HubError("Chunked responses are not supported")
+    body_start = head_end + 4
+    body_end = body_start + int(headers.get("content-length", "0"))
+    if len(buffer) < body_end:
+        return None
+    body = bytes(buffer[body_start:body_end])
+    del buffer[:body_end]
+    connection = headers.get("connection", "").lower()
+    if status_line[0] == "HTTP/1.1":
+        keep_alive = connection != "close"
+    else:
+        keep_alive = connection == "keep-alive"
+    return int(status_line[1]), headers, body, keep_alive
+
+class HubPoller:
+    # Follows every unit's /data with long-polls from one thread. Failed
+    # units are retried with exponential backoff (with jitter, so units
+    # that dropped together do not reconnect in lockstep).
+    def __init__(self, units: Dict[str, str],
+                 on_update: Callable[[RemoteUnit, Dict], None],
+                 on_down: Callable[[RemoteUnit], None],
+                 poll_timeout=25.0, connect_timeout=5.0,
+                 min_backoff=1.0, max_backoff=60.0, clock=time.monotonic):
+        self.units = {name: RemoteUnit(name, url) for name, url in units.items()}
+        self.on_update = on_update
+        self.on_down = on_down
+        self.poll_timeout = poll_timeout
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._selector = selectors.DefaultSelector()
+        self._running = False
+
+    def _request(self, unit: RemoteUnit) -> bytes:
+        return (
+            f"GET {unit.path}?since={unit.version}&timeout={self.poll_timeout:g} HTTP/1.1\r\n"
+            f"Host: {unit.host}:{unit.port}\r\n"
+            "Accept: application/cbor, application/json;q=0.5\r\n"
+            "Connection: keep-alive\r\n"
+            "User-Agent: pitmaster-hub\r\n\r\n"
+        ).encode("ascii")
+
+    def _connect(self, unit: RemoteUnit):
+        family, kind, proto, _, address = socket.getaddrinfo(
+            unit.host, unit.port, type=socket.SOCK_STREAM)[0]
+        sock = socket.socket(family, kind, proto)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        err = sock.connect_ex(address)
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            raise OSError(err, os.strerror(err))
+        unit.sock = sock
+        unit.handshaking = True
+        unit.connects += 1
+
+    def _send_request(self, unit: RemoteUnit, now: float):
+        timeout = self.poll_timeout + self.connect_timeout
+        if unit.sock is None:
+            self._connect(unit)
+            self._selector.register(unit.sock, selectors.EVENT_WRITE, unit)
+        else:
+            self._selector.modify(unit.sock, selectors.EVENT_WRITE, unit)
+        unit.outgoing = self._request(unit)
+        unit.requests_on_sock += 1
+        unit.deadline = now + timeout
+
+    def _close(self, unit: RemoteUnit):
+        if unit.sock is not None:
+            try:
+                self._selector.unregister(unit.sock)
+            except (KeyError, ValueError):
+                pass
+            unit.sock.close()
+        unit.sock = None
+        unit.handshaking = False
+        unit.requests_on_sock = 0
+        unit.outgoing = b""
+        unit.incoming.clear()
+
+    def _on_writable(self, unit: RemoteUnit):
+        if unit.handshaking:
+            err = unit.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise OSError(err, os.strerror(err))
+            unit.handshaking = False
+        sent = unit.sock.send(unit.outgoing)
+        unit.outgoing = unit.outgoing[sent:]
+        if not unit.outgoing:
+            self._selector.modify(unit.sock, selectors.EVENT_READ, unit)
+
+    def _on_readable(self, unit: RemoteUnit):
+        chunk = unit.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed by unit")
+        unit.incoming += chunk
+        parsed = parse_response(unit.incoming)
+        if parsed is None:
+            return
+        status, headers, body, keep_alive = parsed
+        unit.deadline = None
+        if not keep_alive:
+            self._close(unit)
+        if status == 200:
+            if "x-snapshot-version" not in headers:
+                raise HubError("Unit does not support long-polling (no X-Snapshot-Version)")
+            if headers.get("content-type", "").split(";")[0].strip() == CBOR:
+                data = expand_reading_set(decode_cbor(body))
+            else:
+                data = json.loads(body)
+            unit.version = int(headers["x-snapshot-version"])
+            self._succeeded(unit)
+            unit.updates += 1
+            self.on_update(unit, data)
+        elif status == 304:
+            self._succeeded(unit)
+        else:
+            raise HubError(f"HTTP {status} from {unit.path}")
+
+    def _succeeded(self, unit: RemoteUnit):
+        unit.failures = 0
+        unit.retry_at = 0.0
+        unit.last_seen = time.time()
+        if not unit.up:
+            unit.up = True
+            print(f"[hub] {unit.name} connected ({unit.url})")
+
+    def _fail(self, unit: RemoteUnit, error: Exception):
+        # A kept-alive connection the unit closed before answering is
+        # retried at once on a fresh one; anything else backs off
+        stale = (unit.requests_on_sock > 1 and not unit.incoming
+                 and isinstance(error, (ConnectionError, BrokenPipeError)))
+        self._close(unit)
+        unit.deadline = None
+        if stale:
+            unit.retry_at = 0.0
+            return
+        unit.failures += 1
+        unit.errors += 1
+        unit.last_error = str(error) or type(error).__name__
+        delay = min(self.max_backoff, self.min_backoff * 2 ** (unit.failures - 1))
+        unit.retry_at = self.clock() + delay * random.uniform(0.5, 1.0)
+        if unit.up:
+            unit.up = False
+            print(f"[hub] {unit.name} unreachable: {unit.last_error}")
+            self.on_down(unit)
+        elif unit.failures == 1:
+            print(f"[hub] {unit.name} not reachable yet: {unit.last_error}")
+
+    def poll_once(self, max_wait=1.0):
+        # Start due requests, wait for socket activity and expire deadlines
+        now = self.clock()
+        wake = now + max_wait
+        for unit in self.units.values():
+            if unit.deadline is None:
+                if now >= unit.retry_at:
+                    try:
+                        self._send_request(unit, now)
+                    except Exception as e:
+                        self._fail(unit, e)
+                        continue
+                else:
+                    wake = min(wake, unit.retry_at)
+                    continue
+            wake = min(wake, unit.deadline)
+
+        for key, mask in self._selector.select(max(0.0, wake - now)):
+            unit = key.data
+            try:
+                if mask & selectors.EVENT_WRITE:
+                    self._on_writable(unit)
+                elif mask & selectors.EVENT_READ:
+                    self._on_readable(unit)
+            except Exception as e:
+                self._fail(unit, e)
+
+        now = self.clock()
+        for unit in self.units.values():
+            if unit.deadline is not None and now >= unit.deadline:
+                self._fail(unit, TimeoutError("No response before the request deadline"))
+
+    def _run(self):
+        while self._running:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"[ERROR] Hub poller: {e}")
+                time.sleep(1.0)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._running = False
+
+class Hub:
+    # Merges every unit's latest readings into one namespaced reading set
+    # ("<unit>/<sensor>") on the hub's publisher, and records them in the
+    # hub's history under the same names
+    def __init__(self, units: Dict[str, str], publisher: SnapshotPublisher, history,
+                 poll_timeout=25.0):
+        self.publisher = publisher
+        self.history = history
+        self._readings: Dict[str, Mapping] = {}
+        self._lock = threading.Lock()
+        self.poller = HubPoller(units, self._on_update, self._on_down, poll_timeout)
+        with self._lock:
+            self._publish()
+
+    @property
+    def units(self) -> Dict[str, RemoteUnit]:
+        return self.poller.units
+
+    def is_sensor(self, name: str) -> bool:
+        # Namespaced names of configured units, whether or not they have reported yet
+        unit, sep, sensor = name.partition("/")
+        return bool(sep and sensor) and unit in self.units
+
+    def status(self) -> Dict:
+        now = self.poller.clock()
+        return {name: unit.status(now) for name, unit in self.units.items()}
+
+    def _publish(self):
+        # Caller holds _lock
+        self.publisher.publish({
+            **self._readings,
+            "units": self.status(),
+            "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+
+    def _on_update(self, unit: RemoteUnit, data: Dict):
+        now = time.time()
+        unit.last_updated = data.get("last_updated")
+        unit.simulation_mode = bool(data.get("simulation_mode"))
+        with self._lock:
+            for key, value in data.items():
+                if not isinstance(value, dict) or "temp_c" not in value:
+                    continue
+                name = f"{unit.name}/{key}"
+                reading = make_reading(value["temp_c"], value["temp_f"], value["raw_temp_c"], value["error"])
+                self._readings[name] = reading
+                # A unit in simulation mode still shows its values, but like the
+                # unit itself the hub keeps them out of the history
+                if reading["error"] is None and not unit.simulation_mode:
+                    self.history.record(name, now, reading["raw_temp_c"], reading["temp_c"])
+            self._publish()
+
+    def _on_down(self, unit: RemoteUnit):
+        # Keep the unit's last values but flag them so clients can tell
+        prefix = unit.name + "/"
+        with self._lock:
+            for name, reading in self._readings.items():
+                if name.startswith(prefix):
+                    self._readings[name] = with_error(reading, f"Unit unreachable: {unit.last_error}")
+            self._publish()
+
+    def start(self):
+        self.poller.start()
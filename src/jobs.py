@@ -0,0 +1,61 @@
+# jobs.py
+# Background jobs for slow requests (sensor tests, calibration capture).
+# POST starts a job and returns its id straight away; the client polls
+# GET /jobs/<id> for the result instead of holding a request open.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = os.urandom(6).hex()
+        self.kind = kind
+        self.status = "pending"
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+class JobManager:
+    # Runs each job on its own thread (a greenlet under gevent) and keeps the
+    # most recent max_jobs jobs for polling
+    def __init__(self, max_jobs=100):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[], Dict]) -> Job:
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, func), daemon=True).start()
+        return job
+
+    def _run(self, job: Job, func: Callable[[], Dict]):
+        job.status = "running"
+        try:
+            job.result = func()
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "error"
+        job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -0,0 +1,164 @@
+# max6675_emulator.py
+# Software stand-in for the MAX6675 boards: a transport for Max6675Bus that
+# produces real 16-bit frames from a simple smoker/meat thermal model, so the
+# whole app can run and be load-tested on a machine without SPI or GPIO.
+import math
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pit_controller import native_lock
+from sim_clock import SystemClock
+
+# MAX6675 frame layout: D14..D3 temperature in 0.25 °C counts, D2 open thermocouple
+OPEN_CIRCUIT_BIT = 0x04
+MAX_COUNTS = 0x0FFF
+
+def encode_frame(temp_c: float, open_circuit=False) -> int:
+    # Build the 16-bit word a MAX6675 would clock out for temp_c
+    counts = min(MAX_COUNTS, max(0, int(round(temp_c / 0.25))))
+    word = counts << 3
+    if open_circuit:
+        word |= OPEN_CIRCUIT_BIT
+    return word
+
+@dataclass
+class SmokerConfig:
+    ambient_c: float = 20.0
+    pit_setpoint_c: float = 110.0           # pit target while no blower is attached
+    max_pit_c: float = 200.0                # pit target with the blower at 100%
+    pit_time_constant: float = 900.0        # seconds to close 63% of the gap to setpoint
+    lid_time_constant: float = 90.0         # same, towards ambient, while the lid is open
+    meat_start_c: float = 5.0
+    meat_time_constant: float = 4 * 3600.0
+    stall_center_c: float = 70.0            # evaporative stall, roughly 65-75 °C
+    stall_width_c: float = 5.0
+    stall_strength: float = 3.0             # time constant multiplier at the stall peak
+    lid_open_interval: float = 2 * 3600.0   # mean seconds between lid openings, 0 disables
+    lid_open_duration: float = 60.0
+    noise_c: float = 0.25                   # standard deviation of probe noise
+    open_circuit_rate: float = 0.0          # chance per read of an open-thermocouple frame
+    short_frame_rate: float = 0.0           # chance per read of a truncated SPI frame
+    seed: Optional[int] = None
+
+class SmokerPlant:
+    # First-order thermal model of a pit and one piece of meat. State is
+    # advanced lazily from the clock whenever it is read, so it follows a
+    # ScaledClock at any speed without a thread of its own.
+    MAX_STEP = 1.0
+
+    def __init__(self, config: Optional[SmokerConfig] = None, clock=None):
+        self.config = config or SmokerConfig()
+        self.clock = clock or SystemClock()
+        self.rng = random.Random(self.config.seed)
+        self.pit_c = self.config.ambient_c
+        self.meat_c = self.config.meat_start_c
+        self.lid_open_until = None
+        self.blower_duty: Optional[float] = None
+        self._last = self.clock.monotonic()
+        self._next_lid_open = self._schedule_lid_open(self._last)
+        # Shared by the sensor loop and the native control thread driving
+        # the blower (see pit_controller.py)
+        self._lock = native_lock()
+
+    def _schedule_lid_open(self, now: float) -> Optional[float]:
+        if self.config.lid_open_interval <= 0:
+            return None
+        return now + self.rng.expovariate(1.0 / self.config.lid_open_interval)
+
+    def open_lid(self, duration: Optional[float] = None):
+        # Force a lid-open event starting now
+        with self._lock:
+            self._advance()
+            self.lid_open_until = self._last + (duration or self.config.lid_open_duration)
+
+    def set_blower_duty(self, duty: Optional[float]):
+        # Drive the pit from a blower duty cycle (0-100 %); None returns to the fixed setpoint
+        with self._lock:
+            self._advance()
+            self.blower_duty = duty
+
+    def _advance(self):
+        # Integrate from the last update to now (caller holds the lock)
+        cfg = self.config
+        now = self.clock.monotonic()
+        while self._last < now:
+            step = min(self.MAX_STEP, now - self._last)
+            t = self._last
+
+            if self._next_lid_open is not None and t >= self._next_lid_open:
+                self.lid_open_until = t + cfg.lid_open_duration
+                self._next_lid_open = self._schedule_lid_open(t)
+            lid_open = self.lid_open_until is not None and t < self.lid_open_until
+
+            if lid_open:
+                self.pit_c += (cfg.ambient_c - self.pit_c) * step / cfg.lid_time_constant
+            else:
+                if self.blower_duty is None:
+                    target = cfg.pit_setpoint_c
+                else:
+                    target = cfg.ambient_c + (cfg.max_pit_c - cfg.ambient_c) * self.blower_duty / 100.0
+                self.pit_c += (target - self.pit_c) * step / cfg.pit_time_constant
+
+            stall = 1.0 + cfg.stall_strength * math.exp(
+                -((self.meat_c - cfg.stall_center_c) / cfg.stall_width_c) ** 2
+            )
+            self.meat_c += (self.pit_c - self.meat_c) * step / (cfg.meat_time_constant * stall)
+            self._last += step
+
+    def temperatures(self) -> Tuple[float, float]:
+        # Current (pit, meat) temperatures without noise
+        with self._lock:
+            self._advance()
+            return self.pit_c, self.meat_c
+
+    @property
+    def lid_open(self) -> bool:
+        with self._lock:
+            self._advance()
+            return self.lid_open_until is not None and self._last < self.lid_open_until
+
+class EmulatedTransport:
+    # Drop-in replacement for SpiTransport. Probes whose name contains "meat"
+    # follow the meat temperature, every other probe follows the pit, each
+    # with an optional fixed offset.
+    def __init__(self, plant: SmokerPlant, probe_offsets: Optional[Dict[str, float]] = None):
+        self.plant = plant
+        self.probe_offsets = probe_offsets or {}
+        self.disconnected = set()
+        self._names: Dict[int, str] = {}
+        print("Using emulated MAX6675 sensors")
+
+    def setup_cs(self, name: str, cs_pin: int):
+        self._names[cs_pin] = name
+
+    def disconnect(self, name: str, disconnected=True):
+        # Simulate an unplugged thermocouple on one probe
+        if disconnected:
+            self.disconnected.add(name)
+        else:
+            self.disconnected.discard(name)
+
+    def read_frame(self, cs_pin: int) -> List[int]:
+        cfg = self.plant.config
+        rng = self.plant.rng
+        if cfg.short_frame_rate and rng.random() < cfg.short_frame_rate:
+            return [0]
+
+        name = self._names.get(cs_pin, "")
+        pit_c, meat_c = self.plant.temperatures()
+        temp_c = (meat_c if "meat" in name else pit_c) + self.probe_offsets.get(name, 0.0)
+        temp_c += rng.gauss(0.0, cfg.noise_c) if cfg.noise_c else 0.0
+
+        open_circuit = name in self.disconnected or (
+            cfg.open_circuit_rate and rng.random() < cfg.open_circuit_rate
+        )
+        word = encode_frame(temp_c, open_circuit)
+        return [word >> 8, word & 0xFF]
+
+    def release_cs(self, cs_pins: List[int]):
+        for cs_pin in cs_pins:
+            self._names.pop(cs_pin, None)
+
+    def close(self):
+        pass
@@ -1,64 +1,215 @@
 # max6675_simple.py
-import spidev
+import threading
 import time
-import RPi.GPIO as GPIO
-from calibration import CalibrationManager
+from typing import Dict, List, Optional
+from calibration import get_calibration_manager
+
+class ConversionScheduler:
+    # Tracks when each chip started its current conversion. The MAX6675 starts
+    # converting when CS goes high and needs up to 220 ms; pulling CS low any
+    # earlier aborts that conversion and clocks out the previous result again.
+    CONVERSION_TIME = 0.22
+
+    def __init__(self, conversion_time=CONVERSION_TIME, clock=time.monotonic, sleep=time.sleep):
+        self.conversion_time = conversion_time
+        self.clock = clock
+        self.sleep = sleep
+        self._started: Dict[int, float] = {}
+
+    def conversion_started(self, cs_pin: int):
+        # Record that CS just went high, starting a fresh conversion
+        self._started[cs_pin] = self.clock()
+
+    def time_until_ready(self, cs_pin: int) -> float:
+        # Seconds until cs_pin has a fresh conversion, 0.0 if ready now
+        started = self._started.get(cs_pin)
+        if started is None:
+            return 0.0
+        return max(0.0, started + self.conversion_time - self.clock())
+
+    def is_ready(self, cs_pin: int) -> bool:
+        return self.time_until_ready(cs_pin) <= 0.0
+
+    def next_ready_in(self, cs_pins) -> float:
+        # Seconds until the first of cs_pins has a fresh conversion
+        delays = [self.time_until_ready(pin) for pin in cs_pins]
+        return min(delays) if delays else 0.0
+
+class SpiTransport:
+    # Sensor backend for real hardware: the SPI device plus GPIO chip selects.
+    # spidev and RPi.GPIO are imported here so that other backends (see
+    # max6675_emulator.py) work on machines without them.
+    def __init__(self, bus=0, device=0, max_speed_hz=500000):
+        import spidev
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
 
-class MAX6675:
-    def __init__(self, cs_pin, sensor_name="unknown"):
-        self.cs_pin = cs_pin
-        self.sensor_name = sensor_name
-        self.calibration_manager = CalibrationManager()
-        
-        # Initialize SPI for real hardware
         self.spi = spidev.SpiDev()
-        self.spi.open(0, 0)
-        self.spi.max_speed_hz = 500000
+        self.spi.open(bus, device)
+        self.spi.max_speed_hz = max_speed_hz
         self.spi.mode = 0b00
         self.spi.lsbfirst = False
         GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self.cs_pin, GPIO.OUT)
-        GPIO.output(self.cs_pin, GPIO.HIGH)
-        
+
+        print(f"Opened shared SPI bus {bus}.{device} at {max_speed_hz} Hz")
+
+    def setup_cs(self, name: str, cs_pin: int):
+        self.GPIO.setup(cs_pin, self.GPIO.OUT)
+        self.GPIO.output(cs_pin, self.GPIO.HIGH)
+
+    def read_frame(self, cs_pin: int) -> List[int]:
+        # Pull CS low, clock out two bytes and raise CS again to start a new conversion
+        self.GPIO.output(cs_pin, self.GPIO.LOW)
+        try:
+            return self.spi.readbytes(2)
+        finally:
+            self.GPIO.output(cs_pin, self.GPIO.HIGH)
+
+    def release_cs(self, cs_pins: List[int]):
+        if cs_pins:
+            self.GPIO.cleanup(cs_pins)
+
+    def close(self):
+        self.spi.close()
+
+class OpenCircuitError(ValueError):
+    # Open-thermocouple bit (D2) set in the frame
+    pass
+
+class ShortFrameError(ValueError):
+    # Fewer than two bytes came back from the bus
+    pass
+
+class Max6675Bus:
+    # Owns the single sensor transport and every chip select on the shared bus.
+    # All MAX6675 boards share SO/SCLK, so one handle and one lock serve any
+    # number of probes without extra file descriptors.
+    def __init__(self, transport=None, scheduler=None):
+        self.cs_pins: Dict[str, int] = {}
+        self.transport = transport if transport is not None else SpiTransport()
+        self.scheduler = scheduler if scheduler is not None else ConversionScheduler()
+        self._last_words: Dict[int, Optional[int]] = {}
+        self._lock = threading.Lock()
+        # Optional callable given each frame transfer's duration in seconds
+        self.transfer_observer = None
+
+    def add_device(self, name: str, cs_pin: int):
+        # Register a chip select line; GPIO setup happens once here, not per read
+        with self._lock:
+            self.transport.setup_cs(name, cs_pin)
+            self.scheduler.conversion_started(cs_pin)
+            self.cs_pins[name] = cs_pin
+
+    def remove_device(self, name: str):
+        with self._lock:
+            cs_pin = self.cs_pins.pop(name, None)
+            if cs_pin is not None:
+                self._last_words.pop(cs_pin, None)
+                self.transport.release_cs([cs_pin])
+
+    def _transfer(self, cs_pin: int) -> Optional[int]:
+        # Clock one 16-bit frame out of the chip on cs_pin (caller holds the lock).
+        # A conversion is already complete by the time we get here, so there is
+        # no need to wait after pulling CS low.
+        observer = self.transfer_observer
+        start = time.perf_counter() if observer is not None else 0.0
+        try:
+            data = self.transport.read_frame(cs_pin)
+        finally:
+            self.scheduler.conversion_started(cs_pin)
+        if observer is not None:
+            observer(time.perf_counter() - start)
+
+        word = (data[0] << 8) | data[1] if len(data) >= 2 else None
+        self._last_words[cs_pin] = word
+        return word
+
+    def _read_if_ready(self, cs_pin: int) -> Optional[int]:
+        # Read a fresh frame if the chip finished converting, else reuse the last one
+        if self.scheduler.is_ready(cs_pin) or cs_pin not in self._last_words:
+            return self._transfer(cs_pin)
+        return self._last_words[cs_pin]
+
+    def read_word(self, cs_pin: int, wait=True) -> Optional[int]:
+        # Read the raw 16-bit word from a single chip, None on a short frame.
+        # With wait=True this sleeps until a fresh conversion is available;
+        # otherwise the last word is returned while the chip is still converting.
+        if wait:
+            self.scheduler.sleep(self.scheduler.time_until_ready(cs_pin))
+        with self._lock:
+            return self._read_if_ready(cs_pin)
+
+    def read_all(self, wait=True, names=None) -> Dict[str, Optional[int]]:
+        # Read every registered chip (or just those in names) in one locked pass
+        cs_pins = self.cs_pins if names is None else {
+            name: self.cs_pins[name] for name in names if name in self.cs_pins
+        }
+        if wait:
+            pins = list(cs_pins.values())
+            self.scheduler.sleep(max([self.scheduler.time_until_ready(pin) for pin in pins], default=0.0))
+        words = {}
+        with self._lock:
+            for name, cs_pin in cs_pins.items():
+                words[name] = self._read_if_ready(cs_pin)
+        return words
+
+    def next_ready_in(self) -> float:
+        # Seconds until any registered chip has a fresh conversion
+        return self.scheduler.next_ready_in(self.cs_pins.values())
+
+    def close(self):
+        # Release the transport and all chip select lines
+        with self._lock:
+            self.transport.release_cs(list(self.cs_pins.values()))
+            self.transport.close()
+            self.cs_pins = {}
+            self._last_words = {}
+
+class MAX6675:
+    def __init__(self, cs_pin, sensor_name="unknown", bus=None, calibration_manager=None):
+        self.cs_pin = cs_pin
+        self.sensor_name = sensor_name
+        # All sensors share one manager so they never overwrite each other's entries
+        if calibration_manager is None:
+            calibration_manager = get_calibration_manager()
+        self.calibration_manager = calibration_manager
+
+        # Share the caller's bus when given, otherwise open a private one
+        self._owns_bus = bus is None
+        self.bus = bus if bus is not None else Max6675Bus()
+        self.bus.add_device(sensor_name, cs_pin)
+
         print(f"Initialized MAX6675 sensor '{sensor_name}' on CS pin {cs_pin}")
-    
+
     def read_temp_c(self):
         # Read temperature from actual MAX6675 hardware
         return self._read_actual_temp()
-    
+
     def _read_actual_temp(self):
         # Read actual temperature from MAX6675 sensor
-        GPIO.output(self.cs_pin, GPIO.LOW)
-        time.sleep(0.001)  # Wait for conversion
-        
-        try:
-            data = self.spi.readbytes(2)
-            GPIO.output(self.cs_pin, GPIO.HIGH)
-            
-            if len(data) < 2:
-                raise ValueError("Invalid data - less than 2 bytes received")
-            
-            value = (data[0] << 8) | data[1]
-            
-            # Check for thermocouple error
-            if value & 0x04:
-                raise ValueError("Thermocouple open circuit or error")
-            
-            # Extract temperature data (14-bit resolution)
-            temp = (value >> 3) & 0xFFF
-            raw_temp = temp * 0.25
-            
-            # Apply calibration if available
-            calibrated_temp = self.calibration_manager.apply_calibration(
-                self.sensor_name, raw_temp
-            )
-            
-            return calibrated_temp
-            
-        except Exception as e:
-            GPIO.output(self.cs_pin, GPIO.HIGH)  # Ensure CS is high on error
-            raise e
-    
+        return self.temp_from_word(self.bus.read_word(self.cs_pin))
+
+    def raw_from_word(self, value: Optional[int]) -> float:
+        # Decode a raw 16-bit frame from the bus into an uncalibrated temperature
+        if value is None:
+            raise ShortFrameError("Invalid data - less than 2 bytes received")
+
+        # Check for thermocouple error
+        if value & 0x04:
+            raise OpenCircuitError("Thermocouple open circuit or error")
+
+        # Extract temperature data (14-bit resolution)
+        temp = (value >> 3) & 0xFFF
+        return temp * 0.25
+
+    def calibrate(self, raw_temp: float) -> float:
+        # Apply calibration if available
+        return self.calibration_manager.apply_calibration(self.sensor_name, raw_temp)
+
+    def temp_from_word(self, value: Optional[int]) -> float:
+        # Decode a raw 16-bit frame from the bus into a calibrated temperature
+        return self.calibrate(self.raw_from_word(value))
+
     def test_sensor_connection(self):
         # Test if sensor is responding properly
         try:
@@ -68,7 +219,7 @@ class MAX6675:
         except Exception as e:
             print(f"Sensor '{self.sensor_name}' test failed: {e}")
             return False
-    
+
     def read_multiple_samples(self, num_samples=5, delay=0.1):
         # Read multiple samples to check sensor stability
         samples = []
@@ -81,23 +232,27 @@ class MAX6675:
                 print(f"Sample {i+1} failed: {e}")
                 samples.append(None)
         return samples
-    
+
     def get_calibration_status(self):
         # Get calibration status for this sensor
         return self.calibration_manager.get_calibration_status(self.sensor_name)
-    
+
     def add_calibration_point(self, actual_temp: float, measured_temp: float):
         # Add a calibration point for this sensor
-        self.calibration_manager.add_calibration_point(
+        status = self.calibration_manager.add_calibration_point(
             self.sensor_name, actual_temp, measured_temp
         )
         print(f"Added calibration point for {self.sensor_name}: actual={actual_temp}°C, measured={measured_temp}°C")
-    
+        return status
+
     def clear_calibration(self):
         # Clear calibration for this sensor
         self.calibration_manager.clear_calibration(self.sensor_name)
         print(f"Cleared calibration for {self.sensor_name}")
-    
+
     def cleanup(self):
         # Clean up GPIO resources
-        GPIO.cleanup(self.cs_pin)
\ No newline at end of file
+        if self._owns_bus:
+            self.bus.close()
+        else:
+            self.bus.remove_device(self.sensor_name)
\ No newline at end of file
@@ -0,0 +1,161 @@
+# metrics.py
+# Minimal Prometheus text-format exporter. Hot-path updates are plain
+# attribute and list increments with no locks: each metric has a single
+# writer in practice (the sensor loop, or the one gevent worker thread for
+# HTTP), and a rare lost update under the dev server's threads is harmless
+# for monitoring. Scrapes render from a cached copy of the text.
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = labels + ((extra,) if extra else ())
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + body + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+class Histogram:
+    # Fixed upper bounds; observe() is one bisect plus two additions
+    def __init__(self, buckets: Iterable[float]):
+        self.bounds = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class MetricFamily:
+    # One named metric with a child per label set
+    def __init__(self, name: str, kind: str, help_text: str, labelnames=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[Labels, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        if self.kind == "counter":
+            return Counter()
+        if self.kind == "gauge":
+            return Gauge()
+        return Histogram(self.buckets)
+
+    def labels(self, *values):
+        # Child for these label values; keep a reference in hot paths
+        key = tuple(zip(self.labelnames, (str(v) for v in values)))
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def render(self, out: List[str]):
+        out.append(f"# HELP {self.name} {self.help_text}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        for labels, child in list(self._children.items()):
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(child.bounds + [math.inf], child.counts):
+                    cumulative += count
+                    out.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+                out.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+                out.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+            else:
+                out.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+
+class MetricsRegistry:
+    # Holds metric families plus collectors, callables run at scrape time to
+    # refresh values that are cheaper to read than to track (e.g. gauges
+    # taken from the latest snapshot). render() caches the text for
+    # cache_seconds so concurrent scrapers share one rendering.
+    def __init__(self, cache_seconds=1.0):
+        self.cache_seconds = cache_seconds
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._cached: Optional[bytes] = None
+        self._cached_at = 0.0
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self._families:
+            raise ValueError(f"Duplicate metric: {family.name}")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name, help_text, labelnames=()) -> MetricFamily:
+        return self._register(MetricFamily(name, "counter", help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> MetricFamily:
+        return self._register(MetricFamily(name, "gauge", help_text, labelnames))
+
+    def histogram(self, name, help_text, buckets, labelnames=()) -> MetricFamily:
+        return self._register(MetricFamily(name, "histogram", help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> bytes:
+        now = time.monotonic()
+        if self._cached is not None and now - self._cached_at < self.cache_seconds:
+            return self._cached
+        for collector in self._collectors:
+            collector()
+        out: List[str] = []
+        for family in list(self._families.values()):
+            family.render(out)
+        self._cached = ("\n".join(out) + "\n").encode()
+        self._cached_at = now
+        return self._cached
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket bounds in seconds
+SPI_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+LOOP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0, 60.0)
@@ -0,0 +1,272 @@
+# pit_controller.py
+# Closed-loop pit temperature control: a PID loop on the smoker probes that
+# drives a PWM blower. The loop runs on a native OS thread at a fixed rate so
+# HTTP load (greenlets under gunicorn/gevent) cannot delay it. That thread
+# must never wait on a gevent-patched lock shared with greenlets: it only
+# reads state published by plain attribute assignment, and anything it
+# really shares with them is guarded by a native_lock().
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from sim_clock import SystemClock
+
+def _native(module: str, name: str, default):
+    # The unpatched stdlib object when gevent has monkey-patched `module`
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched(module):
+            return monkey.get_original(module, name)
+    except ImportError:
+        pass
+    return default
+
+def start_native_thread(target: Callable):
+    import _thread
+    _native('_thread', 'start_new_thread', _thread.start_new_thread)(target, ())
+
+def native_sleep(seconds: float):
+    _native('time', 'sleep', time.sleep)(seconds)
+
+def native_lock():
+    # An OS-level lock, for state shared between the control thread and
+    # greenlets; hold it only for short sections that never yield
+    return _native('threading', 'Lock', threading.Lock)()
+
+class PidController:
+    # Positional PID with derivative on measurement (no kick on setpoint
+    # changes) and conditional integration: the integral only accumulates
+    # while the output is not saturated, so it cannot wind up.
+    def __init__(self, kp=4.0, ki=0.02, kd=5.0, output_min=0.0, output_max=100.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_min = output_min
+        self.output_max = output_max
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self._last_measurement: Optional[float] = None
+
+    def update(self, setpoint: float, measurement: float, dt: float, hold_integral=False) -> float:
+        error = setpoint - measurement
+        derivative = 0.0
+        if self._last_measurement is not None and dt > 0:
+            derivative = -(measurement - self._last_measurement) / dt
+        self._last_measurement = measurement
+
+        unclamped = self.kp * error + self.integral + self.kd * derivative
+        output = min(self.output_max, max(self.output_min, unclamped))
+
+        # Anti-windup: stop integrating when pushing further into saturation
+        saturated_high = unclamped >= self.output_max and error > 0
+        saturated_low = unclamped <= self.output_min and error < 0
+        if not (hold_integral or saturated_high or saturated_low):
+            self.integral += self.ki * error * dt
+            self.integral = min(self.output_max, max(self.output_min, self.integral))
+        return output
+
+    def tuning(self) -> Dict:
+        return {"kp": self.kp, "ki": self.ki, "kd": self.kd}
+
+class LidOpenDetector:
+    # Flags a lid opening when the pit drops faster than drop_rate °C/s and
+    # more than drop_c below setpoint; clears once the pit recovers to within
+    # recover_c of setpoint or after max_duration seconds
+    def __init__(self, drop_rate=0.1, drop_c=5.0, recover_c=2.0, max_duration=600.0):
+        self.drop_rate = drop_rate
+        self.drop_c = drop_c
+        self.recover_c = recover_c
+        self.max_duration = max_duration
+        self.reset()
+
+    def reset(self):
+        self.is_open = False
+        self.opened_at: Optional[float] = None
+        self._last: Optional[float] = None
+
+    def update(self, setpoint: float, measurement: float, now: float, dt: float) -> bool:
+        falling = self._last is not None and dt > 0 and (self._last - measurement) / dt > self.drop_rate
+        self._last = measurement
+        if not self.is_open:
+            if falling and setpoint - measurement > self.drop_c:
+                self.is_open = True
+                self.opened_at = now
+        elif setpoint - measurement <= self.recover_c or now - self.opened_at > self.max_duration:
+            self.is_open = False
+            self.opened_at = None
+        return self.is_open
+
+class SimulatedBlower:
+    # No-op output for off-device testing; when given a SmokerPlant from
+    # max6675_emulator.py the duty cycle heats the emulated pit
+    def __init__(self, plant=None):
+        self.plant = plant
+        self.duty = 0.0
+
+    def set_duty(self, duty: float):
+        self.duty = duty
+        if self.plant is not None:
+            self.plant.set_blower_duty(duty)
+
+    def idle(self):
+        # Controller disabled: hand the emulated pit back to its manual fire
+        self.duty = 0.0
+        if self.plant is not None:
+            self.plant.set_blower_duty(None)
+
+    def close(self):
+        self.idle()
+
+class PwmBlower:
+    # Blower fan driven by software PWM on a GPIO pin (BCM numbering)
+    def __init__(self, gpio_pin=18, frequency=25):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.gpio_pin = gpio_pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(gpio_pin, GPIO.OUT)
+        self._pwm = GPIO.PWM(gpio_pin, frequency)
+        self._pwm.start(0)
+        self.duty = 0.0
+        print(f"Blower PWM on GPIO{gpio_pin} at {frequency} Hz")
+
+    def set_duty(self, duty: float):
+        self.duty = duty
+        self._pwm.ChangeDutyCycle(duty)
+
+    def idle(self):
+        self.set_duty(0.0)
+
+    def close(self):
+        self._pwm.stop()
+        self.GPIO.cleanup(self.gpio_pin)
+
+class LoopTiming:
+    # Lateness of each control cycle against its deadline
+    def __init__(self, period: float, window=1000):
+        self.period = period
+        self.cycles = 0
+        self.missed_deadlines = 0
+        self.max_jitter = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, lateness: float):
+        self.cycles += 1
+        self._recent.append(lateness)
+        self.max_jitter = max(self.max_jitter, lateness)
+        if lateness > self.period:
+            self.missed_deadlines += 1
+
+    def summary(self) -> Dict:
+        recent = sorted(self._recent)
+        p99 = recent[min(len(recent) - 1, int(0.99 * len(recent)))] if recent else 0.0
+        return {
+            "period": self.period,
+            "cycles": self.cycles,
+            "missed_deadlines": self.missed_deadlines,
+            "max_jitter_ms": round(self.max_jitter * 1000, 3),
+            "p99_jitter_ms": round(p99 * 1000, 3)
+        }
+
+class PitController:
+    # Fixed-rate control loop. read_pit_temp returns the current pit
+    # temperature in °C or None when no valid reading is available, in
+    # which case the blower is switched off.
+    def __init__(self, read_pit_temp: Callable[[], Optional[float]], blower,
+                 period=1.0, clock=None, setpoint=110.0):
+        self.read_pit_temp = read_pit_temp
+        self.blower = blower
+        self.clock = clock or SystemClock()
+        self.period = period
+        self.setpoint = setpoint
+        self.enabled = False
+        self.pid = PidController()
+        self.lid = LidOpenDetector()
+        self.timing = LoopTiming(period)
+        self.pit_temp: Optional[float] = None
+        self.output = 0.0
+        self._running = False
+
+    def set_setpoint(self, setpoint: float):
+        if not 0 <= setpoint <= 400:
+            raise ValueError("Setpoint must be between 0 and 400 °C")
+        self.setpoint = float(setpoint)
+
+    def set_enabled(self, enabled: bool):
+        if enabled and not self.enabled:
+            self.pid.reset()
+            self.lid.reset()
+        self.enabled = bool(enabled)
+
+    def set_tuning(self, kp=None, ki=None, kd=None):
+        # Swap in a new controller so the loop never sees half-updated gains
+        tuning = self.pid.tuning()
+        tuning.update({k: float(v) for k, v in (("kp", kp), ("ki", ki), ("kd", kd)) if v is not None})
+        if any(v < 0 for v in tuning.values()):
+            raise ValueError("PID gains must not be negative")
+        pid = PidController(**tuning)
+        pid.integral = self.pid.integral
+        self.pid = pid
+
+    def step(self, dt: float):
+        # One control cycle
+        pit_temp = self.read_pit_temp()
+        self.pit_temp = pit_temp
+        if not self.enabled:
+            self.output = 0.0
+            self.blower.idle()
+            return
+        if pit_temp is None:
+            # No valid pit reading: fail safe with the blower off
+            output = 0.0
+        elif self.lid.update(self.setpoint, pit_temp, self.clock.monotonic(), dt):
+            # Lid open: cut the blower and freeze the integral to avoid a flare-up
+            self.pid.update(self.setpoint, pit_temp, dt, hold_integral=True)
+            output = 0.0
+        else:
+            output = self.pid.update(self.setpoint, pit_temp, dt)
+        self.output = output
+        self.blower.set_duty(output)
+
+    def _run(self):
+        deadline = self.clock.monotonic()
+        while self._running:
+            deadline += self.period
+            delay = deadline - self.clock.monotonic()
+            if delay > 0:
+                native_sleep(self.clock.to_real(delay))
+            now = self.clock.monotonic()
+            lateness = now - deadline
+            self.timing.record(max(0.0, lateness))
+            if lateness > self.period:
+                # Skip missed slots rather than running a burst of late cycles
+                deadline = now
+            try:
+                self.step(self.period)
+            except Exception as e:
+                self.blower.set_duty(0.0)
+                print(f"[ERROR] Pit controller: {e}")
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            start_native_thread(self._run)
+
+    def stop(self):
+        self._running = False
+        self.blower.close()
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "setpoint": self.setpoint,
+            "pit_temp": self.pit_temp,
+            "output": round(self.output, 2),
+            "lid_open": self.lid.is_open,
+            "tuning": self.pid.tuning(),
+            "integral": round(self.pid.integral, 3),
+            "timing": self.timing.summary()
+        }
@@ -0,0 +1,144 @@
+# power_governor.py
+# Automatic switching between the helper's powersave (300-600 MHz) and
+# ondemand (600-1500 MHz) profiles. The unit sits in powersave while nobody
+# is looking and moves to ondemand when the dashboard is in use or the
+# sensor loop starts falling behind.
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+MODES = ("powersave", "ondemand")
+
+@dataclass
+class LoadSample:
+    request_rate: float     # HTTP requests per second since the last sample
+    stream_clients: int     # open /stream connections
+    overruns: int           # sensor loop overruns since the last sample
+
+class PowerGovernor:
+    # Hysteresis comes from separate up and down thresholds plus hold times:
+    # any sign of load switches up after up_hold seconds, but the unit must
+    # be idle for down_hold seconds before it drops back to powersave, and
+    # no mode is left within min_dwell seconds of entering it.
+    def __init__(self, set_mode: Callable[[str], str], sample_load: Callable[[], LoadSample],
+                 initial_mode: Optional[str] = None, interval=5.0,
+                 up_rate=1.0, down_rate=0.2, up_clients=1,
+                 up_hold=0.0, down_hold=120.0, min_dwell=30.0, clock=time.monotonic):
+        self.set_mode = set_mode
+        self.sample_load = sample_load
+        self.interval = interval
+        self.up_rate = up_rate
+        self.down_rate = down_rate
+        self.up_clients = up_clients
+        self.up_hold = up_hold
+        self.down_hold = down_hold
+        self.min_dwell = min_dwell
+        self.clock = clock
+        self.enabled = False
+        self.mode = initial_mode if initial_mode in MODES else None
+        self.last_load: Optional[LoadSample] = None
+        self.transitions = deque(maxlen=50)
+        self.failures = 0
+        self._retry_after = 0.0
+        self._time_in_mode = {mode: 0.0 for mode in MODES}
+        self._mode_since = clock()
+        self._wants_since: Dict[str, Optional[float]] = {mode: None for mode in MODES}
+        self._lock = threading.Lock()
+        self._running = False
+
+    def wanted_mode(self, load: LoadSample) -> Optional[str]:
+        # Mode the load points to, or None when it is between thresholds
+        if (load.stream_clients >= self.up_clients or load.request_rate >= self.up_rate
+                or load.overruns > 0):
+            return "ondemand"
+        if load.stream_clients == 0 and load.request_rate < self.down_rate:
+            return "powersave"
+        return None
+
+    def _record_mode(self, mode: Optional[str], reason: str, now: float):
+        # Account time in the old mode and log the change (caller holds the lock)
+        if self.mode in self._time_in_mode:
+            self._time_in_mode[self.mode] += now - self._mode_since
+        previous, self.mode, self._mode_since = self.mode, mode, now
+        self.transitions.append({"at": time.time(), "from": previous, "to": mode, "reason": reason})
+        print(f"[power] {previous or 'unknown'} -> {mode or 'unknown'} ({reason})")
+
+    def step(self):
+        # Sample the load once and switch profiles if the hold times allow it
+        load = self.sample_load()
+        now = self.clock()
+        with self._lock:
+            self.last_load = load
+            wanted = self.wanted_mode(load)
+            for mode in MODES:
+                if mode != wanted:
+                    self._wants_since[mode] = None
+                elif self._wants_since[mode] is None:
+                    self._wants_since[mode] = now
+            if not self.enabled or wanted is None or wanted == self.mode:
+                return
+            hold = self.up_hold if wanted == "ondemand" else self.down_hold
+            if now - self._wants_since[wanted] < hold:
+                return
+            if self.mode is not None and now - self._mode_since < self.min_dwell:
+                return
+            if now < self._retry_after:
+                return
+            reason = (f"{load.request_rate:.2f} req/s, {load.stream_clients} stream clients, "
+                      f"{load.overruns} overruns")
+        try:
+            result = self.set_mode(wanted)
+            if result != "OK":
+                raise RuntimeError(f"Unexpected response: {result}")
+        except Exception as e:
+            self.failures += 1
+            self._retry_after = now + self.min_dwell
+            print(f"[ERROR] Power governor could not set {wanted}: {e}")
+            return
+        with self._lock:
+            self._record_mode(wanted, reason, now)
+
+    def manual_mode(self, mode: str):
+        # A manual switch from the power page: note it and stop automatic control
+        with self._lock:
+            self.enabled = False
+            if mode != self.mode:
+                self._record_mode(mode, "manual", self.clock())
+
+    def set_enabled(self, enabled: bool):
+        with self._lock:
+            self.enabled = bool(enabled)
+
+    def _run(self):
+        while self._running:
+            try:
+                self.step()
+            except Exception as e:
+                print(f"[ERROR] Power governor: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._running = False
+
+    def status(self) -> Dict:
+        with self._lock:
+            now = self.clock()
+            time_in_mode = dict(self._time_in_mode)
+            if self.mode in time_in_mode:
+                time_in_mode[self.mode] += now - self._mode_since
+            return {
+                "enabled": self.enabled,
+                "mode": self.mode,
+                "mode_seconds": round(now - self._mode_since, 1),
+                "time_in_mode": {mode: round(seconds, 1) for mode, seconds in time_in_mode.items()},
+                "load": None if self.last_load is None else vars(self.last_load),
+                "transitions": list(self.transitions),
+                "failures": self.failures
+            }
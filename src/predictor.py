@@ -0,0 +1,164 @@
+# predictor.py
+# Online cook-done prediction for the meat probe. Meat heats roughly by
+# Newton's law, dT/dt = k * (T_pit - T_meat), with k dropping sharply in the
+# evaporative stall around 65-75 °C. The rate is fitted with recursive least
+# squares, so each sample costs a fixed handful of float operations no matter
+# how long the cook runs.
+import math
+import threading
+from typing import Dict, Optional
+
+STALL_CENTER_C = 70.0
+STALL_WIDTH_C = 5.0
+DEFAULT_STALL_DEPTH = 0.75   # fraction of the heating rate lost at the stall peak
+MAX_STALL_DEPTH = 0.95
+
+def stall_shape(temp_c: float) -> float:
+    # 1.0 at the centre of the stall, falling to ~0 outside 60-80 °C
+    return math.exp(-((temp_c - STALL_CENTER_C) / STALL_WIDTH_C) ** 2)
+
+class RecursiveLeastSquares:
+    # Two-parameter RLS with exponential forgetting: fits y = θ·x and tracks
+    # slow drift in θ (fire dying down, wrap applied). Covariance is kept as
+    # three scalars rather than a matrix.
+    def __init__(self, forgetting=0.995, initial_variance=1e6):
+        self.forgetting = forgetting
+        self.initial_variance = initial_variance
+        self.reset()
+
+    def reset(self):
+        self.theta = [0.0, 0.0]
+        self._p00 = self._p11 = self.initial_variance
+        self._p01 = 0.0
+        self.updates = 0
+
+    def update(self, x0: float, x1: float, y: float):
+        lam = self.forgetting
+        p00, p01, p11 = self._p00, self._p01, self._p11
+        px0 = p00 * x0 + p01 * x1
+        px1 = p01 * x0 + p11 * x1
+        denom = lam + x0 * px0 + x1 * px1
+        g0 = px0 / denom
+        g1 = px1 / denom
+        error = y - (self.theta[0] * x0 + self.theta[1] * x1)
+        self.theta[0] += g0 * error
+        self.theta[1] += g1 * error
+        self._p00 = (p00 - g0 * px0) / lam
+        self._p01 = (p01 - g0 * px1) / lam
+        self._p11 = (p11 - g1 * px1) / lam
+        self.updates += 1
+
+class CookPredictor:
+    # Model: dT/dt = k * gap * (1 - depth * stall_shape(T)), gap = T_pit - T,
+    # fitted linearly as θ0 * gap + θ1 * gap * stall_shape(T) so that
+    # k = θ0 and depth = -θ1 / θ0. Until the meat has reached the stall,
+    # depth cannot be observed and DEFAULT_STALL_DEPTH is assumed.
+    #
+    # The rate is taken over a baseline of at least min_interval seconds, so
+    # MAX6675 quantisation (0.25 °C) does not swamp it at fast sample rates.
+    def __init__(self, min_interval=60.0, min_updates=5, forgetting=0.995):
+        self.min_interval = min_interval
+        self.min_updates = min_updates
+        self.rls = RecursiveLeastSquares(forgetting)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.rls.reset()
+        self._anchor_t: Optional[float] = None
+        self._anchor_temp: Optional[float] = None
+        self.meat_temp: Optional[float] = None
+        self.pit_temp: Optional[float] = None
+        self.rate = 0.0
+        self.updated_at: Optional[float] = None
+        self._max_stall_seen = 0.0
+
+    def add_sample(self, timestamp: float, meat_temp: float, pit_temp: Optional[float]):
+        # Feed one filtered meat reading and the current pit temperature
+        with self._lock:
+            self._add_sample(timestamp, meat_temp, pit_temp)
+
+    def _add_sample(self, timestamp: float, meat_temp: float, pit_temp: Optional[float]):
+        self.meat_temp = meat_temp
+        self.updated_at = timestamp
+        if pit_temp is None:
+            return
+        self.pit_temp = pit_temp
+        if self._anchor_t is None or timestamp < self._anchor_t:
+            self._anchor_t, self._anchor_temp = timestamp, meat_temp
+            return
+
+        dt = timestamp - self._anchor_t
+        if dt < self.min_interval:
+            return
+        self.rate = (meat_temp - self._anchor_temp) / dt
+        mid_temp = (meat_temp + self._anchor_temp) / 2
+        gap = pit_temp - mid_temp
+        shape = stall_shape(mid_temp)
+        if gap > 1.0:
+            self.rls.update(gap, gap * shape, self.rate)
+            self._max_stall_seen = max(self._max_stall_seen, shape)
+        self._anchor_t, self._anchor_temp = timestamp, meat_temp
+
+    def heating_constant(self) -> Optional[float]:
+        k = self.rls.theta[0]
+        if self.rls.updates < self.min_updates or k <= 0:
+            return None
+        return k
+
+    def stall_depth(self) -> float:
+        k = self.rls.theta[0]
+        if self._max_stall_seen < 0.5 or k <= 0:
+            return DEFAULT_STALL_DEPTH
+        return min(MAX_STALL_DEPTH, max(0.0, -self.rls.theta[1] / k))
+
+    def time_to_target(self, target_c: float, step_c=0.5) -> Optional[float]:
+        # Seconds until the meat reaches target_c at the current pit temperature,
+        # integrating dt = dT / rate(T) across the remaining range (and through
+        # the stall when it lies ahead). None when it cannot be estimated.
+        k = self.heating_constant()
+        if self.meat_temp is None or self.pit_temp is None:
+            return None
+        if self.meat_temp >= target_c:
+            return 0.0
+        if k is None or self.pit_temp <= target_c:
+            return None
+        depth = self.stall_depth()
+        seconds = 0.0
+        temp = self.meat_temp
+        while temp < target_c:
+            step = min(step_c, target_c - temp)
+            mid = temp + step / 2
+            seconds += step / (k * (self.pit_temp - mid) * (1 - depth * stall_shape(mid)))
+            temp += step
+        return seconds
+
+    def predict(self, target_c: float) -> Dict:
+        with self._lock:
+            return self._predict(target_c)
+
+    def _predict(self, target_c: float) -> Dict:
+        eta = self.time_to_target(target_c)
+        result = {
+            "target_c": target_c,
+            "meat_temp_c": None if self.meat_temp is None else round(self.meat_temp, 2),
+            "pit_temp_c": None if self.pit_temp is None else round(self.pit_temp, 2),
+            "rate_c_per_hour": round(self.rate * 3600, 2),
+            "in_stall": self.meat_temp is not None and stall_shape(self.meat_temp) > 0.5,
+            "stall_depth": round(self.stall_depth(), 3),
+            "fit_updates": self.rls.updates,
+            "eta_seconds": None if eta is None else round(eta),
+            "done_at": None if eta is None or self.updated_at is None else self.updated_at + eta
+        }
+        if eta is None:
+            if self.meat_temp is None:
+                result["message"] = "No meat probe readings yet"
+            elif self.pit_temp is not None and self.pit_temp <= target_c:
+                result["message"] = "Pit temperature is below the target"
+            else:
+                result["message"] = "Collecting data"
+        return result
@@ -0,0 +1,95 @@
+# ring_buffer.py
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Bytes per stored sample: timestamp, raw °C and calibrated °C as doubles
+SAMPLE_BYTES = 3 * array('d').itemsize
+
+class SampleRing:
+    # Fixed-capacity ring of (timestamp, raw °C, calibrated °C) samples stored
+    # in three packed double arrays. All memory is allocated up front; append
+    # never allocates and window() hands out memoryview slices, not copies.
+    __slots__ = ('capacity', 'timestamps', 'raw', 'calibrated', '_next', '_count', '_lock')
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        zeros = bytes(array('d').itemsize * capacity)
+        self.timestamps = array('d', zeros)
+        self.raw = array('d', zeros)
+        self.calibrated = array('d', zeros)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.capacity * SAMPLE_BYTES
+
+    def append(self, timestamp: float, raw_c: float, calibrated_c: float):
+        with self._lock:
+            i = self._next
+            self.timestamps[i] = timestamp
+            self.raw[i] = raw_c
+            self.calibrated[i] = calibrated_c
+            self._next = (i + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def _physical(self, logical: int) -> int:
+        # Map a position counted from the oldest sample to an array index
+        return (self._next - self._count + logical) % self.capacity
+
+    def _first_at_or_after(self, timestamp: float) -> int:
+        # Binary search the logical order; timestamps are appended in order
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._physical(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, since: Optional[float] = None) -> List[Tuple[memoryview, memoryview, memoryview]]:
+        # Samples with timestamp >= since, oldest first, as at most two contiguous
+        # (timestamps, raw, calibrated) memoryview segments. The views alias
+        # the ring, so consume them before the writer wraps around again.
+        with self._lock:
+            first = 0 if since is None else self._first_at_or_after(since)
+            count = self._count - first
+            if count <= 0:
+                return []
+            start = self._physical(first)
+            end = start + count
+            columns = (memoryview(self.timestamps), memoryview(self.raw), memoryview(self.calibrated))
+            if end <= self.capacity:
+                return [tuple(column[start:end] for column in columns)]
+            return [
+                tuple(column[start:] for column in columns),
+                tuple(column[:end - self.capacity] for column in columns),
+            ]
+
+class RecentHistory:
+    # One SampleRing per sensor, sized for a fixed window at a given sample rate
+    def __init__(self, sensor_names, window_seconds=24 * 3600, sample_rate_hz=1.0):
+        self.capacity = int(window_seconds * sample_rate_hz)
+        self.rings: Dict[str, SampleRing] = {name: SampleRing(self.capacity) for name in sensor_names}
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(ring.memory_bytes for ring in self.rings.values())
+
+    def append(self, sensor_name: str, raw_c: float, calibrated_c: float, timestamp: Optional[float] = None):
+        ring = self.rings.get(sensor_name)
+        if ring is not None:
+            ring.append(time.time() if timestamp is None else timestamp, raw_c, calibrated_c)
+
+    def window(self, sensor_name: str, since: Optional[float] = None):
+        return self.rings[sensor_name].window(since)
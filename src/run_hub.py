@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# run_hub.py
+# Hub mode app: no local sensors, just the readings of remote units merged
+# into one namespaced snapshot ("<unit>/<sensor>") and history. Started with
+# PITMASTER_BACKEND=hub and PITMASTER_HUB_UNITS=pit1=http://host:8080,...
+# through wsgi.py like a unit.
+import os
+import time
+
+from flask import Flask, Response, g, jsonify, request
+
+from history_routes import add_history_routes
+from history_store import HistoryStore
+from hub import Hub, parse_units
+from metrics import CONTENT_TYPE, HTTP_BUCKETS, MetricsRegistry
+from snapshot import SnapshotPublisher
+from snapshot_routes import add_snapshot_routes
+
+def create_hub_app(units=None):
+    if units is None:
+        units = parse_units(os.environ.get('PITMASTER_HUB_UNITS', ''))
+    if not units:
+        raise ValueError("Hub mode needs PITMASTER_HUB_UNITS=name=http://host:port,...")
+
+    publisher = SnapshotPublisher()
+
+    # Cook history of every unit, under the namespaced sensor names
+    history = HistoryStore()
+    history.start()
+
+    hub = Hub(units, publisher, history)
+    hub.start()
+    print(f"Hub following {len(units)} units: {', '.join(units)}")
+
+    metrics = MetricsRegistry()
+    http_seconds = metrics.histogram(
+        "pitmaster_http_request_seconds", "HTTP request latency by route", HTTP_BUCKETS, ["route", "method"])
+    stream_clients = metrics.gauge("pitmaster_stream_clients", "Open /stream connections")
+    unit_up = metrics.gauge("pitmaster_hub_unit_up", "1 if the hub is receiving the unit's readings", ["unit"])
+    unit_updates = metrics.counter("pitmaster_hub_updates_total", "Reading sets received per unit", ["unit"])
+    unit_errors = metrics.counter("pitmaster_hub_errors_total", "Failed polls per unit", ["unit"])
+    unit_connects = metrics.counter("pitmaster_hub_connects_total", "Connections opened per unit", ["unit"])
+    probe_temp = metrics.gauge(
+        "pitmaster_probe_temperature_celsius", "Latest calibrated, filtered probe temperature", ["sensor"])
+    probe_up = metrics.gauge(
+        "pitmaster_probe_up", "1 if the probe's latest reading succeeded", ["sensor"])
+
+    def collect_hub_metrics():
+        for name, unit in hub.units.items():
+            unit_up.labels(name).set(1 if unit.up else 0)
+            unit_updates.labels(name).value = unit.updates
+            unit_errors.labels(name).value = unit.errors
+            unit_connects.labels(name).value = unit.connects
+        for name, reading in publisher.current().data.items():
+            if hub.is_sensor(name):
+                up = reading["error"] is None
+                probe_up.labels(name).set(1 if up else 0)
+                if up:
+                    probe_temp.labels(name).set(reading["temp_c"])
+
+    metrics.add_collector(collect_hub_metrics)
+
+    app = Flask(__name__)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.get('request_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_seconds.labels(route, request.method).observe(time.perf_counter() - started)
+        return response
+
+    # /data (plain and long-poll) and /stream (Server-Sent Events)
+    add_snapshot_routes(app, publisher, stream_clients)
+
+    @app.route('/hub/units')
+    def hub_units():
+        # Connection state of every unit
+        return jsonify(hub.status())
+
+    # /history and /history/export under the namespaced sensor names
+    add_history_routes(
+        app, history, hub.is_sensor,
+        lambda: [name for name in history.sensors() if hub.is_sensor(name)], time.time
+    )
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        # Prometheus text exposition format
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+if __name__ == '__main__':
+    from run_pitmaster import serve
+    os.environ['PITMASTER_BACKEND'] = 'hub'
+    serve()
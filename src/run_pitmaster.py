@@ -3,23 +3,80 @@
 
 import os
 import subprocess
+import sys
 import time
+
+# Reference point for the startup timing report
+_startup_t0 = time.perf_counter()
+
 import threading
-from flask import Flask, jsonify, render_template, request
-import RPi.GPIO as GPIO
-from max6675_simple import MAX6675
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+from flask import Flask, Response, g, jsonify, render_template, request
+from alarms import (AlarmDispatcher, AlarmEngine, DisconnectedRule, FileSink, StdoutSink,
+                    WebhookSink, rule_from_config)
+from calibration import get_calibration_manager
+from cpufreq import CpufreqReader, HelperChannel
+from filters import FilterPipeline
+from history_routes import add_history_routes, negotiated
+from history_store import HistoryStore
+from jobs import JobManager
+from max6675_simple import (MAX6675, ConversionScheduler, Max6675Bus, OpenCircuitError, ShortFrameError,
+                            SpiTransport)
+from metrics import CONTENT_TYPE, HTTP_BUCKETS, LOOP_BUCKETS, SPI_BUCKETS, MetricsRegistry
+from pit_controller import PitController, PwmBlower, SimulatedBlower
+from power_governor import LoadSample, PowerGovernor
+from predictor import CookPredictor
+from ring_buffer import RecentHistory
+from sample_scheduler import CaptureHub, SampleScheduler
+from sessions import DEFAULT_BAND, SessionError, SessionStore, export_columnar, export_csv
+from sim_clock import make_clock
+from snapshot import SnapshotPublisher, make_reading, with_error
+from snapshot_routes import add_snapshot_routes
+from telemetry import COLUMNAR
+
+_import_seconds = time.perf_counter() - _startup_t0
 
-# Simulation mode controlled via GUI - default to False (real hardware)
-simulation_mode = False
-simulated_temps = {
+@dataclass(frozen=True)
+class SimulationState:
+    enabled: bool
+    temps: Mapping[str, float]
+
+# Simulation mode controlled via GUI - default to False (real hardware).
+# The state is replaced as a whole, never mutated, so the sensor loop and
+# request handlers always see an enabled flag and temperatures that belong
+# together; writers serialize on _simulation_lock.
+simulation_state = SimulationState(False, MappingProxyType({
     "smoker_left": 25.0,
     "smoker_right": 25.0, 
     "meat_probe": 25.0
-}
+}))
+_simulation_lock = threading.Lock()
+
+def update_simulation(enabled=None, temps=None) -> SimulationState:
+    global simulation_state
+    with _simulation_lock:
+        new_temps = dict(simulation_state.temps)
+        new_temps.update(temps or {})
+        simulation_state = SimulationState(
+            simulation_state.enabled if enabled is None else bool(enabled),
+            MappingProxyType(new_temps)
+        )
+        return simulation_state
 
-def create_app():
-    # Global declaration of simulation_mode
-    global simulation_mode, simulated_temps
+def create_app(backend=None, time_scale=None):
+
+    # Sensor backend: "spi" for real hardware, "emulator" for off-device testing,
+    # "hub" to serve the merged readings of remote units instead of local sensors.
+    # time_scale > 1 runs the emulator and the sensor thread faster than real time.
+    backend = backend or os.environ.get('PITMASTER_BACKEND', 'spi')
+    if backend == 'hub':
+        from run_hub import create_hub_app
+        return create_hub_app()
+    time_scale = time_scale or float(os.environ.get('PITMASTER_TIME_SCALE', '1'))
+    clock = make_clock(time_scale)
 
     # Define CS pins (BCM numbering)
     cs_pins = {
@@ -27,119 +84,363 @@ def create_app():
         "smoker_right": 7,   # GPIO7 (BCM) - Pin 26
         "meat_probe": 16     # GPIO16 (BCM) - Pin 36
     }
+    pit_sensors = ("smoker_left", "smoker_right")
 
-    # Create sensor objects for real hardware
-    sensors = {}
-    sensor_status = {}
-    
-    print("Initializing MAX6675 sensors...")
-    for name, cs_pin in cs_pins.items():
+    # The emulated smoker is shared by the emulated sensors and blower
+    plant = None
+    if backend == 'emulator':
+        from max6675_emulator import SmokerPlant
+        plant = SmokerPlant(clock=clock)
+
+    # Sensor objects are created in the background; until then each one
+    # reports "Initializing" so the HTTP server can start listening at once
+    sensors = {name: None for name in cs_pins}
+    sensor_status = {name: "Initializing" for name in cs_pins}
+    spi_bus = None
+    startup_timings = {"imports": _import_seconds}
+
+    def init_sensor(name, cs_pin, calibration_manager):
+        started = time.perf_counter()
         try:
-            sensors[name] = MAX6675(cs_pin, sensor_name=name)
+            if spi_bus is None:
+                raise RuntimeError("SPI bus not available")
+            sensor = MAX6675(
+                cs_pin, sensor_name=name, bus=spi_bus,
+                calibration_manager=calibration_manager
+            )
             # Test sensor connection
-            if sensors[name].test_sensor_connection():
+            if sensor.test_sensor_connection():
                 sensor_status[name] = "Connected"
                 print(f"✓ {name} initialized successfully")
             else:
                 sensor_status[name] = "Connection Error"
                 print(f"✗ {name} failed to initialize")
+            sensors[name] = sensor
         except Exception as e:
-            sensors[name] = None
             sensor_status[name] = f"Error: {str(e)}"
             print(f"✗ Failed to initialize {name}: {e}")
+        startup_timings[f"init {name}"] = time.perf_counter() - started
 
-    temperature_data = {
-        "smoker_left": {"temp_c": 0.0, "temp_f": 0.0, "raw_temp_c": 0.0, "error": None},
-        "smoker_right": {"temp_c": 0.0, "temp_f": 0.0, "raw_temp_c": 0.0, "error": None},
-        "meat_probe": {"temp_c": 0.0, "temp_f": 0.0, "raw_temp_c": 0.0, "error": None},
-        "last_updated": "",
-        "sensor_status": sensor_status,
-        "simulation_mode": simulation_mode
-    }
+    def init_sensors():
+        # Open the bus and probe every sensor in parallel; each probe mostly
+        # waits on its chip's conversion, so the waits overlap
+        nonlocal spi_bus
+        started = time.perf_counter()
+
+        # One calibration manager and one SPI handle shared by every probe
+        calibration_manager = get_calibration_manager()
+        try:
+            if backend == 'emulator':
+                from max6675_emulator import EmulatedTransport
+                transport = EmulatedTransport(plant)
+            else:
+                transport = SpiTransport()
+            spi_bus = Max6675Bus(transport, ConversionScheduler(clock=clock.monotonic, sleep=clock.sleep))
+            spi_bus.transfer_observer = spi_read_seconds.labels().observe
+        except Exception as e:
+            spi_bus = None
+            print(f"✗ Failed to open SPI bus: {e}")
+
+        print("Initializing MAX6675 sensors...")
+        with ThreadPoolExecutor(max_workers=len(cs_pins)) as pool:
+            for name, cs_pin in cs_pins.items():
+                pool.submit(init_sensor, name, cs_pin, calibration_manager)
+        startup_timings["sensor init"] = time.perf_counter() - started
+
+    def report_startup_timings():
+        startup_timings["first reading"] = time.perf_counter() - _startup_t0
+        report = ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in startup_timings.items())
+        print(f"[startup] {report}")
+
+    # Latest immutable reading per probe. Only the sensor loop replaces entries;
+    # everyone else reads the published snapshot built from them.
+    readings = {name: make_reading(0.0, 0.0, 0.0, "Initializing") for name in cs_pins}
+
+    def reading_set(last_updated, simulation_enabled):
+        return {
+            **readings,
+            "last_updated": last_updated,
+            "sensor_status": dict(sensor_status),
+            "simulation_mode": simulation_enabled
+        }
+
+    def latest_pit_temp():
+        # Mean of the valid pit probes' latest readings, None if none are valid
+        temps = [readings[pit]["temp_c"] for pit in pit_sensors if readings[pit]["error"] is None]
+        return sum(temps) / len(temps) if temps else None
+
+    # Pre-encoded, read-only reading set served by /data
+    publisher = SnapshotPublisher()
+    publisher.publish(reading_set("", simulation_state.enabled))
+
+    # Long-term cook history, written to disk in batches
+    history = HistoryStore(clock=clock.time)
+    history.start()
+
+    # Cook sessions: named spans of that history, whose raw readings are kept
+    # past the raw retention, with pit summaries kept up to date as they record
+    sessions = SessionStore(clock=clock.time)
+    sessions.start()
+    history.retain_ranges = sessions.ranges
+
+    # Spike rejection, median and Kalman smoothing between read and publish
+    filter_pipelines = {name: FilterPipeline() for name in cs_pins}
+
+    # Each probe is read on its own period; 3 s until changed through /sensor/rates
+    sample_scheduler = SampleScheduler({name: 3.0 for name in cs_pins}, clock.monotonic, clock.scale)
+
+    # Sensor tests and calibration capture run as background jobs that take
+    # fresh samples from the sensor loop rather than touching the bus
+    capture_hub = CaptureHub(sample_scheduler)
+    jobs = JobManager()
+
+    def capture_samples(names, count):
+        timeout = clock.to_real(count * SampleScheduler.MIN_PERIOD) + 5.0
+        return capture_hub.capture(names, count, timeout)
+
+    def read_pit_temp():
+        # Mean of the valid pit probes in the latest snapshot, None if stale.
+        # Runs on the native control thread, so it takes no locks.
+        snapshot = publisher.current()
+        periods = sample_scheduler.current_periods
+        max_age = clock.to_real(3 * max(periods[name] for name in pit_sensors))
+        if time.time() - snapshot.published_at > max(30.0, max_age):
+            return None
+        temps = [
+            snapshot.data[name]["temp_c"] for name in pit_sensors
+            if name in snapshot.data and snapshot.data[name]["error"] is None
+        ]
+        return sum(temps) / len(temps) if temps else None
+
+    # PID blower control on its own fixed-rate thread; disabled until a setpoint is enabled
+    blower_pin = os.environ.get('PITMASTER_BLOWER_PIN')
+    if blower_pin and backend != 'emulator':
+        blower = PwmBlower(int(blower_pin))
+    else:
+        blower = SimulatedBlower(plant)
+    controller = PitController(read_pit_temp, blower, period=1.0, clock=clock)
+    controller.start()
+
+    # Online time-to-target estimate for the meat probe
+    predict_sensor = "meat_probe"
+    predictor = CookPredictor()
+
+    # Alarm rules, evaluated on every reading; notifications go out on a worker
+    alarm_dispatcher = AlarmDispatcher([StdoutSink()])
+    if os.environ.get('PITMASTER_ALARM_WEBHOOK'):
+        alarm_dispatcher.add_sink(WebhookSink(os.environ['PITMASTER_ALARM_WEBHOOK']))
+    if os.environ.get('PITMASTER_ALARM_FILE'):
+        alarm_dispatcher.add_sink(FileSink(os.environ['PITMASTER_ALARM_FILE']))
+    alarm_dispatcher.start()
+    alarms = AlarmEngine(alarm_dispatcher, rules_file="alarm_rules.json")
+    if not alarms.rules():
+        for name in cs_pins:
+            alarms.add_rule(DisconnectedRule(f"{name}-disconnected", name, debounce=10.0), save=False)
+
+    # Last 24 hours per sensor in preallocated ring buffers
+    recent = RecentHistory(cs_pins.keys())
+    print(f"Recent history: {recent.capacity} samples per sensor, {recent.memory_bytes / 1e6:.1f} MB reserved")
+
+    # Prometheus metrics: hot paths only bump counters, gauges that can be
+    # read from existing state are filled in at scrape time
+    metrics = MetricsRegistry()
+    spi_read_seconds = metrics.histogram(
+        "pitmaster_spi_read_seconds", "Time to clock one MAX6675 frame off the bus", SPI_BUCKETS)
+    sensor_reads = metrics.counter(
+        "pitmaster_sensor_reads_total", "Successful probe readings", ["sensor"])
+    sensor_errors = metrics.counter(
+        "pitmaster_sensor_errors_total", "Failed probe readings by cause", ["sensor", "cause"])
+    loop_seconds = metrics.histogram(
+        "pitmaster_sensor_loop_cycle_seconds", "Duration of one sensor loop cycle", LOOP_BUCKETS)
+    loop_overruns = metrics.counter(
+        "pitmaster_sensor_loop_overruns_total", "Sample slots skipped because the loop fell behind", ["sensor"])
+    probe_temp = metrics.gauge(
+        "pitmaster_probe_temperature_celsius", "Latest calibrated, filtered probe temperature", ["sensor"])
+    probe_up = metrics.gauge(
+        "pitmaster_probe_up", "1 if the probe's latest reading succeeded", ["sensor"])
+    http_seconds = metrics.histogram(
+        "pitmaster_http_request_seconds", "HTTP request latency by route", HTTP_BUCKETS, ["route", "method"])
+    http_requests = metrics.counter("pitmaster_http_requests_total", "HTTP requests served")
+    stream_clients = metrics.gauge("pitmaster_stream_clients", "Open /stream connections")
+    sensor_read_counters = {name: sensor_reads.labels(name) for name in cs_pins}
+    for name in cs_pins:
+        for cause in ("open_circuit", "short_frame"):
+            sensor_errors.labels(name, cause)
+    loop_cycle = loop_seconds.labels()
+
+    def collect_sensor_metrics():
+        data = publisher.current().data
+        for name in cs_pins:
+            reading = data.get(name, {})
+            up = reading.get("error") is None
+            probe_up.labels(name).set(1 if up else 0)
+            if up:
+                probe_temp.labels(name).set(reading["temp_c"])
+        for name, count in list(sample_scheduler.overruns.items()):
+            loop_overruns.labels(name).value = count
+
+    metrics.add_collector(collect_sensor_metrics)
 
     app = Flask(__name__)
 
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        started = g.get('request_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_seconds.labels(route, request.method).observe(time.perf_counter() - started)
+        http_requests.inc()
+        return response
+
+    # CPU frequency: status read straight from sysfs (cached briefly), changes
+    # through one long-lived privileged helper
+    cpufreq_reader = CpufreqReader()
+    power_helper = HelperChannel()
+
     def read_cpufreq_status():
-        # Read CPU frequency settings using helper script
+        # Per-core cpufreq status; frequencies in kHz
         try:
-            # Use full path to sudo for reliability
-            result = subprocess.run(
-                ['/usr/bin/sudo', '/usr/local/bin/cpu-power-helper.sh', 'get-status'],
-                capture_output=True, text=True, check=True, timeout=10
-            )
-            lines = result.stdout.strip().split('\n')
-            if len(lines) >= 4:
-                return {
-                    'governor': lines[0],
-                    'cur_freq': lines[1],
-                    'min_freq': lines[2],
-                    'max_freq': lines[3]
-                }
-            else:
-                raise Exception(f"Invalid response from helper script. Got {len(lines)} lines, expected 4")
-        except subprocess.TimeoutExpired:
-            raise Exception("Helper script timeout - check if helper script is installed correctly")
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Helper script error (code {e.returncode}): {e.stderr}")
-        except FileNotFoundError:
-            raise Exception("sudo or helper script not found - check installation")
+            return cpufreq_reader.read()
         except Exception as e:
             raise Exception(f"Failed to read CPU settings: {str(e)}")
 
     def set_cpufreq_mode(mode):
-        # Set CPU frequency mode using helper script
+        # Set CPU frequency mode on every core through the helper
+        if mode not in ('powersave', 'ondemand'):
+            raise ValueError("Invalid mode")
         try:
-            if mode == 'powersave':
-                cmd = ['/usr/bin/sudo', '/usr/local/bin/cpu-power-helper.sh', 'set-powersave']
-            elif mode == 'ondemand':
-                cmd = ['/usr/bin/sudo', '/usr/local/bin/cpu-power-helper.sh', 'set-ondemand']
-            else:
-                raise ValueError("Invalid mode")
-            
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, check=True, timeout=10
-            )
-            return result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            raise Exception("Helper script timeout - check if helper script is installed correctly")
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Helper script error (code {e.returncode}): {e.stderr}")
-        except FileNotFoundError:
-            raise Exception("sudo or helper script not found - check installation")
+            return power_helper.request(f"set-{mode}")
         except Exception as e:
             raise Exception(f"Failed to set CPU settings: {str(e)}")
+        finally:
+            cpufreq_reader.invalidate()
+
+    # Automatic powersave/ondemand switching from dashboard load. Off unless
+    # PITMASTER_POWER_GOVERNOR=1, so the CPU governor set by cpu-power.service
+    # is left alone until the owner opts in (or turns it on at /power/governor)
+    load_counters = {"requests": 0, "overruns": 0, "at": time.monotonic()}
+
+    def sample_load():
+        now = time.monotonic()
+        requests_total = http_requests.labels().value
+        overruns_total = sum(sample_scheduler.overruns.values())
+        elapsed = max(now - load_counters["at"], 1e-6)
+        sample = LoadSample(
+            request_rate=(requests_total - load_counters["requests"]) / elapsed,
+            stream_clients=int(stream_clients.labels().value),
+            overruns=overruns_total - load_counters["overruns"]
+        )
+        load_counters.update(requests=requests_total, overruns=overruns_total, at=now)
+        return sample
+
+    try:
+        initial_mode = read_cpufreq_status()[0]['governor']
+    except Exception:
+        initial_mode = None
+    power_governor = PowerGovernor(set_cpufreq_mode, sample_load, initial_mode)
+    power_governor.set_enabled(
+        os.environ.get('PITMASTER_POWER_GOVERNOR', '0') == '1' and bool(cpufreq_reader.cores)
+    )
+    power_governor.start()
+
+    power_mode_seconds = metrics.counter(
+        "pitmaster_power_mode_seconds_total", "Time spent in each CPU power profile", ["mode"])
+    power_governor_enabled = metrics.gauge(
+        "pitmaster_power_governor_enabled", "1 if automatic power switching is on")
+
+    def collect_power_metrics():
+        status = power_governor.status()
+        for mode, seconds in status["time_in_mode"].items():
+            power_mode_seconds.labels(mode).value = seconds
+        power_governor_enabled.set(1 if status["enabled"] else 0)
+
+    metrics.add_collector(collect_power_metrics)
 
     def read_sensors_loop():
-        global simulation_mode, simulated_temps
+        init_sensors()
+        first_reading = True
         while True:
-            for name, sensor in sensors.items():
+            due = sample_scheduler.due()
+            if not due:
+                sample_scheduler.wait()
+                continue
+            cycle_started = time.perf_counter()
+            # One consistent view of the simulation settings for the whole cycle
+            sim = simulation_state
+
+            # Poll every due probe in a single pass over the shared bus
+            words = {}
+            if not sim.enabled and spi_bus is not None:
                 try:
-                    if simulation_mode:
+                    words = spi_bus.read_all(names=due)
+                except Exception as e:
+                    print(f"[ERROR] Reading SPI bus: {e}")
+
+            for name in due:
+                sensor = sensors[name]
+                try:
+                    if sim.enabled:
                         # Use simulated temperature for testing
-                        raw_temp_c = simulated_temps[name]
+                        raw_temp_c = sim.temps[name]
                         temp_c = raw_temp_c
                     else:
                         # Read from actual hardware
                         if sensor is not None:
-                            raw_temp_c = sensor.read_temp_c()
-                            temp_c = raw_temp_c
+                            raw_temp_c = sensor.raw_from_word(words.get(name))
+                            temp_c = filter_pipelines[name].process(sensor.calibrate(raw_temp_c))
                         else:
-                            temperature_data[name]["error"] = "Sensor not initialized"
+                            readings[name] = with_error(readings[name], "Sensor not initialized")
+                            sensor_errors.labels(name, "not_initialized").inc()
                             continue
                     
                     temp_f = temp_c * 9/5 + 32
-                    temperature_data[name]["temp_c"] = round(temp_c, 2)
-                    temperature_data[name]["temp_f"] = round(temp_f, 2)
-                    temperature_data[name]["raw_temp_c"] = round(raw_temp_c, 2)
-                    temperature_data[name]["error"] = None
+                    readings[name] = make_reading(round(temp_c, 2), round(temp_f, 2), round(raw_temp_c, 2), None)
+                    sensor_read_counters[name].inc()
+
+                    now = clock.time()
+                    recent.append(name, raw_temp_c, temp_c, now)
+
+                    # Simulated values would pollute the cook history
+                    if not sim.enabled:
+                        history.record(name, now, raw_temp_c, temp_c)
+                        if name == predict_sensor:
+                            predictor.add_sample(now, temp_c, latest_pit_temp())
                     
                 except Exception as e:
-                    temperature_data[name]["error"] = str(e)
+                    readings[name] = with_error(readings[name], str(e))
+                    if isinstance(e, OpenCircuitError):
+                        cause = "open_circuit"
+                    elif isinstance(e, ShortFrameError):
+                        cause = "short_frame"
+                    else:
+                        cause = "other"
+                    sensor_errors.labels(name, cause).inc()
                     print(f"[ERROR] Reading {name}: {e}")
+
+            now = clock.time()
+            for name in due:
+                reading = readings[name]
+                error = reading["error"]
+                alarms.evaluate(name, reading["temp_c"] if error is None else None, error, now)
+                capture_hub.feed(name, reading, sim.enabled)
+
+            # Pit summary of the recording cook session
+            if not sim.enabled and any(name in pit_sensors for name in due):
+                pit_temp = latest_pit_temp()
+                if pit_temp is not None:
+                    sessions.record_pit(now, pit_temp)
             
-            temperature_data["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
-            temperature_data["simulation_mode"] = simulation_mode
-            time.sleep(3)  # Read sensors every 3 seconds
+            last_updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(clock.time()))
+            publisher.publish(reading_set(last_updated, sim.enabled))
+            loop_cycle.observe(time.perf_counter() - cycle_started)
+
+            if first_reading:
+                first_reading = False
+                report_startup_timings()
 
     # Route for temperature monitoring page
     @app.route('/')
@@ -162,28 +463,69 @@ def create_app():
     def simulation():
         return render_template('simulation.html')
 
-    @app.route('/data')
-    def get_data():
-        return jsonify(temperature_data)
+    # /data (plain and long-poll) and /stream (Server-Sent Events)
+    add_snapshot_routes(app, publisher, stream_clients)
     
+    # /history (one sensor, negotiated encoding) and /history/export (frames)
+    add_history_routes(app, history, lambda name: name in cs_pins, lambda: cs_pins.keys(), clock.time)
+
+    @app.route('/recent')
+    def get_recent():
+        # In-memory readings for one sensor: /recent?sensor=&seconds=
+        sensor_name = request.args.get('sensor')
+        if sensor_name not in cs_pins:
+            return jsonify({"status": "error", "message": "Invalid sensor name"}), 400
+        since = clock.time() - request.args.get('seconds', 3600.0, type=float)
+        segments = recent.window(sensor_name, since)
+        count = sum(len(ts) for ts, _, _ in segments)
+
+        if request.args.get('format') == 'binary':
+            # Packed doubles written straight from the ring: all timestamps,
+            # then all raw values, then all calibrated values
+            def columns():
+                for column in range(3):
+                    for segment in segments:
+                        yield segment[column].cast('B')
+            return Response(columns(), mimetype='application/octet-stream', headers={
+                'X-Sample-Count': str(count),
+                'X-Sample-Layout': 'ts,raw_c,temp_c;float64;column-major',
+                'X-Byte-Order': sys.byteorder
+            })
+
+        return negotiated(app, {
+            "sensor": sensor_name,
+            "count": count,
+            "ts": [t for ts, _, _ in segments for t in ts.tolist()],
+            "raw_c": [v for _, raw, _ in segments for v in raw.tolist()],
+            "temp_c": [v for _, _, cal in segments for v in cal.tolist()]
+        })
+
     @app.route('/powerstatus')
     def powerstatus():
         # Check current power status using helper script
         try:
-            cpufreq = read_cpufreq_status()
-            governor = cpufreq['governor']
-            cur_freq = int(cpufreq['cur_freq']) // 1000
-            min_freq = int(cpufreq['min_freq']) // 1000
-            max_freq = int(cpufreq['max_freq']) // 1000
+            cores = read_cpufreq_status()
+            cpu0 = cores[0]
+            governor = cpu0['governor']
         
             power_mode = "LOW POWER 24/7" if governor == "powersave" else "FULL POWER"
         
             return jsonify({
                 "power_mode": power_mode,
                 "cpu_governor": governor,
-                "cpu_cur_freq": cur_freq,
-                "cpu_min_freq": min_freq,
-                "cpu_max_freq": max_freq,
+                "cpu_cur_freq": cpu0['cur_freq'] // 1000,
+                "cpu_min_freq": cpu0['min_freq'] // 1000,
+                "cpu_max_freq": cpu0['max_freq'] // 1000,
+                "cpus": [
+                    {
+                        "cpu": core['cpu'],
+                        "governor": core['governor'],
+                        "cur_freq": core['cur_freq'] // 1000,
+                        "min_freq": core['min_freq'] // 1000,
+                        "max_freq": core['max_freq'] // 1000
+                    }
+                    for core in cores
+                ],
                 "status": "Running"
             })
         except Exception as e:
@@ -196,6 +538,7 @@ def create_app():
         try:
             result = set_cpufreq_mode('powersave')
             if result == "OK":
+                power_governor.manual_mode('powersave')
                 return "Low power mode enabled successfully"
             else:
                 return f"Unexpected response: {result}"
@@ -208,12 +551,24 @@ def create_app():
         try:
             result = set_cpufreq_mode('ondemand')
             if result == "OK":
+                power_governor.manual_mode('ondemand')
                 return "Full power mode enabled successfully"
             else:
                 return f"Unexpected response: {result}"
         except Exception as e:
             return f"Error: {str(e)}"
 
+    @app.route('/power/governor', methods=['GET', 'POST'])
+    def power_governor_status():
+        # Automatic power switching: GET for state and time in each mode,
+        # POST {"enabled": true|false} to turn it on or off
+        if request.method == 'POST':
+            try:
+                power_governor.set_enabled(bool(request.get_json()['enabled']))
+            except Exception as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+        return jsonify(power_governor.status())
+
     @app.route('/shutdown')
     def shutdown():
         # Manual shutdown endpoint
@@ -246,21 +601,48 @@ def create_app():
     
     @app.route('/calibration/add_point', methods=['POST'])
     def add_calibration_point():
-        # Add a calibration point for a sensor
+        # Start capturing a calibration point for a sensor: the measured value
+        # is the average of `samples` fresh raw readings. Poll /jobs/<job_id>.
         try:
             data = request.get_json()
             sensor_name = data.get('sensor_name')
             actual_temp = float(data.get('actual_temp'))
+            count = int(data.get('samples', 5))
+            if not 1 <= count <= 50:
+                raise ValueError("samples must be between 1 and 50")
             
-            if sensor_name in sensors and sensors[sensor_name] is not None:
-                # Use current sensor reading as measured temperature
-                measured_temp = sensors[sensor_name].read_temp_c()
-                
-                sensors[sensor_name].add_calibration_point(actual_temp, measured_temp)
+            if simulation_state.enabled:
+                # The sensor loop would hand the capture simulated temperatures
                 return jsonify({
-                    "status": "success", 
-                    "message": f"Calibration point added: actual={actual_temp}°C, measured={measured_temp:.2f}°C"
-                })
+                    "status": "error",
+                    "message": "Simulation mode is enabled. Disable it to capture a calibration point."
+                }), 409
+
+            if sensor_name in sensors and sensors[sensor_name] is not None:
+                def capture_point():
+                    capture = capture_samples([sensor_name], count)
+                    if capture.simulated:
+                        raise RuntimeError("Simulation mode was enabled during the capture - point not added")
+                    taken = capture.readings[sensor_name]
+                    values = [r["raw_temp_c"] for r in taken if r["error"] is None]
+                    if len(values) < max(1, count // 2):
+                        raise RuntimeError(
+                            f"Only {len(values)} of {count} samples were valid - check the probe"
+                        )
+                    measured_temp = sum(values) / len(values)
+                    calibration = sensors[sensor_name].add_calibration_point(actual_temp, measured_temp)
+                    return {
+                        "message": f"Calibration point added: actual={actual_temp}°C, measured={measured_temp:.2f}°C "
+                                   f"({calibration['points_count']} points, {calibration['mode']})",
+                        "sensor_name": sensor_name,
+                        "actual_temp": actual_temp,
+                        "measured_temp": measured_temp,
+                        "samples": values,
+                        "calibration": calibration
+                    }
+
+                job = jobs.submit("calibration_capture", capture_point)
+                return jsonify({"status": "accepted", "job_id": job.id, "poll": f"/jobs/{job.id}"}), 202
             else:
                 return jsonify({"status": "error", "message": "Invalid sensor name or sensor not available"}), 400
         except Exception as e:
@@ -276,16 +658,43 @@ def create_app():
             measured_temp = float(data.get('measured_temp'))
             
             if sensor_name in sensors and sensors[sensor_name] is not None:
-                sensors[sensor_name].add_calibration_point(actual_temp, measured_temp)
+                calibration = sensors[sensor_name].add_calibration_point(actual_temp, measured_temp)
                 return jsonify({
                     "status": "success", 
-                    "message": f"Calibration point added: actual={actual_temp}°C, measured={measured_temp}°C"
+                    "message": f"Calibration point added: actual={actual_temp}°C, measured={measured_temp}°C",
+                    "calibration": calibration
                 })
             else:
                 return jsonify({"status": "error", "message": "Invalid sensor name or sensor not available"}), 400
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 400
     
+    @app.route('/calibration/import', methods=['POST'])
+    def import_calibration():
+        # Fit calibrations from many points at once:
+        # {"mode": "linear"|"polynomial"|"piecewise", "degree": 2, "knots": [°C, ...],
+        #  "sensors": {"smoker_left": [{"actual": 100, "measured": 102.5, "weight": 1}, ...]}}
+        # Points may also be [actual, measured] or [actual, measured, weight] lists.
+        try:
+            data = request.get_json()
+            points_by_sensor = {}
+            for sensor_name, points in data.get('sensors', {}).items():
+                if sensor_name not in cs_pins:
+                    raise ValueError(f"Invalid sensor name: {sensor_name}")
+                points_by_sensor[sensor_name] = [
+                    (p['actual'], p['measured'], p.get('weight', 1.0)) if isinstance(p, dict)
+                    else (p[0], p[1], p[2] if len(p) > 2 else 1.0)
+                    for p in points
+                ]
+            if not points_by_sensor:
+                raise ValueError("No calibration points given")
+            report = get_calibration_manager().import_points(
+                points_by_sensor, data.get('mode', 'linear'), data.get('degree', 2), data.get('knots')
+            )
+            return jsonify({"status": "success", "sensors": report})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
     @app.route('/calibration/clear', methods=['POST'])
     def clear_calibration():
         # Clear calibration for a sensor
@@ -301,19 +710,238 @@ def create_app():
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 400
 
-    @app.route('/sensor/test')
+    @app.route('/sensor/rates', methods=['GET', 'POST'])
+    def sensor_rates():
+        # Get or set the sample period (seconds) of each sensor
+        if request.method == 'GET':
+            return jsonify({
+                "periods": sample_scheduler.periods(),
+                "overruns": dict(sample_scheduler.overruns),
+                "min_period": SampleScheduler.MIN_PERIOD,
+                "max_period": SampleScheduler.MAX_PERIOD
+            })
+        try:
+            data = request.get_json()
+            sensor_name = data.get('sensor_name')
+            period = float(data.get('period'))
+
+            if sensor_name not in cs_pins:
+                return jsonify({"status": "error", "message": "Invalid sensor name"}), 400
+            sample_scheduler.set_period(sensor_name, period)
+            return jsonify({
+                "status": "success",
+                "message": f"{sensor_name} now sampled every {period} s"
+            })
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/sensor/filters', methods=['GET', 'POST'])
+    def sensor_filters():
+        # Get or replace the filter pipeline of each sensor
+        if request.method == 'GET':
+            return jsonify({name: pipeline.config() for name, pipeline in filter_pipelines.items()})
+        try:
+            data = request.get_json()
+            sensor_name = data.get('sensor_name')
+
+            if sensor_name not in cs_pins:
+                return jsonify({"status": "error", "message": "Invalid sensor name"}), 400
+            # A new pipeline starts with empty state; the loop picks it up on its next read
+            filter_pipelines[sensor_name] = FilterPipeline(data.get('filters'))
+            return jsonify({
+                "status": "success",
+                "message": f"Filters updated for {sensor_name}",
+                "filters": filter_pipelines[sensor_name].config()
+            })
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/controller')
+    def controller_status():
+        # Pit controller state and loop timing
+        return jsonify(controller.status())
+
+    @app.route('/controller/setpoint', methods=['POST'])
+    def controller_setpoint():
+        # Set the pit setpoint (°C) and/or enable the controller
+        try:
+            data = request.get_json()
+            if 'setpoint' in data:
+                controller.set_setpoint(float(data['setpoint']))
+            if 'enabled' in data:
+                controller.set_enabled(bool(data['enabled']))
+            return jsonify({"status": "success", "controller": controller.status()})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/controller/tuning', methods=['POST'])
+    def controller_tuning():
+        # Update the PID gains kp, ki and kd
+        try:
+            data = request.get_json()
+            controller.set_tuning(data.get('kp'), data.get('ki'), data.get('kd'))
+            return jsonify({"status": "success", "tuning": controller.pid.tuning()})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/sessions', methods=['GET', 'POST'])
+    def cook_sessions():
+        # GET lists sessions, newest first. POST starts recording one:
+        # {"name": "...", "notes": "...", "band": [low_c, high_c]}
+        if request.method == 'GET':
+            return jsonify(sessions.list())
+        try:
+            data = request.get_json() or {}
+            name = str(data.get('name') or time.strftime("Cook %Y-%m-%d", time.localtime(clock.time())))
+            session = sessions.start_session(name, str(data.get('notes', '')), data.get('band', DEFAULT_BAND))
+        except SessionError as e:
+            return jsonify({"status": "error", "message": str(e)}), 409
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        # A new cook: earlier meat readings say nothing about this one
+        predictor.reset()
+        return jsonify(session), 201
+
+    @app.route('/sessions/<int:session_id>', methods=['GET', 'PATCH', 'DELETE'])
+    def cook_session(session_id):
+        # One session; PATCH {"name", "notes"} edits it, DELETE forgets a finished one
+        try:
+            if request.method == 'PATCH':
+                data = request.get_json() or {}
+                return jsonify(sessions.update_session(session_id, data.get('name'), data.get('notes')))
+            if request.method == 'DELETE':
+                sessions.delete_session(session_id)
+                return jsonify({"status": "success", "message": f"Session {session_id} deleted"})
+        except KeyError:
+            pass
+        except SessionError as e:
+            return jsonify({"status": "error", "message": str(e)}), 409
+        session = sessions.get(session_id)
+        if session is None:
+            return jsonify({"status": "error", "message": f"Unknown session: {session_id}"}), 404
+        return jsonify(session)
+
+    @app.route('/sessions/<int:session_id>/stop', methods=['POST'])
+    def stop_cook_session(session_id):
+        try:
+            return jsonify(sessions.stop_session(session_id))
+        except SessionError as e:
+            return jsonify({"status": "error", "message": str(e)}), 409
+
+    @app.route('/sessions/<int:session_id>/export')
+    def export_cook_session(session_id):
+        # Every raw reading of the session, streamed: ?format=csv (default) or columnar
+        session = sessions.get(session_id)
+        if session is None:
+            return jsonify({"status": "error", "message": f"Unknown session: {session_id}"}), 404
+        export_format = request.args.get('format', 'csv')
+        start = session["started_at"]
+        end = session["ended_at"] if session["ended_at"] is not None else clock.time()
+        names = list(cs_pins)
+        if export_format == 'csv':
+            body, mimetype, extension = export_csv(history, names, start, end), 'text/csv', 'csv'
+        elif export_format == 'columnar':
+            body, mimetype, extension = export_columnar(history, names, start, end), COLUMNAR, 'ptmc'
+        else:
+            return jsonify({"status": "error", "message": "format must be csv or columnar"}), 400
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="session-{session_id}.{extension}"'
+        })
+
+    @app.route('/predict')
+    def predict():
+        # Estimated time for the meat probe to reach ?target= (°C, default 95)
+        try:
+            target = float(request.args.get('target', 95.0))
+            if not 0 < target < 400:
+                raise ValueError("Target must be between 0 and 400 °C")
+            result = predictor.predict(target)
+            if result["done_at"] is not None:
+                result["done_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(result["done_at"]))
+            return jsonify({"status": "success", "sensor": predict_sensor, "prediction": result})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/alarms')
+    def alarm_status():
+        # Alarm rules, currently active alarms and recent events
+        return jsonify(alarms.status())
+
+    @app.route('/alarms/rules', methods=['POST'])
+    def add_alarm_rule():
+        # Add or replace a rule, e.g. {"id": "pit-high", "type": "high",
+        # "sensor": "smoker_left", "threshold": 135, "hysteresis": 3, "debounce": 30}
+        try:
+            rule = rule_from_config(request.get_json())
+            alarms.add_rule(rule)
+            return jsonify({"status": "success", "rule": rule.config()})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    @app.route('/alarms/rules/<rule_id>', methods=['DELETE'])
+    def remove_alarm_rule(rule_id):
+        try:
+            alarms.remove_rule(rule_id)
+            return jsonify({"status": "success"})
+        except KeyError:
+            return jsonify({"status": "error", "message": f"Unknown rule: {rule_id}"}), 404
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        # Prometheus text exposition, re-rendered at most once a second
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    @app.route('/sensor/test', methods=['POST'])
     def test_sensors():
-        # Test all sensors and return their status
-        results = {}
-        for name, sensor in sensors.items():
-            if sensor is not None:
+        # Start a test of every available sensor: `samples` fresh readings each,
+        # taken concurrently by the sensor loop. Poll /jobs/<job_id>.
+        data = request.get_json(silent=True) or {}
+        try:
+            count = int(data.get('samples', 3))
+            if not 1 <= count <= 50:
+                raise ValueError("samples must be between 1 and 50")
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        available = [
+            name for name, sensor in sensors.items()
+            if sensor is not None or simulation_state.enabled
+        ]
+
+        def run_test():
+            capture = capture_samples(available, count) if available else None
+            results = {}
+            for name in cs_pins:
+                if name not in available:
+                    results[name] = {"status": "Not available"}
+                    continue
+                taken = capture.readings[name]
+                samples = [r["temp_c"] if r["error"] is None else None for r in taken]
+                valid = [v for v in samples if v is not None]
+                if len(samples) < count:
+                    status = "Incomplete"
+                elif len(valid) == count:
+                    status = "OK"
+                else:
+                    status = "Errors"
                 results[name] = {
-                    "status": "Testing...",
-                    "samples": sensor.read_multiple_samples(3, 0.5)
+                    "status": status,
+                    "samples": samples,
+                    "errors": [r["error"] for r in taken if r["error"] is not None],
+                    "average": sum(valid) / len(valid) if valid else None,
+                    "spread": max(valid) - min(valid) if valid else None
                 }
-            else:
-                results[name] = {"status": "Not available"}
-        return jsonify(results)
+            return results
+
+        job = jobs.submit("sensor_test", run_test)
+        return jsonify({"status": "accepted", "job_id": job.id, "poll": f"/jobs/{job.id}"}), 202
+
+    @app.route('/jobs/<job_id>')
+    def get_job(job_id):
+        # Status and, once finished, result of a background job
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": f"Unknown job: {job_id}"}), 404
+        return jsonify(job.to_dict())
 
     # Simulation endpoints for testing
     @app.route('/simulation/set_mode', methods=['POST'])
@@ -323,14 +951,13 @@ def create_app():
             data = request.get_json()
             mode = data.get('enabled', False)
             
-            global simulation_mode
-            simulation_mode = bool(mode)
+            enabled = update_simulation(enabled=bool(mode)).enabled
             
-            status = "enabled" if simulation_mode else "disabled"
+            status = "enabled" if enabled else "disabled"
             return jsonify({
                 "status": "success", 
                 "message": f"Simulation mode {status}",
-                "simulation_mode": simulation_mode
+                "simulation_mode": enabled
             })
                 
         except Exception as e:
@@ -338,12 +965,10 @@ def create_app():
 
     @app.route('/simulation/set_temperature', methods=['POST'])
     def set_simulated_temperature():
-        global simulation_mode
-
         # Set simulated temperature for a sensor (for testing only)
         try:
             # Check if simulation mode is enabled
-            if not simulation_mode:
+            if not simulation_state.enabled:
                 return jsonify({
                     "status": "error", 
                     "message": "Simulation mode is disabled. Enable it first to set simulated temperatures."
@@ -353,7 +978,7 @@ def create_app():
             sensor_name = data.get('sensor_name')
             temperature = float(data.get('temperature'))
             
-            if sensor_name in simulated_temps:
+            if sensor_name in simulation_state.temps:
                 # Test for integer overflow and range limits
                 if temperature < -273.15:  # Absolute zero
                     return jsonify({"status": "error", "message": "Temperature below absolute zero"}), 400
@@ -365,7 +990,7 @@ def create_app():
                         "message": f"Temperature {temperature}°C outside Type-K range (-200°C to +1350°C)"
                     })
                 
-                simulated_temps[sensor_name] = temperature
+                update_simulation(temps={sensor_name: temperature})
                 return jsonify({
                     "status": "success", 
                     "message": f"Set {sensor_name} to {temperature}°C"
@@ -380,12 +1005,10 @@ def create_app():
 
     @app.route('/simulation/set_all', methods=['POST'])
     def set_all_simulated_temperatures():
-        global simulation_mode
-        
         # Set all sensors to the same temperature (for testing only)
         try:
             # Check if simulation mode is enabled
-            if not simulation_mode:
+            if not simulation_state.enabled:
                 return jsonify({
                     "status": "error", 
                     "message": "Simulation mode is disabled. Enable it first to set simulated temperatures."
@@ -405,8 +1028,7 @@ def create_app():
                     "message": f"Temperature {temperature}°C outside Type-K range (-200°C to +1350°C)"
                 })
             
-            for sensor_name in simulated_temps.keys():
-                simulated_temps[sensor_name] = temperature
+            update_simulation(temps={sensor_name: temperature for sensor_name in simulation_state.temps})
                 
             return jsonify({
                 "status": "success", 
@@ -420,12 +1042,10 @@ def create_app():
 
     @app.route('/simulation/test_extremes', methods=['POST'])
     def test_temperature_extremes():
-        global simulation_mode
-
         # Test extreme temperature values (for testing only)
         try:
             # Check if simulation mode is enabled
-            if not simulation_mode:
+            if not simulation_state.enabled:
                 return jsonify({
                     "status": "error", 
                     "message": "Simulation mode is disabled. Enable it first to run extreme tests."
@@ -447,8 +1067,7 @@ def create_app():
             for test_case in test_cases:
                 try:
                     # Test individual sensor setting
-                    simulated_temps["smoker_left"] = test_case["temp"]
-                    temp_c = simulated_temps["smoker_left"]
+                    temp_c = update_simulation(temps={"smoker_left": test_case["temp"]}).temps["smoker_left"]
                     temp_f = temp_c * 9/5 + 32
                     
                     results.append({
@@ -479,19 +1098,29 @@ def create_app():
     @app.route('/simulation/status')
     def get_simulation_status():
         # Get current simulation status
+        sim = simulation_state
         return jsonify({
-            "simulation_mode": simulation_mode,
-            "current_temperatures": simulated_temps,
+            "simulation_mode": sim.enabled,
+            "current_temperatures": dict(sim.temps),
             "type_k_range": {"min": -200, "max": 1350},
             "absolute_zero": -273.15
         })
 
-    # Start sensor reading thread
+    # Start sensor reading thread; it initializes the sensors first
     sensor_thread = threading.Thread(target=read_sensors_loop, daemon=True)
     sensor_thread.start()
-    
+
+    startup_timings["create_app"] = time.perf_counter() - _startup_t0 - _import_seconds
     return app
 
+def serve():
+    # The one way to run the service: gunicorn with gunicorn.conf.py serving
+    # wsgi:app, as systemd/pitmaster.service does. Bind with PITMASTER_BIND.
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.execv(sys.executable, [
+        sys.executable, '-m', 'gunicorn', '--config', os.path.join(here, 'gunicorn.conf.py'),
+        '--pythonpath', here, 'wsgi:app'
+    ])
+
 if __name__ == '__main__':
-    app = create_app()
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+    serve()
\ No newline at end of file
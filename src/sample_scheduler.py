@@ -0,0 +1,168 @@
+# sample_scheduler.py
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional
+
+class SampleScheduler:
+    # Deadline-based per-sensor sampling. Each sensor has its own period and
+    # next deadline; deadlines advance by whole periods from the previous
+    # deadline rather than from "now", so read time never accumulates as drift.
+    # A sensor that falls more than a full period behind skips the missed slots
+    # (counted in overruns) instead of firing a burst of catch-up reads.
+    MIN_PERIOD = 0.25   # MAX6675 conversion time is ~220 ms
+    MAX_PERIOD = 3600.0
+
+    def __init__(self, periods: Dict[str, float], clock=time.monotonic, time_scale=1.0):
+        self.clock = clock
+        self.time_scale = time_scale
+        self._periods: Dict[str, float] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._boosts: Dict[str, int] = {}
+        self.overruns: Dict[str, int] = {}
+        # Read-only copy of the periods, replaced whole on every change so
+        # it can be read without the lock (e.g. by the native control thread)
+        self.current_periods: Mapping[str, float] = MappingProxyType({})
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        now = self.clock()
+        for name, period in periods.items():
+            self._periods[name] = self._check_period(period)
+            self._deadlines[name] = now
+            self.overruns[name] = 0
+        self.current_periods = MappingProxyType(dict(self._periods))
+
+    def _check_period(self, period: float) -> float:
+        period = float(period)
+        if not self.MIN_PERIOD <= period <= self.MAX_PERIOD:
+            raise ValueError(
+                f"Sample period must be between {self.MIN_PERIOD} and {self.MAX_PERIOD} seconds"
+            )
+        return period
+
+    def periods(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._periods)
+
+    def set_period(self, name: str, period: float):
+        # Change a sensor's period; takes effect immediately
+        period = self._check_period(period)
+        with self._lock:
+            if name not in self._periods:
+                raise KeyError(name)
+            self._periods[name] = period
+            self._deadlines[name] = min(self._deadlines[name], self.clock() + period)
+            self.current_periods = MappingProxyType(dict(self._periods))
+        self._wakeup.set()
+
+    def _period(self, name: str) -> float:
+        # Effective period: MIN_PERIOD while anyone has boosted the sensor
+        return self.MIN_PERIOD if self._boosts.get(name) else self._periods[name]
+
+    def boost(self, name: str):
+        # Sample name at the fastest rate, starting now, until unboost()
+        with self._lock:
+            if name not in self._periods:
+                raise KeyError(name)
+            self._boosts[name] = self._boosts.get(name, 0) + 1
+            self._deadlines[name] = min(self._deadlines[name], self.clock())
+        self._wakeup.set()
+
+    def unboost(self, name: str):
+        with self._lock:
+            count = self._boosts.get(name, 0) - 1
+            if count > 0:
+                self._boosts[name] = count
+            else:
+                self._boosts.pop(name, None)
+
+    def due(self) -> List[str]:
+        # Sensors whose deadline has passed, advancing their deadlines
+        now = self.clock()
+        names = []
+        with self._lock:
+            for name, deadline in self._deadlines.items():
+                if deadline > now:
+                    continue
+                names.append(name)
+                period = self._period(name)
+                deadline += period
+                if deadline <= now:
+                    missed = int((now - deadline) // period) + 1
+                    self.overruns[name] += missed
+                    deadline += missed * period
+                self._deadlines[name] = deadline
+        return names
+
+    def time_until_next(self) -> float:
+        with self._lock:
+            next_deadline = min(self._deadlines.values(), default=self.clock() + self.MAX_PERIOD)
+        return max(0.0, next_deadline - self.clock())
+
+    def wait(self):
+        # Sleep until the next deadline, or until set_period() or boost()
+        # changes the schedule. The event is cleared before the deadline is
+        # read: a change made after that either shows in the deadline or
+        # leaves the event set, so it can never be missed.
+        self._wakeup.clear()
+        timeout = self.time_until_next()
+        if timeout > 0:
+            self._wakeup.wait(timeout / self.time_scale)
+
+class SampleCapture:
+    # The next `count` readings the sensor loop takes for each of `names`.
+    # A reading is the published mapping (temp_c, raw_temp_c, error, ...);
+    # simulated is set if any of them came from simulation mode.
+    def __init__(self, names: Iterable[str], count: int):
+        self.count = count
+        self.readings: Dict[str, List[Mapping]] = {name: [] for name in names}
+        self.simulated = False
+        self._cond = threading.Condition()
+
+    def feed(self, name: str, reading: Mapping, simulated=False):
+        with self._cond:
+            taken = self.readings.get(name)
+            if taken is not None and len(taken) < self.count:
+                taken.append(reading)
+                self.simulated = self.simulated or simulated
+                if self._complete():
+                    self._cond.notify_all()
+
+    def _complete(self) -> bool:
+        return all(len(taken) >= self.count for taken in self.readings.values())
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        with self._cond:
+            return self._cond.wait_for(self._complete, timeout)
+
+class CaptureHub:
+    # Lets request-side jobs collect fresh samples from the sensor loop
+    # instead of reading the hardware themselves. While a capture runs its
+    # sensors are boosted to the fastest period, so they are sampled
+    # together in the loop's single pass at the chip's conversion rate.
+    def __init__(self, scheduler: SampleScheduler):
+        self.scheduler = scheduler
+        self._captures: List[SampleCapture] = []
+        self._lock = threading.Lock()
+
+    def feed(self, name: str, reading: Mapping, simulated=False):
+        # Called by the sensor loop for every reading it takes
+        for capture in self._captures:
+            capture.feed(name, reading, simulated)
+
+    def capture(self, names: List[str], count: int, timeout: Optional[float]) -> SampleCapture:
+        capture = SampleCapture(names, count)
+        with self._lock:
+            self._captures = self._captures + [capture]
+        boosted = []
+        try:
+            for name in names:
+                self.scheduler.boost(name)
+                boosted.append(name)
+            capture.wait(timeout)
+        finally:
+            for name in boosted:
+                self.scheduler.unboost(name)
+            with self._lock:
+                self._captures = [c for c in self._captures if c is not capture]
+        return capture
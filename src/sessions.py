@@ -0,0 +1,257 @@
+# sessions.py
+# Cook sessions: a named, annotated span of the cook history. A session does
+# not copy readings; every raw reading recorded between its start and stop
+# belongs to it, and the history store keeps those readings past the normal
+# raw retention for as long as the session exists. Pit temperature summaries
+# are folded in sample by sample while the session records, so listing or
+# exporting a finished session never rescans its readings.
+import atexit
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from history_store import HistoryStore
+from telemetry import columnar_header, pack_column_group
+
+# Default pit band for time-in-band: 225-275 °F
+DEFAULT_BAND = (107.2, 135.0)
+
+class SessionError(Exception):
+    pass
+
+class SessionSummary:
+    # Running pit temperature statistics. Time in band integrates the time
+    # from each pit sample to the next while the first was in band; gaps
+    # longer than max_gap (probes down, unit off) count as untracked.
+    def __init__(self, band_low: float, band_high: float, max_gap=60.0):
+        self.band_low = band_low
+        self.band_high = band_high
+        self.max_gap = max_gap
+        self.count = 0
+        self.pit_min: Optional[float] = None
+        self.pit_max: Optional[float] = None
+        self.pit_sum = 0.0
+        self.tracked_seconds = 0.0
+        self.in_band_seconds = 0.0
+        self.last_ts: Optional[float] = None
+        self.last_in_band = False
+
+    def add(self, timestamp: float, pit_temp: float):
+        self.count += 1
+        self.pit_sum += pit_temp
+        self.pit_min = pit_temp if self.pit_min is None else min(self.pit_min, pit_temp)
+        self.pit_max = pit_temp if self.pit_max is None else max(self.pit_max, pit_temp)
+        if self.last_ts is not None and timestamp > self.last_ts:
+            step = min(timestamp - self.last_ts, self.max_gap)
+            self.tracked_seconds += step
+            if self.last_in_band:
+                self.in_band_seconds += step
+        self.last_ts = timestamp
+        self.last_in_band = self.band_low <= pit_temp <= self.band_high
+
+    def to_dict(self) -> Dict:
+        return {
+            "band": [self.band_low, self.band_high],
+            "pit_samples": self.count,
+            "pit_min": None if self.pit_min is None else round(self.pit_min, 2),
+            "pit_max": None if self.pit_max is None else round(self.pit_max, 2),
+            "pit_avg": round(self.pit_sum / self.count, 2) if self.count else None,
+            "time_in_band": round(self.in_band_seconds, 1),
+            "time_tracked": round(self.tracked_seconds, 1),
+            "band_fraction": round(self.in_band_seconds / self.tracked_seconds, 3) if self.tracked_seconds else None
+        }
+
+    def state(self) -> Dict:
+        # Everything needed to carry on after a restart
+        return dict(vars(self))
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "SessionSummary":
+        summary = cls(state["band_low"], state["band_high"], state.get("max_gap", 60.0))
+        vars(summary).update(state)
+        return summary
+
+class SessionStore:
+    # Sessions table next to the history in the same SQLite file. At most one
+    # session records at a time; record_pit() only touches memory and the
+    # running summary is saved every save_interval seconds and on stop.
+    def __init__(self, db_path="history.db", save_interval=60.0, clock=time.time):
+        self.clock = clock
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, notes TEXT NOT NULL DEFAULT '', "
+            "started_at REAL NOT NULL, ended_at REAL, summary TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self._active_id: Optional[int] = None
+        self._summary: Optional[SessionSummary] = None
+        self._dirty = False
+        row = self._db.execute(
+            "SELECT id, summary FROM sessions WHERE ended_at IS NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            # A session was recording when the app stopped; carry on with it
+            self._active_id = row[0]
+            self._summary = SessionSummary.from_state(json.loads(row[1]))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _row_to_dict(self, row: Tuple) -> Dict:
+        session_id, name, notes, started_at, ended_at, summary = row
+        if session_id == self._active_id:
+            summary = self._summary
+        else:
+            summary = SessionSummary.from_state(json.loads(summary))
+        end = ended_at if ended_at is not None else self.clock()
+        return {
+            "id": session_id,
+            "name": name,
+            "notes": notes,
+            "started_at": started_at,
+            "ended_at": ended_at,
+            "active": ended_at is None,
+            "duration": round(end - started_at, 1),
+            "summary": summary.to_dict()
+        }
+
+    def get(self, session_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, name, notes, started_at, ended_at, summary FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+            return None if row is None else self._row_to_dict(row)
+
+    def list(self) -> List[Dict]:
+        # Newest first
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, name, notes, started_at, ended_at, summary FROM sessions ORDER BY id DESC"
+            ).fetchall()
+            return [self._row_to_dict(row) for row in rows]
+
+    @property
+    def active_id(self) -> Optional[int]:
+        return self._active_id
+
+    def start_session(self, name: str, notes="", band=DEFAULT_BAND) -> Dict:
+        band_low, band_high = float(band[0]), float(band[1])
+        if band_low >= band_high:
+            raise ValueError("band low must be below band high")
+        with self._lock:
+            if self._active_id is not None:
+                raise SessionError(f"Session {self._active_id} is still recording")
+            summary = SessionSummary(band_low, band_high)
+            cursor = self._db.execute(
+                "INSERT INTO sessions (name, notes, started_at, summary) VALUES (?, ?, ?, ?)",
+                (name, notes, self.clock(), json.dumps(summary.state()))
+            )
+            self._db.commit()
+            self._active_id, self._summary, self._dirty = cursor.lastrowid, summary, False
+            session_id = cursor.lastrowid
+        return self.get(session_id)
+
+    def stop_session(self, session_id: int) -> Dict:
+        with self._lock:
+            if session_id != self._active_id:
+                raise SessionError(f"Session {session_id} is not recording")
+            self._db.execute(
+                "UPDATE sessions SET ended_at = ?, summary = ? WHERE id = ?",
+                (self.clock(), json.dumps(self._summary.state()), session_id)
+            )
+            self._db.commit()
+            self._active_id, self._summary, self._dirty = None, None, False
+        return self.get(session_id)
+
+    def update_session(self, session_id: int, name: Optional[str] = None, notes: Optional[str] = None) -> Dict:
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE sessions SET name = COALESCE(?, name), notes = COALESCE(?, notes) WHERE id = ?",
+                (name, notes, session_id)
+            )
+            self._db.commit()
+            if cursor.rowcount == 0:
+                raise KeyError(session_id)
+        return self.get(session_id)
+
+    def delete_session(self, session_id: int):
+        # Forget a finished session; its readings fall back to normal retention
+        with self._lock:
+            if session_id == self._active_id:
+                raise SessionError(f"Session {session_id} is still recording")
+            cursor = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+            if cursor.rowcount == 0:
+                raise KeyError(session_id)
+
+    def record_pit(self, timestamp: float, pit_temp: float):
+        # Fold one pit reading into the recording session, if there is one
+        with self._lock:
+            if self._summary is not None:
+                self._summary.add(timestamp, pit_temp)
+                self._dirty = True
+
+    def ranges(self) -> List[Tuple[float, float]]:
+        # (start, end) of every session; a recording one runs to infinity
+        with self._lock:
+            rows = self._db.execute("SELECT started_at, ended_at FROM sessions").fetchall()
+        return [(start, end if end is not None else float("inf")) for start, end in rows]
+
+    def save(self):
+        with self._lock:
+            if self._active_id is None or not self._dirty:
+                return
+            try:
+                self._db.execute(
+                    "UPDATE sessions SET summary = ? WHERE id = ?",
+                    (json.dumps(self._summary.state()), self._active_id)
+                )
+                self._db.commit()
+                self._dirty = False
+            except sqlite3.Error as e:
+                print(f"[ERROR] Saving session summary: {e}")
+
+    def _save_loop(self):
+        while not self._stop.wait(self.save_interval):
+            self.save()
+
+    def start(self):
+        # Write the running summary every save_interval seconds and once more
+        # at exit, so a restart loses at most one interval of it
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._save_loop, daemon=True)
+            self._thread.start()
+            atexit.register(self.save)
+
+def _sensor_rows(history: HistoryStore, sensor: str, start: float, end: float) -> Iterator[Tuple]:
+    for batch in history.iter_raw(sensor, start, end):
+        for ts, raw_c, temp_c in batch:
+            yield ts, sensor, raw_c, temp_c
+
+def export_csv(history: HistoryStore, sensors: List[str], start: float, end: float,
+               chunk_rows=2000) -> Iterator[str]:
+    # Every sensor's raw readings merged in time order, one CSV chunk at a time
+    yield "ts,time,sensor,raw_c,temp_c\n"
+    rows = heapq.merge(*(_sensor_rows(history, sensor, start, end) for sensor in sensors))
+    lines = []
+    for ts, sensor, raw_c, temp_c in rows:
+        clock_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        lines.append(f"{ts:.3f},{clock_time},{sensor},{raw_c:.2f},{temp_c:.2f}\n")
+        if len(lines) >= chunk_rows:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+def export_columnar(history: HistoryStore, sensors: List[str], start: float, end: float) -> Iterator[bytes]:
+    # One row group per sensor per history batch (see telemetry.py)
+    yield columnar_header(sensors)
+    for sensor_id, sensor in enumerate(sensors):
+        for batch in history.iter_raw(sensor, start, end):
+            yield pack_column_group(sensor_id, batch)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# sim_hub.py
+# End-to-end load test for hub mode on one machine: starts N emulated units
+# (each its own server started by run_pitmaster.py, in its own working
+# directory, like separate Pis) and a hub following all of them, then checks
+# that every unit's readings reach the hub's /data. With --outage one unit is
+# stopped for the middle third of the run to exercise the hub's backoff and
+# reconnect.
+#
+#   python sim_hub.py [--units 8] [--seconds 60] [--time-scale 10] [--outage]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_stream import read_cpu_seconds, read_rss_mb
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_pitmaster.py")
+
+def read_threads(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+def worker_pid(pid, timeout=10.0):
+    # The gunicorn worker forked by the master at pid, which does the work
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = f.read().split()
+        if children:
+            return int(children[0])
+        time.sleep(0.1)
+    raise RuntimeError(f"No worker under {pid}")
+
+def start_server(workdir, port, env):
+    os.makedirs(workdir, exist_ok=True)
+    env = dict(os.environ, PITMASTER_BIND=f"127.0.0.1:{port}",
+               PITMASTER_POWER_GOVERNOR="0", **env)
+    return subprocess.Popen([sys.executable, SERVER], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def get_json(port, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+        return json.load(response)
+
+def wait_until_serving(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            get_json(port, "/data")
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Hub mode end-to-end load test")
+    parser.add_argument("--units", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--time-scale", type=float, default=10.0,
+                        help="Emulator speed-up; units publish every 3 s / time-scale")
+    parser.add_argument("--base-port", type=int, default=9100)
+    parser.add_argument("--hub-port", type=int, default=9090)
+    parser.add_argument("--outage", action="store_true",
+                        help="Stop the first unit for the middle third of the run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pitmaster-hub-")
+    names = [f"unit{i:02d}" for i in range(args.units)]
+    ports = {name: args.base_port + i for i, name in enumerate(names)}
+    unit_env = {"PITMASTER_BACKEND": "emulator", "PITMASTER_TIME_SCALE": str(args.time_scale)}
+    units = {name: start_server(os.path.join(workdir, name), ports[name], unit_env) for name in names}
+    hub = None
+    failed = False
+    try:
+        print(f"=== Hub load test: {args.units} emulated units at {args.time_scale:g}x, {args.seconds:g}s ===")
+        for name in names:
+            if not wait_until_serving(ports[name]):
+                raise RuntimeError(f"{name} did not start on port {ports[name]}")
+
+        spec = ",".join(f"{name}=http://127.0.0.1:{ports[name]}" for name in names)
+        hub = start_server(os.path.join(workdir, "hub"), args.hub_port,
+                           {"PITMASTER_BACKEND": "hub", "PITMASTER_HUB_UNITS": spec})
+        if not wait_until_serving(args.hub_port):
+            raise RuntimeError("Hub did not start")
+
+        time.sleep(2)  # let every unit connect before measuring
+        start_status = get_json(args.hub_port, "/hub/units")
+        hub_worker = worker_pid(hub.pid)
+        cpu_start = read_cpu_seconds(hub_worker)
+        started = time.monotonic()
+        outage = names[0] if args.outage else None
+        outage_seen = False
+        phase = 0
+        while time.monotonic() - started < args.seconds:
+            elapsed = time.monotonic() - started
+            if outage and phase == 0 and elapsed >= args.seconds / 3:
+                units[outage].terminate()
+                units[outage].wait()
+                print(f"[{elapsed:5.1f}s] stopped {outage}")
+                phase = 1
+            elif outage and phase == 1 and elapsed >= 2 * args.seconds / 3:
+                units[outage] = start_server(os.path.join(workdir, outage), ports[outage], unit_env)
+                print(f"[{elapsed:5.1f}s] restarted {outage}")
+                phase = 2
+            if phase == 1 and not get_json(args.hub_port, "/hub/units")[outage]["up"]:
+                outage_seen = True
+            time.sleep(0.5)
+        seconds = time.monotonic() - started
+        cpu = read_cpu_seconds(hub_worker) - cpu_start
+
+        status = get_json(args.hub_port, "/hub/units")
+        data = get_json(args.hub_port, "/data")
+        expected = seconds * args.time_scale / 3.0
+        print(f"{'unit':<8} {'up':>3} {'updates':>8} {'expected':>8} {'errors':>6} {'connects':>8}  readings")
+        for name in names:
+            unit = status[name]
+            updates = unit["updates"] - start_status[name]["updates"]
+            readings = [key for key in data if key.startswith(name + "/")]
+            ok = [key for key in readings if data[key]["error"] is None]
+            print(f"{name:<8} {'yes' if unit['up'] else 'no':>3} {updates:>8} {expected:>8.0f} "
+                  f"{unit['errors']:>6} {unit['connects']:>8}  {len(ok)}/{len(readings)} ok")
+            # The outage unit misses a third of the run
+            share = 0.4 if name == outage else 0.7
+            if not unit["up"] or len(ok) == 0 or len(ok) != len(readings) or updates < share * expected:
+                failed = True
+        if outage and not outage_seen:
+            print(f"Hub never reported {outage} as down during the outage")
+            failed = True
+
+        print(f"Hub: {cpu / seconds * 100:.1f}% CPU, {read_rss_mb(hub_worker):.0f} MB RSS, "
+              f"{read_threads(hub_worker)} threads for {args.units} units")
+    except Exception as e:
+        print(f"ERROR: {e}")
+        failed = True
+    finally:
+        for process in list(units.values()) + ([hub] if hub else []):
+            process.terminate()
+        for process in list(units.values()) + ([hub] if hub else []):
+            process.wait()
+
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
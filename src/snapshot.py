@@ -0,0 +1,109 @@
+# snapshot.py
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from telemetry import compact_reading_set, encode
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    data: Mapping
+    body: bytes
+    etag: str
+    published_at: float
+    # Server-Sent Events frame carrying body, shared by every /stream client
+    event: bytes
+    # Binary encodings of the compact reading set, made on first request
+    _encoded: Dict[str, bytes] = field(default_factory=dict, repr=False, compare=False)
+
+    def encoded(self, media_type: str) -> bytes:
+        # Body for a binary media type; concurrent first requests may both
+        # encode, which is harmless since the results are identical
+        body = self._encoded.get(media_type)
+        if body is None:
+            body = encode(media_type, compact_reading_set(self.data, self.version, self.published_at))
+            self._encoded[media_type] = body
+        return body
+
+def _json_default(obj):
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_json(data) -> bytes:
+    # Same bytes Flask's jsonify produces outside debug mode
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), default=_json_default).encode("utf-8") + b"\n"
+
+def freeze(value: Any) -> Any:
+    # Read-only view of value: dicts become mappingproxies over fresh copies,
+    # lists become tuples. Already frozen mappings are shared, not copied,
+    # so unchanged readings cost nothing to carry into the next snapshot.
+    if isinstance(value, MappingProxyType):
+        return value
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def make_reading(temp_c: float, temp_f: float, raw_temp_c: float, error: Optional[str]) -> Mapping:
+    # One probe's published reading; immutable so every field comes from the same sample
+    return MappingProxyType({"temp_c": temp_c, "temp_f": temp_f, "raw_temp_c": raw_temp_c, "error": error})
+
+def with_error(reading: Mapping, error: str) -> Mapping:
+    # The previous reading's values, flagged with a new error
+    return MappingProxyType({**reading, "error": error})
+
+class SnapshotPublisher:
+    # Holds the latest published reading set. The sensor loop calls publish()
+    # once per cycle; request handlers only ever read current(), so JSON
+    # encoding happens once per cycle instead of once per request.
+    #
+    # Snapshots are immutable and replaced by a single reference assignment,
+    # so readers never lock or copy and can never see a half-written cycle.
+    def __init__(self):
+        # Versions restart at 1 every boot, so the ETag carries a boot id too
+        self._boot_id = os.urandom(4).hex()
+        self._version = 0
+        self._condition = threading.Condition()
+        self._snapshot = self._build(MappingProxyType({}))
+
+    def _build(self, data) -> Snapshot:
+        body = encode_json(data)
+        return Snapshot(
+            version=self._version,
+            data=data,
+            body=body,
+            etag=f"{self._boot_id}-{self._version}",
+            published_at=time.time(),
+            event=b"id: %d\nevent: reading\ndata: %s\n\n" % (self._version, body.rstrip(b"\n"))
+        )
+
+    def publish(self, data: Mapping) -> Snapshot:
+        # Freeze data, encode it and make it the current snapshot
+        data = freeze(data)
+        with self._condition:
+            self._version += 1
+            self._snapshot = self._build(data)
+            self._condition.notify_all()
+            return self._snapshot
+
+    def current(self) -> Snapshot:
+        return self._snapshot
+
+    def wait_for(self, since: int, timeout: Optional[float] = None) -> Snapshot:
+        # Block until a snapshot newer than version `since` is published, or
+        # until timeout expires; returns whatever is current at that point.
+        # Under gevent this parks a greenlet, not an OS thread.
+        snapshot = self._snapshot
+        # A version ahead of ours was handed out before a restart
+        if snapshot.version != since:
+            return snapshot
+        with self._condition:
+            self._condition.wait_for(lambda: self._snapshot.version > since, timeout)
+            return self._snapshot
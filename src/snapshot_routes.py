@@ -0,0 +1,65 @@
+# snapshot_routes.py
+# /data and /stream served from a SnapshotPublisher. Shared by the unit app
+# and the hub app so both speak exactly the same polling and push protocol.
+from flask import Flask, Response, request
+
+from metrics import MetricFamily
+from snapshot import SnapshotPublisher
+from telemetry import JSON, negotiate
+
+def add_snapshot_routes(app: Flask, publisher: SnapshotPublisher, stream_clients: MetricFamily):
+
+    @app.route('/data')
+    def get_data():
+        # Serve the bytes encoded by the publisher; unchanged snapshots get a 304.
+        # With ?since=<version> this long-polls until a newer snapshot exists.
+        # Accept: application/cbor (or msgpack) gets the compact reading set.
+        media_type = negotiate(request.accept_mimetypes)
+        since = request.args.get('since', type=int)
+        if since is not None:
+            timeout = min(request.args.get('timeout', 30.0, type=float), 60.0)
+            snapshot = publisher.wait_for(since, timeout)
+        else:
+            snapshot = publisher.current()
+        etag = snapshot.etag if media_type == JSON else f"{snapshot.etag}-{media_type.rsplit('/', 1)[1]}"
+        if since is not None:
+            not_modified = snapshot.version == since
+        else:
+            not_modified = request.if_none_match.contains(etag)
+
+        if not_modified:
+            response = app.response_class(status=304)
+        elif media_type == JSON:
+            response = app.response_class(snapshot.body, mimetype=JSON)
+        else:
+            response = app.response_class(snapshot.encoded(media_type), mimetype=media_type)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        response.headers['X-Snapshot-Version'] = str(snapshot.version)
+        return response
+
+    @app.route('/stream')
+    def stream():
+        # Server-Sent Events: push each new snapshot as it is published
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        since = last_event_id if last_event_id is not None else -1
+
+        def events(since):
+            stream_clients.inc()
+            try:
+                yield b"retry: 3000\n\n"
+                while True:
+                    snapshot = publisher.wait_for(since, timeout=15)
+                    if snapshot.version == since:
+                        yield b": keep-alive\n\n"
+                        continue
+                    since = snapshot.version
+                    yield snapshot.event
+            finally:
+                stream_clients.dec()
+
+        return Response(events(since), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# stress_snapshot.py
+# Concurrency stress test for the published reading set: a writer publishes
+# as fast as it can while many reader threads check that every snapshot they
+# see is internally consistent. Exits non-zero on any violation.
+#
+#   python stress_snapshot.py [--readers 32] [--seconds 10]
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from snapshot import SnapshotPublisher, make_reading
+
+SENSORS = ("smoker_left", "smoker_right", "meat_probe")
+
+class Violations:
+    def __init__(self):
+        self.count = 0
+        self.examples = []
+        self._lock = threading.Lock()
+
+    def add(self, message):
+        with self._lock:
+            self.count += 1
+            if len(self.examples) < 10:
+                self.examples.append(message)
+
+def check_reading(name, reading, violations):
+    # temp_f must come from the same sample as temp_c (both rounded to 0.01)
+    if reading["error"] is None and abs(reading["temp_f"] - (reading["temp_c"] * 9 / 5 + 32)) > 0.015:
+        violations.add(f"{name}: temp_c={reading['temp_c']} temp_f={reading['temp_f']}")
+
+def stress_publisher(readers, seconds):
+    # Writer publishes cycles where every probe carries the cycle number;
+    # a snapshot mixing cycles, a body that disagrees with data, a version
+    # going backwards or a mutable snapshot is a violation.
+    print(f"=== Publisher: 1 writer, {readers} readers, {seconds}s ===")
+    publisher = SnapshotPublisher()
+    violations = Violations()
+    stop = threading.Event()
+    reads = [0] * readers
+    cycles = [0]
+
+    def writer():
+        cycle = 0
+        while not stop.is_set():
+            cycle += 1
+            temp_c = 20.0 + (cycle % 2000) * 0.25
+            data = {name: make_reading(temp_c, round(temp_c * 9 / 5 + 32, 2), float(cycle), None) for name in SENSORS}
+            data["last_updated"] = str(cycle)
+            publisher.publish(data)
+        cycles[0] = cycle
+
+    def reader(index):
+        last_version = -1
+        while not stop.is_set():
+            snapshot = publisher.current()
+            reads[index] += 1
+            if snapshot.version < last_version:
+                violations.add(f"version went backwards: {last_version} -> {snapshot.version}")
+            last_version = snapshot.version
+            if not snapshot.data:
+                continue
+            cycle_ids = {snapshot.data[name]["raw_temp_c"] for name in SENSORS}
+            cycle_ids.add(float(snapshot.data["last_updated"]))
+            if len(cycle_ids) != 1:
+                violations.add(f"torn snapshot v{snapshot.version}: cycles {sorted(cycle_ids)}")
+            for name in SENSORS:
+                check_reading(name, snapshot.data[name], violations)
+            if reads[index] % 1000 == 0:
+                if json.loads(snapshot.body) != json.loads(json.dumps(dict(snapshot.data), default=dict)):
+                    violations.add(f"body does not match data in v{snapshot.version}")
+                try:
+                    snapshot.data[SENSORS[0]]["temp_c"] = -1.0
+                    violations.add("snapshot reading was writable")
+                except TypeError:
+                    pass
+
+    threads = [threading.Thread(target=writer)] + [
+        threading.Thread(target=reader, args=(i,)) for i in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f"Published {cycles[0]:,} cycles, {sum(reads):,} snapshot reads, {violations.count} violations")
+    return violations
+
+def stress_app(readers, seconds):
+    # The real sensor loop on the emulator, sampling every probe as fast as
+    # the scheduler allows, against readers on /data and a thread flipping
+    # simulation mode and simulated temperatures through the routes
+    print(f"=== App: emulated sensor loop, {readers} /data readers, {seconds}s ===")
+    from run_pitmaster import create_app
+    app = create_app(backend='emulator', time_scale=50)
+    control = app.test_client()
+    for name in SENSORS:
+        response = control.post('/sensor/rates', json={"sensor_name": name, "period": 0.25})
+        assert response.status_code == 200, f"/sensor/rates {name}: {response.get_json()}"
+    violations = Violations()
+    stop = threading.Event()
+    reads = [0] * readers
+    toggles = [0]
+
+    def toggler():
+        enabled = False
+        while not stop.is_set():
+            enabled = not enabled
+            control.post('/simulation/set_mode', json={"enabled": enabled})
+            if enabled:
+                control.post('/simulation/set_all', json={"temperature": 50.0 + toggles[0] % 100})
+            toggles[0] += 1
+            time.sleep(0.005)
+        control.post('/simulation/set_mode', json={"enabled": False})
+
+    def reader(index):
+        client = app.test_client()
+        last_version = -1
+        while not stop.is_set():
+            response = client.get('/data')
+            reads[index] += 1
+            version = int(response.headers['X-Snapshot-Version'])
+            if version < last_version:
+                violations.add(f"version went backwards: {last_version} -> {version}")
+            last_version = version
+            data = response.get_json()
+            for name in SENSORS:
+                check_reading(name, data[name], violations)
+
+    threads = [threading.Thread(target=toggler)] + [
+        threading.Thread(target=reader, args=(i,)) for i in range(readers)
+    ]
+    time.sleep(1)  # let the sensors initialise
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f"{sum(reads):,} /data reads, {toggles[0]:,} simulation toggles, {violations.count} violations")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot concurrency stress test")
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    failed = False
+    for run in (stress_publisher, stress_app):
+        violations = run(args.readers, args.seconds)
+        for example in violations.examples:
+            print(f"  {example}")
+        failed = failed or violations.count > 0
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+# telemetry.py
+# Compact encodings for low-bandwidth clients and the hub.
+#
+# /data and the history endpoints negotiate CBOR (always available, encoded
+# here) or MessagePack (when the msgpack package is installed) through the
+# Accept header. In binary, /data carries a compact reading set instead of the
+# dashboard JSON: no sensor_status, no temp_f, and temperatures as integer
+# hundredths of a degree. Bulk history export uses fixed-size struct frames.
+import struct
+import sys
+import time
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+JSON = "application/json"
+CBOR = "application/cbor"
+MSGPACK = "application/msgpack"
+FRAMES = "application/vnd.pitmaster.frames"
+
+def _load_msgpack():
+    # msgpack is optional; without it only CBOR is offered
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+_msgpack = _load_msgpack()
+
+# Offered in preference order; JSON first so browsers and */* keep getting it
+OFFERS = [JSON, CBOR] + ([MSGPACK, "application/x-msgpack"] if _msgpack else [])
+
+def negotiate(accept, offers=OFFERS) -> str:
+    # Best media type for a werkzeug MIMEAccept; JSON when nothing matches
+    return accept.best_match(offers, default=JSON)
+
+def encode(media_type: str, value) -> bytes:
+    # Binary encoding of a JSON-shaped value (dicts, lists, str, numbers, None)
+    if media_type == CBOR:
+        return encode_cbor(value)
+    if media_type in (MSGPACK, "application/x-msgpack"):
+        return _msgpack.packb(value, use_bin_type=True)
+    raise ValueError(f"No encoder for {media_type}")
+
+def decode(media_type: str, body: bytes):
+    if media_type == CBOR:
+        return decode_cbor(body)
+    if media_type in (MSGPACK, "application/x-msgpack") and _msgpack:
+        return _msgpack.unpackb(body, raw=False)
+    raise ValueError(f"No decoder for {media_type}")
+
+# -- CBOR (RFC 8949), the subset JSON-shaped data needs ---------------------
+
+_FLOAT32 = struct.Struct(">f")
+_FLOAT64 = struct.Struct(">d")
+
+def _cbor_head(major: int, n: int, out: bytearray):
+    if n < 24:
+        out.append(major << 5 | n)
+    elif n < 0x100:
+        out += bytes((major << 5 | 24, n))
+    elif n < 0x10000:
+        out.append(major << 5 | 25)
+        out += n.to_bytes(2, "big")
+    elif n < 0x100000000:
+        out.append(major << 5 | 26)
+        out += n.to_bytes(4, "big")
+    else:
+        out.append(major << 5 | 27)
+        out += n.to_bytes(8, "big")
+
+def _cbor_encode(value, out: bytearray):
+    if value is None:
+        out.append(0xf6)
+    elif value is True:
+        out.append(0xf5)
+    elif value is False:
+        out.append(0xf4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _cbor_head(0, value, out)
+        else:
+            _cbor_head(1, -1 - value, out)
+    elif isinstance(value, float):
+        # Single precision whenever it round-trips exactly (e.g. quarter degrees)
+        single = _FLOAT32.pack(value) if abs(value) < 3.4e38 else None
+        if single is not None and _FLOAT32.unpack(single)[0] == value:
+            out.append(0xfa)
+            out += single
+        else:
+            out.append(0xfb)
+            out += _FLOAT64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _cbor_head(3, len(data), out)
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        _cbor_head(2, len(value), out)
+        out += value
+    elif isinstance(value, Mapping):
+        _cbor_head(5, len(value), out)
+        for key, item in value.items():
+            _cbor_encode(key, out)
+            _cbor_encode(item, out)
+    elif isinstance(value, (list, tuple)):
+        _cbor_head(4, len(value), out)
+        for item in value:
+            _cbor_encode(item, out)
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} is not CBOR serializable")
+
+def encode_cbor(value) -> bytes:
+    out = bytearray()
+    _cbor_encode(value, out)
+    return bytes(out)
+
+def _cbor_decode(buf: memoryview, pos: int):
+    if pos >= len(buf):
+        raise ValueError("Truncated CBOR data")
+    initial = buf[pos]
+    pos += 1
+    major, info = initial >> 5, initial & 0x1f
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info in (22, 23):
+            return None, pos
+        if info in (25, 26, 27):
+            size = 1 << (info - 24)
+            if pos + size > len(buf):
+                raise ValueError("Truncated CBOR data")
+            return struct.unpack({2: ">e", 4: ">f", 8: ">d"}[size], buf[pos:pos + size])[0], pos + size
+        raise ValueError(f"Unsupported CBOR simple value {info}")
+    if info < 24:
+        n = info
+    elif info <= 27:
+        size = 1 << (info - 24)
+        if pos + size > len(buf):
+            raise ValueError("Truncated CBOR data")
+        n = int.from_bytes(buf[pos:pos + size], "big")
+        pos += size
+    else:
+        raise ValueError("Indefinite-length CBOR items are not supported")
+
+    if major == 0:
+        return n, pos
+    if major == 1:
+        return -1 - n, pos
+    if major in (2, 3):
+        if pos + n > len(buf):
+            raise ValueError("Truncated CBOR data")
+        data = bytes(buf[pos:pos + n])
+        return (data if major == 2 else data.decode("utf-8")), pos + n
+    if major == 4:
+        items = []
+        for _ in range(n):
+            item, pos = _cbor_decode(buf, pos)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        mapping = {}
+        for _ in range(n):
+            key, pos = _cbor_decode(buf, pos)
+            mapping[key], pos = _cbor_decode(buf, pos)
+        return mapping, pos
+    # Major type 6: tagged item; the tag is ignored
+    return _cbor_decode(buf, pos)
+
+def decode_cbor(data: bytes):
+    value, pos = _cbor_decode(memoryview(data), 0)
+    if pos != len(data):
+        raise ValueError("Trailing bytes after CBOR item")
+    return value
+
+# -- Compact reading set -----------------------------------------------------
+
+def _centi(temp: float) -> int:
+    return int(round(temp * 100))
+
+def compact_reading_set(data: Mapping, version: int, published_at: float) -> Dict:
+    # {"v", "ts", "sim", "sensors": {name: [temp_c, raw_temp_c, error]}} with
+    # both temperatures in hundredths of a degree C
+    sensors = {}
+    for key, value in data.items():
+        if isinstance(value, Mapping) and "temp_c" in value:
+            sensors[key] = [_centi(value["temp_c"]), _centi(value["raw_temp_c"]), value["error"]]
+    return {
+        "v": version,
+        "ts": published_at,
+        "sim": bool(data.get("simulation_mode")),
+        "sensors": sensors
+    }
+
+def expand_reading_set(compact: Mapping) -> Dict:
+    # The /data JSON shape (less sensor_status) rebuilt from a compact set
+    data = {}
+    for name, (temp, raw, error) in compact["sensors"].items():
+        temp_c = temp / 100
+        data[name] = {
+            "temp_c": temp_c,
+            "temp_f": round(temp_c * 9 / 5 + 32, 2),
+            "raw_temp_c": raw / 100,
+            "error": error
+        }
+    data["last_updated"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(compact["ts"]))
+    data["simulation_mode"] = compact["sim"]
+    return data
+
+# -- Fixed-layout history frames --------------------------------------------
+#
+# Stream: header, sensor table, then frames until the end of the body.
+#   header        <4sBBH   magic b"PTMF", format version, frame size, sensor count
+#   sensor entry  <HB      sensor id, name length, then the UTF-8 name
+#   frame         <HQhh    sensor id, timestamp in ms, raw and calibrated
+#                          temperature in quarter degrees C (saturating int16)
+
+FRAME_MAGIC = b"PTMF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBH")
+FRAME_SENSOR = struct.Struct("<HB")
+FRAME = struct.Struct("<HQhh")
+FRAME_LAYOUT = "sensor_id:u16,ts_ms:u64,raw_c:i16,temp_c:i16;little-endian;0.25C"
+
+def _quarter(temp: float) -> int:
+    return max(-32768, min(32767, int(round(temp * 4))))
+
+def _sensor_table(sensor_names: List[str]) -> bytes:
+    out = bytearray()
+    for sensor_id, name in enumerate(sensor_names):
+        encoded = name.encode("utf-8")
+        out += FRAME_SENSOR.pack(sensor_id, len(encoded)) + encoded
+    return bytes(out)
+
+def _read_sensor_table(data: bytes, offset: int, count: int) -> Tuple[Dict[int, str], int]:
+    sensors: Dict[int, str] = {}
+    for _ in range(count):
+        sensor_id, length = FRAME_SENSOR.unpack_from(data, offset)
+        offset += FRAME_SENSOR.size
+        sensors[sensor_id] = bytes(data[offset:offset + length]).decode("utf-8")
+        offset += length
+    return sensors, offset
+
+def frames_header(sensor_names: List[str]) -> bytes:
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, FRAME.size, len(sensor_names))
+    return header + _sensor_table(sensor_names)
+
+@lru_cache(maxsize=16)
+def _frames_struct(count: int) -> struct.Struct:
+    # count frames as one Struct, so a whole batch packs in a single call
+    return struct.Struct("<" + "HQhh" * count)
+
+def pack_frames(sensor_id: int, rows: Iterable[Tuple[float, float, float]]) -> bytes:
+    # One frame per (ts, raw_c, temp_c) row, packed into a single buffer
+    rows = rows if isinstance(rows, list) else list(rows)
+    values = []
+    add = values.extend
+    for ts, raw_c, temp_c in rows:
+        add((sensor_id, round(ts * 1000), round(raw_c * 4), round(temp_c * 4)))
+    try:
+        return _frames_struct(len(rows)).pack(*values)
+    except struct.error:
+        # Something outside the int16 range: saturate it, frame by frame
+        return b"".join(
+            FRAME.pack(sensor_id, round(ts * 1000), _quarter(raw_c), _quarter(temp_c))
+            for ts, raw_c, temp_c in rows
+        )
+
+def read_frames(data: bytes) -> Tuple[Dict[int, str], List[Tuple[str, float, float, float]]]:
+    # Decode a whole frame stream: ({id: name}, [(sensor, ts, raw_c, temp_c)])
+    magic, version, frame_size, count = FRAME_HEADER.unpack_from(data, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION or frame_size != FRAME.size:
+        raise ValueError("Not a version 1 Pi-tMaster frame stream")
+    sensors, offset = _read_sensor_table(data, FRAME_HEADER.size, count)
+    body = memoryview(data)[offset:]
+    if len(body) % FRAME.size:
+        raise ValueError("Truncated frame")
+    frames = [
+        (sensors.get(sensor_id, str(sensor_id)), ts_ms / 1000, raw / 4, temp / 4)
+        for sensor_id, ts_ms, raw, temp in FRAME.iter_unpack(body)
+    ]
+    return sensors, frames
+
+# -- Columnar export ---------------------------------------------------------
+#
+# Parquet-style row groups, one per sensor batch, so a reader can take a
+# whole column without walking rows:
+#   header        <4sBH    magic b"PTMC", format version, sensor count
+#   sensor entry  <HB      sensor id, name length, then the UTF-8 name
+#   row group     <HI      sensor id, row count, then that many ts (float64),
+#                          raw_c (float32) and temp_c (float32), column by column
+# Everything is little-endian.
+
+COLUMNAR = "application/vnd.pitmaster.columnar"
+COLUMNAR_MAGIC = b"PTMC"
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct("<4sBH")
+COLUMN_GROUP = struct.Struct("<HI")
+
+def columnar_header(sensor_names: List[str]) -> bytes:
+    header = COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, len(sensor_names))
+    return header + _sensor_table(sensor_names)
+
+def pack_column_group(sensor_id: int, rows: List[Tuple[float, float, float]]) -> bytes:
+    columns = (
+        array("d", [row[0] for row in rows]),
+        array("f", [row[1] for row in rows]),
+        array("f", [row[2] for row in rows]),
+    )
+    if sys.byteorder == "big":
+        for column in columns:
+            column.byteswap()
+    return COLUMN_GROUP.pack(sensor_id, len(rows)) + b"".join(column.tobytes() for column in columns)
+
+def read_columns(data: bytes) -> Dict[str, Dict[str, array]]:
+    # Decode a whole columnar stream: {sensor: {"ts", "raw_c", "temp_c"}}
+    magic, version, count = COLUMNAR_HEADER.unpack_from(data, 0)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError("Not a version 1 Pi-tMaster columnar stream")
+    sensors, offset = _read_sensor_table(data, COLUMNAR_HEADER.size, count)
+    result = {name: {"ts": array("d"), "raw_c": array("f"), "temp_c": array("f")} for name in sensors.values()}
+    while offset < len(data):
+        sensor_id, rows = COLUMN_GROUP.unpack_from(data, offset)
+        offset += COLUMN_GROUP.size
+        columns = result[sensors[sensor_id]]
+        for key in ("ts", "raw_c", "temp_c"):
+            column = array(columns[key].typecode)
+            size = column.itemsize * rows
+            if offset + size > len(data):
+                raise ValueError("Truncated row group")
+            column.frombytes(data[offset:offset + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns[key].extend(column)
+            offset += size
+    return result
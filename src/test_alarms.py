@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# test_alarms.py
+# Drives the alarm engine and dispatcher with scripted readings: events are
+# edge-triggered and debounced, a failing sink does not stop delivery to the
+# others, and rules survive a save and reload.
+import os
+import sys
+import tempfile
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from alarms import AlarmDispatcher, AlarmEngine, DisconnectedRule, HighRule, MemorySink
+
+class FailingSink:
+    def send(self, event):
+        raise RuntimeError("webhook down")
+
+def test_alarms(workdir):
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        print(f"{'✅' if ok else '❌'} {label}")
+        failures += 0 if ok else 1
+
+    memory = MemorySink()
+    dispatcher = AlarmDispatcher([FailingSink(), memory])
+    dispatcher.start()
+    rules_file = os.path.join(workdir, "alarm_rules.json")
+    engine = AlarmEngine(dispatcher, rules_file)
+    engine.add_rule(HighRule("pit_high", "smoker_left", 135.0, hysteresis=5.0, debounce=10.0))
+    engine.add_rule(DisconnectedRule("meat_lost", "meat_probe"))
+
+    print("=== Edge-triggered, debounced events ===")
+    readings = [
+        (0, "smoker_left", 130.0, None),
+        (5, "smoker_left", 136.0, None),     # over threshold, still debouncing
+        (10, "smoker_left", 134.0, None),    # back under before 10 s: no alarm
+        (20, "smoker_left", 137.0, None),
+        (31, "smoker_left", 138.0, None),    # held 11 s: triggered
+        (40, "smoker_left", 139.0, None),    # still active: nothing new
+        (50, "smoker_left", 132.0, None),    # inside the hysteresis band
+        (60, "smoker_left", 129.0, None),
+        (71, "smoker_left", 128.0, None),    # held 11 s below 130: cleared
+        (75, "meat_probe", None, "Thermocouple open"),
+        (78, "meat_probe", 60.0, None),
+    ]
+    for now, sensor, temp_c, error in readings:
+        engine.evaluate(sensor, temp_c, error, now)
+
+    check("four events delivered to the memory sink", memory.wait_for(4))
+    got = [(e["rule_id"], e["state"], e["timestamp"]) for e in memory.events]
+    expected = [("pit_high", "triggered", 31), ("pit_high", "cleared", 71),
+                ("meat_lost", "triggered", 75), ("meat_lost", "cleared", 78)]
+    check(f"events {got}", got == expected)
+    dispatcher.stop()
+    check(f"failing sink counted ({dispatcher.failures} failures)", dispatcher.failures == 4)
+    check("no events dropped", dispatcher.dropped == 0)
+
+    print("\n=== Rules survive a save and reload ===")
+    reloaded = AlarmEngine(rules_file=rules_file)
+    check("rules reloaded from disk",
+          [rule.config() for rule in reloaded.rules()] == [rule.config() for rule in engine.rules()])
+    check("no temp files left behind", sorted(os.listdir(workdir)) == ["alarm_rules.json"])
+    return failures
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as workdir:
+        failures = test_alarms(workdir)
+    print(f"\n{'All checks passed' if not failures else f'{failures} check(s) failed'}")
+    sys.exit(1 if failures else 0)
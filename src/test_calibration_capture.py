@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# test_calibration_capture.py
+# Checks that /calibration/add_point never saves simulated temperatures into
+# the calibration file: the request is refused while simulation mode is on,
+# and a capture that sees simulation switched on part way through fails.
+# Runs the app on the emulator backend in a scratch directory.
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for_job(client, job_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] in ("done", "error"):
+            return job
+        time.sleep(0.1)
+    raise TimeoutError(f"Job {job_id} did not finish")
+
+def stored_points(sensor_name):
+    if not os.path.exists("calibration_data.json"):
+        return 0
+    with open("calibration_data.json") as f:
+        return len(json.load(f).get(sensor_name, {}).get("points", []))
+
+def test_calibration_capture():
+    os.environ.setdefault("PITMASTER_POWER_GOVERNOR", "0")
+    import run_pitmaster
+    from calibration import get_calibration_manager
+
+    app = run_pitmaster.create_app("emulator")
+    client = app.test_client()
+    sensor_name = "meat_probe"
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        print(f"{'✅' if ok else '❌'} {label}")
+        failures += 0 if ok else 1
+
+    # Wait for the sensors to come up
+    deadline = time.time() + 10
+    while time.time() < deadline and client.get("/data").get_json()["sensor_status"][sensor_name] != "Connected":
+        time.sleep(0.1)
+
+    print("=== Simulation on: request is refused ===")
+    client.post("/simulation/set_mode", json={"enabled": True})
+    response = client.post("/calibration/add_point", json={"sensor_name": sensor_name, "actual_temp": 100.0})
+    check(f"add_point answers 409 (got {response.status_code})", response.status_code == 409)
+
+    print("\n=== Simulation switched on during the capture: job fails ===")
+    client.post("/simulation/set_mode", json={"enabled": False})
+    response = client.post("/calibration/add_point",
+                           json={"sensor_name": sensor_name, "actual_temp": 100.0, "samples": 20})
+    check(f"add_point accepted (got {response.status_code})", response.status_code == 202)
+    time.sleep(1.0)
+    client.post("/simulation/set_mode", json={"enabled": True})
+    job = wait_for_job(client, response.get_json()["job_id"])
+    check(f"capture job failed: {job['error']}", job["status"] == "error")
+    get_calibration_manager().flush()
+    check("no point was stored", stored_points(sensor_name) == 0)
+
+    print("\n=== Simulation off: point is captured from the probe ===")
+    client.post("/simulation/set_mode", json={"enabled": False})
+    response = client.post("/calibration/add_point",
+                           json={"sensor_name": sensor_name, "actual_temp": 100.0, "samples": 3})
+    job = wait_for_job(client, response.get_json()["job_id"])
+    check(f"capture job finished ({job['status']})", job["status"] == "done")
+    get_calibration_manager().flush()
+    check("one point was stored", stored_points(sensor_name) == 1)
+    return failures
+
+if __name__ == "__main__":
+    # The app keeps history.db and calibration_data.json in its working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        failures = test_calibration_capture()
+    print(f"\n{'All checks passed' if not failures else f'{failures} check(s) failed'}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# test_control_thread.py
+# Runs the pit controller's native thread under gevent monkey-patching, as in
+# the gunicorn worker, while greenlets hold and contend the scheduler and
+# emulated smoker locks. The control loop must keep its rate and the
+# greenlets must not fail with LoopExit.
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import sys
+import time
+
+import gevent
+
+# Add the current directory to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from max6675_emulator import SmokerPlant
+from pit_controller import PitController, SimulatedBlower
+from sample_scheduler import SampleScheduler
+
+def test_control_thread(seconds=3.0, period=0.05):
+    plant = SmokerPlant()
+    scheduler = SampleScheduler({"smoker_left": 3.0, "smoker_right": 3.0})
+
+    def read_pit_temp():
+        # Same lock-free reads as run_pitmaster's read_pit_temp
+        max(scheduler.current_periods.values())
+        return plant.pit_c
+
+    controller = PitController(read_pit_temp, SimulatedBlower(plant), period=period)
+    controller.set_enabled(True)
+    controller.start()
+
+    deadline = time.monotonic() + seconds
+
+    def contend():
+        while time.monotonic() < deadline:
+            with scheduler._lock:
+                gevent.sleep(0.01)
+            scheduler.due()
+            scheduler.set_period("smoker_left", 0.25 if scheduler.current_periods["smoker_left"] > 1 else 3.0)
+            plant.temperatures()
+
+    greenlets = [gevent.spawn(contend) for _ in range(5)]
+    gevent.joinall(greenlets)
+    controller.stop()
+
+    failures = 0
+    errors = [g.exception for g in greenlets if g.exception is not None]
+    cycles = controller.timing.cycles
+    expected = int(seconds / period)
+    for label, ok in (
+        (f"greenlets finished without errors {errors}", not errors),
+        (f"{cycles} control cycles of {expected} expected", cycles >= 0.9 * expected),
+    ):
+        print(f"{'✅' if ok else '❌'} {label}")
+        failures += 0 if ok else 1
+    return failures
+
+if __name__ == "__main__":
+    failures = test_control_thread()
+    print(f"\n{'All checks passed' if not failures else f'{failures} check(s) failed'}")
+    sys.exit(1 if failures else 0)
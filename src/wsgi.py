@@ -0,0 +1,5 @@
+# wsgi.py
+# WSGI entry point used by gunicorn.conf.py
+from run_pitmaster import create_app
+
+app = create_app()